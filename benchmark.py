@@ -0,0 +1,413 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import tarfile
+import hashlib
+import argparse
+import platform
+import tempfile
+import threading
+import resource
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Synthetic file contents are built from these so that text compresses and
+# minifies roughly like real code.
+WORDS = (
+    'def', 'return', 'import', 'class', 'self', 'value', 'result', 'index', 'items', 'config', 'path', 'data',
+    'if', 'else', 'for', 'in', 'not', 'None', 'True', 'False', 'const', 'let', 'function', 'async', 'await',
+    'name', 'count', 'total', 'buffer', 'reader', 'writer', 'export', 'collect', 'scan', 'file', 'folder',
+)
+TEXT_TYPES = ('py', 'js', 'ts', 'md', 'json', 'yaml', 'txt', 'css', 'html')
+EXCLUDED_DIR = 'node_modules'
+BENCH_REPO = 'bench/synthetic'
+
+def synthetic_text(rng, file_type, size):
+    lines = []
+    length = 0
+    indent = 0
+    while length < size:
+        words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 10)))
+        if file_type == 'py':
+            line = ' ' * (4 * indent) + (f"# {words}" if rng.random() < 0.15 else f"{words}()")
+            indent = max(0, min(indent + rng.choice((-1, 0, 0, 1)), 4))
+        elif file_type in ('js', 'ts', 'css'):
+            line = ' ' * (2 * indent) + (f"// {words}" if rng.random() < 0.15 else f"{words};")
+            indent = max(0, min(indent + rng.choice((-1, 0, 0, 1)), 4))
+        elif file_type == 'json':
+            line = f'  "{rng.choice(WORDS)}{len(lines)}": "{words}",'
+        elif file_type == 'yaml':
+            line = f"{rng.choice(WORDS)}{len(lines)}: {words}"
+        elif file_type == 'html':
+            line = f"<p>{words}</p>"
+        else:
+            line = words.capitalize() + '.'
+        lines.append(line)
+        length += len(line) + 1
+    text = '\n'.join(lines) + '\n'
+    if file_type == 'json':
+        text = '{\n' + text.rstrip(',\n') + '\n}\n'
+    return text
+
+def generate_tree(root, files=2000, depth=4, fanout=4, mean_size=4096, size_sigma=1.0, binary_ratio=0.05,
+                  excluded_ratio=0.2, seed=0):
+    # Writes a deterministic tree: the same arguments always produce the same
+    # paths and bytes. File sizes are log-normal around mean_size; a share of
+    # files goes to binary files and to excluded node_modules folders.
+    rng = random.Random(seed)
+    directories = ['']
+    frontier = ['']
+    for level in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            for index in range(fanout):
+                directory = os.path.join(parent, f"dir{level}_{index}")
+                directories.append(directory)
+                next_frontier.append(directory)
+        frontier = next_frontier
+
+    stats = {'files': 0, 'bytes': 0, 'binary_files': 0, 'excluded_files': 0, 'directories': len(directories)}
+    for number in range(files):
+        directory = rng.choice(directories)
+        if rng.random() < excluded_ratio:
+            directory = os.path.join(directory, EXCLUDED_DIR, f"pkg{rng.randint(0, 9)}")
+            stats['excluded_files'] += 1
+        size = max(16, int(rng.lognormvariate(0, size_sigma) * mean_size / 1.6))
+        if rng.random() < binary_ratio:
+            name = f"blob{number}.png"
+            data = b'\x89PNG\r\n\x1a\n' + rng.randbytes(size)
+            stats['binary_files'] += 1
+        else:
+            file_type = rng.choice(TEXT_TYPES)
+            name = f"file{number}.{file_type}"
+            data = synthetic_text(rng, file_type, size).encode('utf-8')
+        path = os.path.join(root, directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        stats['files'] += 1
+        stats['bytes'] += len(data)
+    return stats
+
+class GithubStub:
+    # Serves a local tree through the GitHub endpoints GithubDownloader uses:
+    # repository info, tarball, recursive git tree (with ETag) and raw blobs.
+    def __init__(self, root, repo=BENCH_REPO, branch='main'):
+        from github_download import git_blob_sha
+
+        self.root = root
+        self.repo = repo
+        self.branch = branch
+        self.requests = 0
+        self.blobs = {}
+        entries = []
+        for directory, dirs, names in os.walk(root):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(directory, name)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                sha = git_blob_sha(data)
+                self.blobs[sha] = data
+                entries.append({'path': os.path.relpath(path, root).replace(os.sep, '/'), 'mode': '100644',
+                                'type': 'blob', 'sha': sha, 'size': len(data)})
+        self.tree = json.dumps({'sha': 'benchtree', 'tree': entries, 'truncated': False}).encode('utf-8')
+        self.etag = '"' + hashlib.sha1(self.tree).hexdigest() + '"'
+        self.tarball = self.build_tarball()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def build_tarball(self):
+        buffer = io.BytesIO()
+        prefix = self.repo.replace('/', '-') + '-bench'
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            archive.add(self.root, arcname=prefix)
+        return buffer.getvalue()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send(self, status, body=b'', content_type='application/json', headers=()):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stub.requests += 1
+                path = self.path.split('?')[0]
+                base = f"/repos/{stub.repo}"
+                if path == base:
+                    self.send(200, json.dumps({'default_branch': stub.branch}).encode('utf-8'))
+                elif path.startswith(base + '/tarball'):
+                    self.send(200, stub.tarball, 'application/x-gzip')
+                elif path.startswith(base + '/git/trees/'):
+                    if self.headers.get('If-None-Match') == stub.etag:
+                        self.send(304, headers=[('ETag', stub.etag)])
+                    else:
+                        self.send(200, stub.tree, headers=[('ETag', stub.etag)])
+                elif path.startswith(base + '/git/blobs/'):
+                    data = stub.blobs.get(path.rsplit('/', 1)[1])
+                    if data is None:
+                        self.send(404, b'{"message": "Not Found"}')
+                    else:
+                        self.send(200, data, 'application/octet-stream')
+                else:
+                    self.send(404, b'{"message": "Not Found"}')
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+def reset_peak_rss():
+    # Linux lets a process reset its high-water mark; elsewhere the peak is
+    # the process-wide maximum so far.
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def measure(stage, func, repeat=1):
+    # Runs func() (returning (files, bytes)) repeat times and keeps the
+    # fastest run.
+    best = None
+    for _ in range(repeat):
+        reset_peak_rss()
+        start = time.perf_counter()
+        files, size = func()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best[0]:
+            best = (seconds, files, size, peak_rss_mb())
+    seconds, files, size, peak = best
+    return {
+        'stage': stage,
+        'seconds': round(seconds, 6),
+        'files': files,
+        'bytes': size,
+        'files_per_s': round(files / seconds, 1) if seconds else None,
+        'mb_per_s': round(size / seconds / 1e6, 2) if seconds else None,
+        'peak_rss_mb': round(peak, 1),
+    }
+
+def text_bytes(records):
+    return sum(len(content.encode('utf-8')) for _, content in records if isinstance(content, str))
+
+def run_benchmarks(args, workspace):
+    from core import (
+        DEFAULT_EXCLUDED_FOLDERS, EXPORT_TYPES, CollectionCache, Deduplicator, collect, export,
+        make_preview, scan
+    )
+    from github_download import GithubDownloader
+    from minifiers import minify_records
+
+    tree = os.path.join(workspace, 'tree')
+    tree_stats = generate_tree(tree, args.files, args.depth, args.fanout, args.mean_size, args.size_sigma,
+                               args.binary_ratio, args.excluded_ratio, args.seed)
+    excluded = DEFAULT_EXCLUDED_FOLDERS
+    results = []
+
+    def run(stage, func):
+        if args.stage and not any(stage.startswith(prefix) for prefix in args.stage):
+            return
+        result = measure(stage, func, args.repeat)
+        results.append(result)
+        print(f"{stage:<24} {result['seconds']:>9.3f}s {result['files_per_s'] or 0:>11,.0f} files/s "
+              f"{result['mb_per_s'] or 0:>8.2f} MB/s {result['peak_rss_mb']:>8.1f} MB", file=sys.stderr)
+
+    def scan_stage():
+        paths = list(scan([tree], [], excluded))
+        return len(paths), sum(os.path.getsize(path) for path in paths)
+    run('scan', scan_stage)
+
+    records = []
+
+    def read_stage():
+        records[:] = collect([tree], [], excluded, read_workers=args.workers, on_skip=lambda *skip: None)
+        return len(records), text_bytes(records)
+    run('read', read_stage)
+    if not records:
+        # Later stages need the records even when the read stage is not run.
+        read_stage()
+
+    cache_path = os.path.join(workspace, 'cache.sqlite3')
+
+    def cached_stage():
+        cache = CollectionCache(cache_path)
+        try:
+            collected = list(collect([tree], [], excluded, read_workers=args.workers, cache=cache,
+                                     on_skip=lambda *skip: None))
+        finally:
+            cache.close()
+        return len(collected), text_bytes(collected)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    run('read_cache_cold', cached_stage)
+    run('read_cache_warm', cached_stage)
+
+    def dedup_stage():
+        deduplicator = Deduplicator()
+        for file_path, content in records:
+            deduplicator.process(file_path, content)
+        return len(records), text_bytes(records)
+    run('dedup', dedup_stage)
+
+    def preview_stage():
+        for _, content in records:
+            make_preview(content)
+        return len(records), text_bytes(records)
+    run('preview', preview_stage)
+
+    def minify_stage():
+        minified = list(minify_records(records, workers=args.workers))
+        return len(minified), text_bytes(records)
+    run('minify', minify_stage)
+
+    export_path = os.path.join(workspace, 'export')
+    for export_type in EXPORT_TYPES:
+        for compression in (None, 'gzip'):
+            def export_stage(export_type=export_type, compression=compression):
+                export(records, export_path, export_type, compression=compression)
+                return len(records), text_bytes(records)
+            run(f"export_{export_type}" + (f"_{compression}" if compression else ''), export_stage)
+
+    with GithubStub(tree) as stub:
+        repo_url = f"https://github.com/{BENCH_REPO}"
+        download_bytes = sum(len(data) for data in stub.blobs.values())
+
+        def archive_stage():
+            output = os.path.join(workspace, 'archive')
+            shutil.rmtree(output, ignore_errors=True)
+            os.makedirs(output)
+            GithubDownloader(repo_url, output, [], excluded, stub.url).download('archive')
+            return len(stub.blobs), download_bytes
+        run('github_archive', archive_stage)
+
+        sync_output = os.path.join(workspace, 'sync')
+
+        def sync_stage(cold):
+            if cold:
+                shutil.rmtree(sync_output, ignore_errors=True)
+                shutil.rmtree(os.environ['CONTENT_COLLECTOR_HOME'], ignore_errors=True)
+            os.makedirs(sync_output, exist_ok=True)
+            GithubDownloader(repo_url, sync_output, [], excluded, stub.url).download('sync')
+            return len(stub.blobs), download_bytes
+        run('github_sync_cold', lambda: sync_stage(True))
+        run('github_sync_warm', lambda: sync_stage(False))
+
+    return tree_stats, results
+
+def compare(results, baseline_path, threshold):
+    # Prints the change in time per stage against a saved run. Returns the
+    # stages slower than threshold percent.
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {result['stage']: result for result in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        before = baseline.get(result['stage'])
+        if not before or not before['seconds']:
+            continue
+        change = (result['seconds'] - before['seconds']) * 100 / before['seconds']
+        print(f"{result['stage']:<24} {before['seconds']:>9.3f}s -> {result['seconds']:>9.3f}s {change:>+7.1f}%",
+              file=sys.stderr)
+        if change > threshold:
+            regressions.append(result['stage'])
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='benchmark.py',
+        description="Benchmark scanning, reading, previews, minification, exports and GitHub downloads on a "
+                    "synthetic tree. Results are written as JSON."
+    )
+    parser.add_argument('-n', '--files', type=int, default=2000, help="number of files to generate")
+    parser.add_argument('--depth', type=int, default=4, help="directory depth")
+    parser.add_argument('--fanout', type=int, default=4, help="subdirectories per directory")
+    parser.add_argument('--mean-size', type=int, default=4096, help="typical file size in bytes")
+    parser.add_argument('--size-sigma', type=float, default=1.0, help="spread of the log-normal size distribution")
+    parser.add_argument('--binary-ratio', type=float, default=0.05, help="share of binary files")
+    parser.add_argument('--excluded-ratio', type=float, default=0.2,
+                        help=f"share of files placed under excluded {EXCLUDED_DIR} folders")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the generator")
+    parser.add_argument('-w', '--workers', type=int, default=8, help="read and minify workers")
+    parser.add_argument('-r', '--repeat', type=int, default=1, help="runs per stage, the fastest is kept")
+    parser.add_argument('-s', '--stage', action='append', help="only run stages starting with this, repeatable")
+    parser.add_argument('-o', '--output', default='-', help="JSON output file, '-' for stdout (default)")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help="with --compare, exit with 1 if a stage is slower by more than this percentage")
+    parser.add_argument('--keep', action='store_true', help="keep the generated tree and outputs")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    workspace = tempfile.mkdtemp(prefix='content-collector-bench-')
+    # Cache, blob store and sync state stay inside the workspace.
+    os.environ['CONTENT_COLLECTOR_HOME'] = os.path.join(workspace, 'home')
+    try:
+        tree_stats, results = run_benchmarks(args, workspace)
+    finally:
+        if args.keep:
+            print(f"Kept {workspace}", file=sys.stderr)
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'parameters': {key: value for key, value in vars(args).items()
+                           if key not in ('output', 'compare', 'threshold', 'keep')},
+            'tree': tree_stats,
+        },
+        'results': results,
+    }
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import re
+import sys
+import argparse
+
+from core import (
+    COMPRESSION_SUFFIXES, DEFAULT_CACHE_PATH, DEFAULT_EXCLUDED_FOLDERS, DEFAULT_MAX_FILE_SIZE, DEFAULT_PROFILES,
+    DEFAULT_READ_WORKERS, DEFAULT_TOKEN_ESTIMATOR, ENCODING_FALLBACKS, EXPORT_TYPES, OVERSIZE_POLICIES, SKIP_REASONS,
+    TOKEN_ESTIMATORS, CollectionCache, Deduplicator, FileReader, collect, compressed_path, compression_for_path, export, scan
+)
+from metrics import METRICS_FORMATS, Metrics
+from patterns import PathFilter
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='content-collector',
+        description="Collect file contents from folders and export them without the GUI."
+    )
+    parser.add_argument('folders', nargs='+', help="folders, archives (.zip, .tar, .tar.gz, ...) or git repositories as PATH@REF to scan")
+    parser.add_argument('-p', '--profile', choices=[name for name in DEFAULT_PROFILES if name],
+                        help="built-in profile providing file types and excluded folders")
+    parser.add_argument('-t', '--file-type', dest='file_types', action='append',
+                        help="file type to include, repeatable (overrides the profile)")
+    parser.add_argument('-x', '--exclude', dest='excluded_folders', action='append',
+                        help="folder name to exclude, repeatable (overrides the profile)")
+    parser.add_argument('-e', '--exclude-pattern', dest='exclude_patterns', action='append',
+                        help="gitignore-style pattern to exclude, repeatable (overrides the profile)")
+    parser.add_argument('-i', '--include-pattern', dest='include_patterns', action='append',
+                        help="gitignore-style pattern files must match, repeatable (overrides the profile)")
+    parser.add_argument('--gitignore', dest='use_gitignore', action='store_true', default=None,
+                        help="honour .gitignore files (default: from the profile)")
+    parser.add_argument('--no-gitignore', dest='use_gitignore', action='store_false', help="ignore .gitignore files")
+    parser.add_argument('-f', '--format', choices=EXPORT_TYPES, default='plain_text', help="export format")
+    parser.add_argument('-o', '--output', default='-', help="output file, '-' for stdout (default)")
+    parser.add_argument('-z', '--compress', choices=list(COMPRESSION_SUFFIXES), default=None,
+                        help="compress the export (default: from the output suffix, .gz or .zst)")
+    parser.add_argument('-m', '--minify', action='store_true', help="strip comments and redundant whitespace, per file type")
+    parser.add_argument('-r', '--relative', action='store_true', help="use paths relative to each folder")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of read workers")
+    parser.add_argument('--max-file-size', type=int, default=None,
+                        help="size limit in MB, 0 for no limit (default: profile or 10)")
+    parser.add_argument('--oversize', choices=list(OVERSIZE_POLICIES.values()), default=None,
+                        help="what to do with files over the size limit")
+    parser.add_argument('--encoding-fallback', choices=list(ENCODING_FALLBACKS.values()), default=None,
+                        help="what to do with files that are not valid UTF-8")
+    parser.add_argument('-d', '--dedup', action='store_true',
+                        help="export files identical to an earlier one as a reference to it")
+    parser.add_argument('-g', '--grep', metavar='TEXT', help="only export files whose content contains TEXT")
+    parser.add_argument('--regex', action='store_true', help="treat --grep as a regular expression")
+    parser.add_argument('--match-case', action='store_true', help="make --grep case-sensitive")
+    parser.add_argument('--shard-limit', type=int, default=None,
+                        help="split the export into numbered shards of at most this many tokens or bytes")
+    parser.add_argument('--shard-unit', choices=['tokens', 'bytes'], default='tokens', help="unit of --shard-limit")
+    parser.add_argument('--token-estimator', choices=list(TOKEN_ESTIMATORS), default=DEFAULT_TOKEN_ESTIMATOR,
+                        help="how tokens are estimated for sharding")
+    parser.add_argument('--snapshot', metavar='FILE', nargs='?', const=True, default=None,
+                        help="write the path and content hash of every exported file to FILE "
+                             "(default: next to the output, as NAME.snapshot.json)")
+    parser.add_argument('--delta-from', metavar='SNAPSHOT',
+                        help="only export the files added, modified or deleted since the export SNAPSHOT was written "
+                             "with (plain_text or jsonl); implies --snapshot")
+    parser.add_argument('--cache', action='store_true',
+                        help="keep decoded contents in the collection cache; faster only where reading files is slow, "
+                             "e.g. on network drives")
+    parser.add_argument('--no-cache', action='store_false', dest='cache', help=argparse.SUPPRESS)
+    parser.add_argument('--stats', action='store_true',
+                        help="print time per phase, skips and the slowest and largest files to stderr")
+    parser.add_argument('--metrics', metavar='FILE', help="write the run's metrics to FILE")
+    parser.add_argument('--metrics-format', choices=METRICS_FORMATS, default='json',
+                        help="metrics as a JSON summary or a Chrome trace (chrome://tracing, Perfetto)")
+    parser.add_argument('--list', action='store_true', help="only list the files that would be collected")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.shard_limit is not None and args.output == '-':
+        print("Sharding needs an output file (-o)", file=sys.stderr)
+        return 2
+    if args.delta_from and args.snapshot is None:
+        args.snapshot = True
+    if args.snapshot is not None and args.shard_limit is not None:
+        print("--snapshot and --delta-from can't be combined with sharding", file=sys.stderr)
+        return 2
+    if args.snapshot is True and args.output == '-':
+        print("Writing to stdout needs a snapshot file (--snapshot FILE)", file=sys.stderr)
+        return 2
+    if args.delta_from and args.format not in ('plain_text', 'jsonl'):
+        print("Delta exports are written as plain_text or jsonl", file=sys.stderr)
+        return 2
+    if args.delta_from and args.grep:
+        # Files the search leaves out would be written as deleted.
+        print("--delta-from can't be combined with --grep", file=sys.stderr)
+        return 2
+    profile = DEFAULT_PROFILES[args.profile] if args.profile else {}
+    file_types = args.file_types or profile.get('file_types', [])
+    if args.excluded_folders is not None:
+        excluded_folders = args.excluded_folders
+    else:
+        excluded_folders = profile.get('excluded_folders', DEFAULT_EXCLUDED_FOLDERS)
+    path_filter = PathFilter(
+        args.include_patterns if args.include_patterns is not None else profile.get('include_patterns', []),
+        args.exclude_patterns if args.exclude_patterns is not None else profile.get('exclude_patterns', []),
+        args.use_gitignore if args.use_gitignore is not None else profile.get('use_gitignore', False)
+    )
+    read_workers = args.workers or profile.get('read_workers', DEFAULT_READ_WORKERS)
+    if args.max_file_size is not None:
+        max_file_size = args.max_file_size * 1024 * 1024
+    else:
+        max_file_size = profile.get('max_file_size', DEFAULT_MAX_FILE_SIZE)
+    reader = FileReader(
+        max_file_size,
+        args.oversize or profile.get('oversize_policy', 'skip'),
+        args.encoding_fallback or profile.get('encoding_fallback', 'skip')
+    )
+
+    compression = args.compress or compression_for_path(args.output)
+    if args.compress:
+        implied = compression_for_path(args.output)
+        if implied and implied != args.compress:
+            print(f"-z {args.compress} contradicts the output suffix of {args.output}", file=sys.stderr)
+            return 2
+        # Same as the GUI: "-z gzip -o out.jsonl" writes out.jsonl.gz.
+        args.output = compressed_path(args.output, compression)
+    query = None
+    if args.grep:
+        from search import SearchQuery
+        try:
+            query = SearchQuery(args.grep, args.regex, args.match_case)
+        except re.error as e:
+            print(f"Invalid regex: {str(e)}", file=sys.stderr)
+            return 2
+    snapshot = previous = None
+    if args.snapshot is not None:
+        from snapshots import Snapshot, snapshot_path
+        snapshot = Snapshot()
+        snapshot_file = snapshot_path(args.output) if args.snapshot is True else args.snapshot
+        if args.delta_from:
+            try:
+                previous = Snapshot.load(args.delta_from)
+            except (OSError, ValueError) as e:
+                print(f"Could not read snapshot: {str(e)}", file=sys.stderr)
+                return 2
+
+    if args.list:
+        for file_path in scan(args.folders, file_types, excluded_folders, path_filter):
+            print(file_path)
+        return 0
+
+    skipped = []
+    minify_stats = None
+    if args.minify:
+        from minifiers import MinifyStats
+        minify_stats = MinifyStats()
+    deduplicator = Deduplicator() if args.dedup else None
+    metrics = Metrics() if args.stats or args.metrics else None
+    cache = CollectionCache(DEFAULT_CACHE_PATH) if args.cache else None
+    try:
+        records = collect(args.folders, file_types, excluded_folders, args.relative, read_workers, cache,
+                          on_skip=lambda *skip: skipped.append(skip), reader=reader, deduplicator=deduplicator,
+                          path_filter=path_filter, metrics=metrics)
+        if query is not None:
+            from search import filter_records
+            records = filter_records(records, query)
+        if args.shard_limit is not None:
+            from sharding import export_shards
+            manifest = export_shards(records, args.output, args.format, args.shard_limit, args.shard_unit,
+                                     args.token_estimator, minify=args.minify, compression=compression,
+                                     minify_stats=minify_stats, metrics=metrics)
+            print(f"Wrote {len(manifest['shards'])} shards", file=sys.stderr)
+        else:
+            export(records, args.output, args.format, minify=args.minify, compression=compression,
+                   minify_stats=minify_stats, metrics=metrics, snapshot=snapshot, previous=previous)
+            if snapshot is not None:
+                snapshot.save(snapshot_file)
+    except Exception as e:
+        if metrics is not None:
+            metrics.error('export', str(e))
+            if args.metrics:
+                metrics.save(args.metrics, args.metrics_format)
+        raise
+    finally:
+        if cache is not None:
+            cache.close()
+
+    for file_path, reason, message in skipped:
+        print(f"Skipped {file_path} ({SKIP_REASONS[reason]}): {message}", file=sys.stderr)
+    if minify_stats is not None:
+        for line in minify_stats.summary():
+            print(f"Minified {line}", file=sys.stderr)
+    if deduplicator is not None and deduplicator.duplicates:
+        print(f"Deduplicated {deduplicator.duplicates} files, saving {deduplicator.bytes_saved} bytes", file=sys.stderr)
+    if previous is not None:
+        print(f"Delta: {snapshot.summary()}, {snapshot.changes['unchanged']} unchanged", file=sys.stderr)
+    if args.stats:
+        for line in metrics.report():
+            print(line, file=sys.stderr)
+    if args.metrics:
+        metrics.save(args.metrics, args.metrics_format)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1268 @@
+import os
+import re
+import sys
+import json
+import tempfile
+import shutil
+import threading
+import time
+import sqlite3
+import mmap
+import codecs
+import hashlib
+import gzip
+import io
+import zlib
+import struct
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import ProgressEstimator
+from patterns import GITIGNORE_NAME
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DEFAULT_READ_WORKERS = 8
+MAX_READ_WORKERS = 64
+APP_DATA_DIR = os.environ.get('CONTENT_COLLECTOR_HOME') or os.path.join(os.path.expanduser('~'), '.content_collector')
+DEFAULT_CACHE_PATH = os.path.join(APP_DATA_DIR, 'collection_cache.sqlite3')
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024
+OVERSIZE_POLICIES = {
+    "Skip": 'skip',
+    "Truncate": 'truncate',
+}
+ENCODING_FALLBACKS = {
+    "Skip": 'skip',
+    "Replace Invalid Bytes": 'replace',
+    "Latin-1": 'latin-1',
+}
+SKIP_REASONS = {
+    'binary': "Binary file",
+    'too_large': "File too large",
+    'decode_error': "Not valid UTF-8",
+    'read_error': "Read error",
+}
+DEFAULT_EXCLUDED_FOLDERS = ["node_modules", "vendor", ".git", ".idea", ".github", ".husky", ".vscode", ".archive", ".cypress", ".scaffoldes", ".storybook", "build", "dist", "public"]
+DEFAULT_PROFILES = {
+    "": {
+        'file_types': [],
+        'excluded_folders': [],
+        'include_patterns': [],
+        'exclude_patterns': [],
+        'use_gitignore': False,
+        'read_workers': DEFAULT_READ_WORKERS,
+        'max_file_size': DEFAULT_MAX_FILE_SIZE,
+        'oversize_policy': 'skip',
+        'encoding_fallback': 'skip'
+    },
+    "Node/TypeScript Project": {
+        'file_types': ['ts', 'tsx', 'js', 'jsx', 'json', 'yaml', 'yml', 'md', 'html', 'css', 'scss', 'less', 'graphql'],
+        'excluded_folders': ['build', 'dist', 'node_modules', 'public', 'vendor'],
+        'include_patterns': [],
+        'exclude_patterns': ['*.min.js', '*.min.css'],
+        'use_gitignore': True,
+        'read_workers': DEFAULT_READ_WORKERS,
+        'max_file_size': DEFAULT_MAX_FILE_SIZE,
+        'oversize_policy': 'skip',
+        'encoding_fallback': 'skip'
+    },
+    "PHP Project": {
+        'file_types': ['php', 'html', 'css', 'scss', 'less', 'js', 'json', 'yaml', 'yml', 'md', 'xml', 'twig', 'blade.php'],
+        'excluded_folders': ['build', 'dist', 'node_modules', 'public', 'vendor'],
+        'include_patterns': [],
+        'exclude_patterns': ['*.min.js', '*.min.css'],
+        'use_gitignore': True,
+        'read_workers': DEFAULT_READ_WORKERS,
+        'max_file_size': DEFAULT_MAX_FILE_SIZE,
+        'oversize_policy': 'skip',
+        'encoding_fallback': 'skip'
+    },
+    "Python Project": {
+        'file_types': ['py', 'ipynb', 'json', 'yaml', 'yml', 'md', 'txt', 'html', 'css', 'js', 'csv', 'tsv', 'ini', 'cfg', 'rst'],
+        'excluded_folders': ['__pycache__', '.ipynb_checkpoints', 'build', 'dist', 'node_modules', 'public', 'vendor'],
+        'include_patterns': [],
+        'exclude_patterns': ['*.min.js', '*.min.css'],
+        'use_gitignore': True,
+        'read_workers': DEFAULT_READ_WORKERS,
+        'max_file_size': DEFAULT_MAX_FILE_SIZE,
+        'oversize_policy': 'skip',
+        'encoding_fallback': 'skip'
+    }
+}
+EXPORT_TYPES = ('plain_text', 'json', 'yaml', 'yaml_stream', 'jsonl', 'indexed')
+COMPRESSIONS = {
+    "None": None,
+    "gzip": 'gzip',
+    "zstd": 'zstd',
+}
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+def compile_extension_matcher(file_types):
+    if not file_types:
+        return lambda name: True
+    suffixes = tuple(file_types)
+    return lambda name: name.endswith(suffixes)
+
+class DirectoryScanner:
+    def __init__(self, folders, file_types, excluded_folders, path_filter=None, weigh=None):
+        self.folders = folders
+        self.excluded_folders = set(excluded_folders)
+        self.matches = compile_extension_matcher(file_types)
+        # A patterns.PathFilter; ignored directories are never opened.
+        self.path_filter = path_filter or None
+        self.files_found = 0
+        self.dirs_scanned = 0
+        self.dirs_pending = 0
+        # With weigh, weigh(size) of every file yielded and not yet taken by
+        # the consumer, for byte-weighted progress.
+        self.weigh = weigh
+        self.sizes = {}
+        self.bytes_found = 0
+
+    def estimated_total(self):
+        # Refined on every directory: assume each directory still queued holds
+        # as many matching files as the average directory scanned so far.
+        if not self.dirs_scanned:
+            return max(self.files_found, 1)
+        per_dir = self.files_found / self.dirs_scanned
+        return max(int(self.files_found + self.dirs_pending * per_dir), self.files_found, 1)
+
+    def estimated_total_bytes(self):
+        if not self.dirs_scanned:
+            return max(self.bytes_found, 1)
+        per_dir = self.bytes_found / self.dirs_scanned
+        return max(int(self.bytes_found + self.dirs_pending * per_dir), self.bytes_found, 1)
+
+    def scan(self):
+        # Yields (folder, file_path) in the same order os.walk would visit them.
+        path_filter = self.path_filter
+        for folder in self.folders:
+            stack = [(folder, path_filter.root_context(folder) if path_filter else None)]
+            self.dirs_pending += 1
+            while stack:
+                root, context = stack.pop()
+                self.dirs_pending -= 1
+                files = []
+                subdirs = []
+                try:
+                    with os.scandir(root) as entries:
+                        entries = list(entries)
+                except OSError:
+                    entries = []
+                if path_filter:
+                    context = path_filter.enter(context, root, any(entry.name == GITIGNORE_NAME for entry in entries))
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if entry.name in self.excluded_folders or entry.is_symlink():
+                            continue
+                        if path_filter and path_filter.ignored(context, folder, entry.path, True):
+                            continue
+                        subdirs.append((entry.path, context))
+                    elif self.matches(entry.name):
+                        if path_filter and (path_filter.ignored(context, folder, entry.path, False)
+                                            or not path_filter.included(folder, entry.path)):
+                            continue
+                        files.append(entry.path)
+                        if self.weigh is not None:
+                            try:
+                                size = self.weigh(entry.stat().st_size)
+                            except OSError:
+                                size = 0
+                            self.sizes[entry.path] = size
+                            self.bytes_found += size
+                self.dirs_scanned += 1
+                self.files_found += len(files)
+                self.dirs_pending += len(subdirs)
+                stack.extend(reversed(subdirs))
+                for file_path in files:
+                    yield folder, file_path
+
+SNIFF_SIZE = 8192
+MMAP_THRESHOLD = 1024 * 1024
+BINARY_SIGNATURES = (
+    b'\x89PNG', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'%PDF-', b'PK\x03\x04', b'\x1f\x8b', b'BZh',
+    b'\xfd7zXZ\x00', b'7z\xbc\xaf\x27\x1c', b'Rar!\x1a\x07', b'\x28\xb5\x2f\xfd', b'\x7fELF',
+    b'\xca\xfe\xba\xbe', b'\xcf\xfa\xed\xfe', b'\xce\xfa\xed\xfe', b'\x00asm', b'SQLite format 3\x00',
+    b'OggS', b'fLaC', b'wOFF', b'wOF2', b'\xff\xfe', b'\xfe\xff',
+)
+
+class SkippedFile(Exception):
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+def is_binary_header(head):
+    return head.startswith(BINARY_SIGNATURES) or b'\0' in head
+
+class FileReader:
+    # Classifies a file from its size and a small header before reading it,
+    # so binaries and oversized files are never read in full.
+    def __init__(self, max_file_size=DEFAULT_MAX_FILE_SIZE, oversize_policy='skip', encoding_fallback='skip'):
+        self.max_file_size = max_file_size
+        self.oversize_policy = oversize_policy
+        self.encoding_fallback = encoding_fallback
+
+    def read(self, file_path, size=None):
+        return self.read_exact(file_path, size)[0]
+
+    def bytes_to_read(self, size):
+        # What reading a file of this size costs: oversized files are
+        # truncated or skipped without reading.
+        if self.max_file_size and size > self.max_file_size:
+            return self.max_file_size if self.oversize_policy == 'truncate' else 0
+        return size
+
+    def limit_for(self, size):
+        # How many bytes of a file of this size to read; raises SkippedFile if
+        # it is skipped for its size alone.
+        if self.max_file_size and size > self.max_file_size:
+            if self.oversize_policy != 'truncate':
+                raise SkippedFile('too_large', f"{size} bytes exceeds the {self.max_file_size} byte limit")
+            return self.max_file_size
+        return size
+
+    def read_exact(self, file_path, size=None):
+        # Returns (content, exact); exact is False if the content was
+        # truncated or decoded with the fallback encoding.
+        if size is None:
+            size = os.stat(file_path).st_size
+        limit = self.limit_for(size)
+
+        with open(file_path, 'rb') as f:
+            head = f.read(min(SNIFF_SIZE, limit))
+            if is_binary_header(head):
+                raise SkippedFile('binary', "Binary content detected")
+            if len(head) >= limit:
+                data = head
+            elif limit >= MMAP_THRESHOLD:
+                # The NUL scan runs over the mapping in C, so a large file
+                # whose header looks like text is still rejected before decoding.
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if mapped.find(b'\0', 0, limit) != -1:
+                        raise SkippedFile('binary', "Binary content detected")
+                    data = mapped[:limit]
+            else:
+                data = head + f.read(limit - len(head))
+        return self.decode(data, limit == size)
+
+    def read_stream(self, f, size):
+        # Same as read_exact for an open binary stream of a known size, such
+        # as an archive member.
+        limit = self.limit_for(size)
+        head = f.read(min(SNIFF_SIZE, limit))
+        if is_binary_header(head):
+            raise SkippedFile('binary', "Binary content detected")
+        data = head if len(head) >= limit else head + f.read(limit - len(head))
+        if limit >= MMAP_THRESHOLD and data.find(b'\0', len(head)) != -1:
+            raise SkippedFile('binary', "Binary content detected")
+        return self.decode(data, limit == size)
+
+    def decode(self, data, exact):
+        # Returns (text, exact) for the bytes read from a file.
+        try:
+            if exact:
+                text = data.decode('utf-8')
+            else:
+                # Drops a multi-byte character cut in half by the truncation.
+                text = codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+        except UnicodeDecodeError as e:
+            if self.encoding_fallback == 'replace':
+                text = data.decode('utf-8', errors='replace')
+            elif self.encoding_fallback == 'latin-1':
+                text = data.decode('latin-1')
+            else:
+                raise SkippedFile('decode_error', str(e))
+            exact = False
+        # Same newline handling as reading the file in text mode.
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text, exact
+
+READ_BATCH_FILES = 32
+# Threads only add overhead when they cannot run side by side.
+AVAILABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+def ordered_parallel_map(func, items, workers, batch=READ_BATCH_FILES):
+    # Yields (item, result, error) in input order. Items go to the workers in
+    # batches, since a future per small file costs more than reading it, and
+    # with a single CPU they are mapped in this thread. At most workers + 1
+    # batches are in flight, so a lazy input (the scanner) is never drained
+    # far ahead.
+    if workers <= 1 or AVAILABLE_CPUS <= 1:
+        for item in items:
+            yield _apply(func, item)
+        return
+
+    def run_batch(batch_items):
+        return [_apply(func, item) for item in batch_items]
+
+    max_pending = workers + 1
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch_items in batched(items, batch):
+            pending.append(executor.submit(run_batch, batch_items))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def batched(items, size):
+    batch_items = []
+    for item in items:
+        batch_items.append(item)
+        if len(batch_items) == size:
+            yield batch_items
+            batch_items = []
+    if batch_items:
+        yield batch_items
+
+def _apply(func, item):
+    try:
+        return item, func(item), None
+    except Exception as e:
+        return item, None, e
+
+class CollectionCache:
+    # Decoded file contents keyed by path and validated against
+    # (size, mtime_ns, inode), so unchanged files are served at stat speed.
+    # Once the keys under the collected folders are loaded, a file whose stat
+    # does not match is a miss without a query, and hits fetch their content
+    # on a connection of the reading thread, so readers never wait on each
+    # other. Writes are batched on the connection of the opening thread.
+    FLUSH_EVERY = 500
+    # last_used is only refreshed for hits older than this.
+    TOUCH_AFTER = 24 * 60 * 60
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_MAX_BYTES, max_age=DEFAULT_CACHE_MAX_AGE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.readers = []
+        self.keys = None
+        self.pending_puts = []
+        self.pending_hits = []
+        self.written = False
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, '
+            'content TEXT, last_used REAL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)')
+        self.conn.commit()
+
+    def load_keys(self, folders):
+        # Loads the stat keys of the entries under folders, a range of the
+        # primary key each, without their content.
+        keys = {}
+        for folder in folders:
+            prefix = os.path.join(folder, '')
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            for path, size, mtime_ns, inode, last_used in self.conn.execute(
+                    'SELECT path, size, mtime_ns, inode, last_used FROM files WHERE path >= ? AND path < ?',
+                    (prefix, upper)):
+                keys[path] = (size, mtime_ns, inode, last_used)
+        self.keys = keys
+
+    def reader_conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path, check_same_thread=False)
+            with self.lock:
+                self.readers.append(conn)
+        return conn
+
+    def get(self, file_path, stat):
+        if self.keys is not None:
+            key = self.keys.get(file_path)
+            if key is None or key[:3] != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                with self.lock:
+                    self.misses += 1
+                return None
+        row = self.reader_conn().execute(
+            'SELECT content, last_used FROM files WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?',
+            (file_path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        ).fetchone()
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if row[1] is None or row[1] < time.time() - self.TOUCH_AFTER:
+                self.pending_hits.append(file_path)
+        return row[0]
+
+    def put(self, file_path, stat, content):
+        with self.lock:
+            self.pending_puts.append((file_path, stat.st_size, stat.st_mtime_ns, stat.st_ino, content))
+            if len(self.pending_puts) >= self.FLUSH_EVERY:
+                self._flush()
+
+    def read(self, file_path, reader):
+        stat = os.stat(file_path)
+        if reader.max_file_size and stat.st_size > reader.max_file_size:
+            return reader.read(file_path, stat.st_size)
+        content = self.get(file_path, stat)
+        if content is None:
+            content, exact = reader.read_exact(file_path, stat.st_size)
+            # Only exact reads are cached, so a later run with a different
+            # fallback policy never sees another policy's output.
+            if exact:
+                self.put(file_path, stat, content)
+        return content
+
+    def _flush(self):
+        if not self.pending_puts and not self.pending_hits:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, content, last_used) VALUES (?, ?, ?, ?, ?, ?)',
+                [entry + (now,) for entry in self.pending_puts]
+            )
+            self.conn.executemany('UPDATE files SET last_used = ? WHERE path = ?', [(now, path) for path in self.pending_hits])
+        self.written = self.written or bool(self.pending_puts)
+        self.pending_puts = []
+        self.pending_hits = []
+
+    def evict(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM files WHERE last_used < ?', (time.time() - self.max_age,))
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM files').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            stale = []
+            for path, size in self.conn.execute('SELECT path, size FROM files ORDER BY last_used'):
+                if total <= self.max_bytes:
+                    break
+                stale.append((path,))
+                total -= size
+            self.conn.executemany('DELETE FROM files WHERE path = ?', stale)
+
+    def close(self):
+        with self.lock:
+            for conn in self.readers:
+                conn.close()
+            self._flush()
+            # Nothing can have grown past the limits without a write.
+            if self.written:
+                self.evict()
+            self.conn.close()
+
+def content_digest(data):
+    if xxhash is not None:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class DuplicateReference:
+    # Stands in for the content of a file identical to one collected earlier.
+    # Outputs that leave the canonical file out look its text up instead, see
+    # resolve_duplicates.
+    __slots__ = ('canonical_path', 'size', 'digest')
+
+    def __init__(self, canonical_path, size, digest=None):
+        self.canonical_path = canonical_path
+        self.size = size
+        self.digest = digest
+
+    def __str__(self):
+        return f"Duplicate of: {self.canonical_path}"
+
+    def __eq__(self, other):
+        return isinstance(other, DuplicateReference) and other.canonical_path == self.canonical_path
+
+    def to_record(self):
+        return {'duplicate_of': self.canonical_path}
+
+def export_value(value):
+    # json default hook: only called for values json can't encode itself.
+    if isinstance(value, DuplicateReference):
+        return value.to_record()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class Deduplicator:
+    def __init__(self):
+        self.canonical_paths = {}
+        self.duplicates = 0
+        self.bytes_saved = 0
+
+    def process(self, file_path, content):
+        data = content.encode('utf-8')
+        digest = content_digest(data)
+        canonical_path = self.canonical_paths.setdefault(digest, file_path)
+        if canonical_path == file_path:
+            return content
+        self.duplicates += 1
+        self.bytes_saved += len(data)
+        return DuplicateReference(canonical_path, len(data), digest)
+
+def resolve_duplicate(content, contents):
+    # The text a DuplicateReference stands for, looked up in contents (file
+    # path -> content), or content itself.
+    if isinstance(content, DuplicateReference):
+        text = contents.get(content.canonical_path)
+        if isinstance(text, str):
+            return text
+    return content
+
+def resolve_duplicates(records, contents=None):
+    # Canonical files come before their duplicates, so a reference whose
+    # canonical file did not come first points outside these records, e.g.
+    # after a search filter, and is replaced by its text from contents.
+    if contents is None:
+        yield from records
+        return
+    written = set()
+    for file_path, content in records:
+        if isinstance(content, DuplicateReference) and content.canonical_path not in written:
+            content = resolve_duplicate(content, contents)
+        written.add(file_path)
+        yield file_path, content
+
+def keep_texts(records, texts):
+    # Passes (file_path, content) records through, keeping their text in
+    # texts by file path.
+    for file_path, content in records:
+        if isinstance(content, str):
+            texts[file_path] = content
+        yield file_path, content
+
+def rebase_duplicates(contents, changed, read=None):
+    # Re-resolves the duplicates in contents whose canonical file is in
+    # changed, before contents is updated: the first of them takes over the
+    # text the canonical file had and the others point to it. Where contents
+    # holds no text, read(file_path) gets it from the duplicate itself; None
+    # leaves that duplicate as it is. Returns file path -> new content.
+    rebased = {}
+    canonical_paths = {}
+    for file_path, content in contents.items():
+        if not isinstance(content, DuplicateReference) or content.canonical_path not in changed or file_path in changed:
+            continue
+        canonical_path = canonical_paths.get(content.canonical_path)
+        if canonical_path is not None:
+            rebased[file_path] = DuplicateReference(canonical_path, content.size, content.digest)
+            continue
+        text = contents.get(content.canonical_path)
+        if not isinstance(text, str):
+            text = read(file_path) if read is not None else None
+            if text is None:
+                continue
+        rebased[file_path] = text
+        canonical_paths[content.canonical_path] = file_path
+    return rebased
+
+def minify_text(text, file_path=''):
+    # Minifies with the minifier registered for the file's type, see
+    # minifiers.py.
+    if isinstance(text, DuplicateReference):
+        return text
+    from minifiers import minify_content
+    return minify_content(file_path, text)
+
+PREVIEW_CHARS = 4000
+PREVIEW_LINES = 80
+DEFAULT_PREVIEW_CACHE_SIZE = 256
+
+def make_preview(content, max_chars=PREVIEW_CHARS, max_lines=PREVIEW_LINES, truncated=False):
+    # Head of the content only: at most max_chars characters and max_lines
+    # lines, never touching the rest.
+    if isinstance(content, DuplicateReference):
+        return str(content)
+    head = content[:max_chars]
+    cut = truncated or len(content) > max_chars
+    position = -1
+    for _ in range(max_lines):
+        position = head.find('\n', position + 1)
+        if position < 0:
+            break
+    else:
+        cut = cut or position + 1 < len(content)
+        head = head[:position + 1]
+    if not cut:
+        return head
+    return head + '...' if head.endswith('\n') else head + '\n...'
+
+def read_preview(file_path, max_chars=PREVIEW_CHARS, max_lines=PREVIEW_LINES):
+    # Reads only the bytes a preview can need from disk. A multibyte
+    # character cut at the end is dropped by the replace handler.
+    with open(file_path, 'rb') as f:
+        head = f.read(max_chars * 4 + 1)
+    return make_preview(head.decode('utf-8', errors='replace'), max_chars, max_lines, len(head) > max_chars * 4)
+
+class LRUCache:
+    def __init__(self, max_entries=DEFAULT_PREVIEW_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+def estimate_tokens_chars(text):
+    # About four characters per token for code and English prose.
+    return (len(text) + 3) // 4
+
+WORD_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+def estimate_tokens_words(text):
+    # Words and punctuation marks, closer to BPE counts on prose.
+    return len(WORD_PATTERN.findall(text))
+
+_tiktoken_encoding = None
+
+def estimate_tokens_tiktoken(text):
+    # Exact counts for OpenAI-style models; needs the optional tiktoken package.
+    global _tiktoken_encoding
+    if _tiktoken_encoding is None:
+        import tiktoken
+        _tiktoken_encoding = tiktoken.get_encoding('cl100k_base')
+    return len(_tiktoken_encoding.encode(text, disallowed_special=()))
+
+TOKEN_ESTIMATORS = {
+    'chars': estimate_tokens_chars,
+    'words': estimate_tokens_words,
+    'tiktoken': estimate_tokens_tiktoken,
+}
+DEFAULT_TOKEN_ESTIMATOR = 'chars'
+
+def register_token_estimator(name, estimator):
+    TOKEN_ESTIMATORS[name] = estimator
+
+def record_size(record):
+    # Size on disk of a record written through a text-mode file.
+    return len(record.encode('utf-8')) + record.count('\n') * (len(os.linesep) - 1)
+
+def copy_bytes(source, target, size, chunk_size=1024 * 1024):
+    while size > 0:
+        chunk = source.read(min(chunk_size, size))
+        if not chunk:
+            break
+        target.write(chunk)
+        size -= len(chunk)
+
+def compression_for_path(path):
+    # 'gzip' for "export.jsonl.gz", 'zstd' for "export.jsonl.zst", else None.
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+def compressed_path(path, compression):
+    suffix = COMPRESSION_SUFFIXES.get(compression, '')
+    return path if path == '-' or path.endswith(suffix) else path + suffix
+
+def open_compressed(path, compression):
+    # Binary write stream compressing into path ('-' for stdout).
+    if compression == 'gzip':
+        if path == '-':
+            return gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb', compresslevel=6)
+        return gzip.open(path, 'wb', compresslevel=6)
+    if compression == 'zstd':
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=3)
+        if path == '-':
+            return compressor.stream_writer(sys.stdout.buffer, closefd=False)
+        return compressor.stream_writer(open(path, 'wb'))
+    raise ValueError(f"Unknown compression: {compression}")
+
+class ExportWriter:
+    # Writes one record at a time so an export never needs the whole
+    # collection in memory.
+    def __init__(self, path, track_records=False, compression=None):
+        self.path = path
+        if compression:
+            # Compressed records can't be patched in place, so they are
+            # never tracked.
+            self.file = io.TextIOWrapper(open_compressed(path, compression), encoding='utf-8')
+            track_records = False
+        else:
+            self.file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+        self.closed = False
+        self.count = 0
+        # (file_path, size) of every record, used by LiveExport to patch
+        # the file in place later.
+        self.records = [] if track_records else None
+
+    def write(self, file_path, file_content):
+        record = self.format_record(file_path, file_content)
+        self.file.write(record)
+        if self.records is not None:
+            self.records.append((file_path, record_size(record)))
+        self.count += 1
+
+    def format_record(self, file_path, file_content):
+        raise NotImplementedError
+
+    def close(self):
+        if self.closed:
+            return
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def format_plain_text_record(file_path, file_content):
+    return f"File: {file_path}\n\n{file_content}\n\n{'='*80}\n\n"
+
+def format_jsonl_record(file_path, file_content):
+    return json.dumps({file_path: file_content}, ensure_ascii=False, default=export_value) + '\n'
+
+_yaml_dumpers = {}
+# libyaml treats characters outside the BMP as unprintable and escapes them,
+# the pure-Python emitter doesn't. Records containing them always go through
+# the pure-Python dumper so both paths write the same bytes.
+ASTRAL_CHARACTERS = re.compile('[\U00010000-\U0010ffff]')
+UNICODE_LINE_BREAKS = re.compile('[\x85\u2028\u2029]')
+# libyaml takes the width as a C int.
+YAML_WIDTH = 2 ** 31 - 1
+
+def yaml_dumper(pure_python=False):
+    # libyaml's CSafeDumper when available. Both dumpers get the same
+    # representers, so the pure-Python fallback writes the same output.
+    if pure_python in _yaml_dumpers:
+        return _yaml_dumpers[pure_python]
+    import yaml
+
+    base = yaml.SafeDumper if pure_python else getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+    class ContentDumper(base):
+        pass
+
+    def represent_str(dumper, value):
+        # Literal block scalars keep file bodies readable and avoid escaping.
+        # The emitter falls back to a quoted style if a body can't be literal.
+        # The pure-Python emitter writes NEL and the Unicode line and paragraph
+        # separators raw in unquoted and single-quoted scalars, where they read
+        # back as line breaks, so those always get escaped in double quotes.
+        if UNICODE_LINE_BREAKS.search(value):
+            style = '"'
+        else:
+            style = '|' if '\n' in value else None
+        return dumper.represent_scalar('tag:yaml.org,2002:str', value, style=style)
+
+    def represent_duplicate(dumper, value):
+        return dumper.represent_dict(value.to_record())
+
+    ContentDumper.add_representer(str, represent_str)
+    ContentDumper.add_representer(DuplicateReference, represent_duplicate)
+    _yaml_dumpers[pure_python] = ContentDumper
+    return ContentDumper
+
+def format_yaml_record(file_path, file_content, explicit_start=False, dumper=None):
+    import yaml
+
+    if dumper is None:
+        pure_python = bool(ASTRAL_CHARACTERS.search(file_path) or ASTRAL_CHARACTERS.search(str(file_content)))
+        dumper = yaml_dumper(pure_python)
+    # A width no line reaches keeps long quoted scalars on one line; the two
+    # emitters fold them differently.
+    text = yaml.dump({file_path: file_content}, Dumper=dumper, allow_unicode=True, width=YAML_WIDTH,
+                     sort_keys=False, default_flow_style=False, explicit_start=explicit_start)
+    # A body kept with "|+" is followed by a document end marker, which would
+    # end the document in the middle of a YAML export's mapping. The next
+    # record or document start ends the scalar just as well.
+    if text.endswith('\n...\n'):
+        text = text[:-4]
+    return text
+
+def format_yaml_document(file_path, file_content):
+    return format_yaml_record(file_path, file_content, explicit_start=True)
+
+class PlainTextWriter(ExportWriter):
+    def format_record(self, file_path, file_content):
+        return format_plain_text_record(file_path, file_content)
+
+class JsonlWriter(ExportWriter):
+    def format_record(self, file_path, file_content):
+        return format_jsonl_record(file_path, file_content)
+
+class YamlWriter(ExportWriter):
+    # A run of single-key mappings is itself one valid mapping, so records can
+    # be emitted one at a time without holding the document in memory.
+    def format_record(self, file_path, file_content):
+        return format_yaml_record(file_path, file_content)
+
+    def close(self):
+        if not self.closed and not self.count:
+            self.file.write('{}\n')
+        super().close()
+
+class YamlStreamWriter(ExportWriter):
+    # One YAML document per file.
+    def format_record(self, file_path, file_content):
+        return format_yaml_document(file_path, file_content)
+
+class JsonWriter(ExportWriter):
+    # Emits the same bytes as json.dump(content, f, indent=2, ensure_ascii=False).
+    def __init__(self, path, track_records=False, compression=None):
+        super().__init__(path, compression=compression)
+        self.file.write('{')
+
+    def format_record(self, file_path, file_content):
+        separator = ',\n  ' if self.count else '\n  '
+        return f"{separator}{json.dumps(file_path, ensure_ascii=False)}: {json.dumps(file_content, ensure_ascii=False, default=export_value)}"
+
+    def close(self):
+        if not self.closed:
+            self.file.write('\n}' if self.count else '}')
+        super().close()
+
+# Indexed export layout: magic, content blobs, entry table, hash table,
+# footer. Each entry is INDEX_ENTRY (blob offset, blob length, flags, path
+# length) followed by the UTF-8 path; each hash table slot is INDEX_SLOT
+# (path hash, entry offset + 1, 0 for an empty slot). The reader probes the
+# table through mmap, so looking up one path touches a few pages however
+# large the export is.
+INDEX_MAGIC = b'CCINDEX1'
+INDEX_ENTRY = struct.Struct('<QQBH')
+INDEX_SLOT = struct.Struct('<QQ')
+INDEX_FOOTER = struct.Struct('<QQQQ8s')
+INDEX_ZLIB = 1
+INDEX_ZSTD = 2
+INDEX_DUPLICATE = 4
+
+def index_path_hash(file_path):
+    # Never 0, which marks empty slots.
+    digest = hashlib.blake2b(file_path.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+class IndexedWriter(ExportWriter):
+    # Writes the indexed export format. Compression is applied per blob so
+    # single records stay readable without decompressing the rest, and
+    # duplicates point at their canonical file's blob.
+    def __init__(self, path, track_records=False, compression=None):
+        self.path = path
+        self.file = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        self.closed = False
+        self.count = 0
+        self.records = None
+        self.compression = compression
+        if compression == 'zstd':
+            import zstandard
+            self.compressor = zstandard.ZstdCompressor(level=3)
+        elif compression and compression != 'gzip':
+            raise ValueError(f"Unknown compression: {compression}")
+        self.entries = []
+        self.blobs = {}
+        self.file.write(INDEX_MAGIC)
+        self.offset = len(INDEX_MAGIC)
+
+    def write(self, file_path, file_content):
+        if isinstance(file_content, DuplicateReference) and file_content.canonical_path in self.blobs:
+            offset, length, flags = self.blobs[file_content.canonical_path]
+            flags |= INDEX_DUPLICATE
+        else:
+            data = str(file_content).encode('utf-8')
+            flags = 0
+            if self.compression == 'gzip':
+                data = zlib.compress(data, 6)
+                flags = INDEX_ZLIB
+            elif self.compression == 'zstd':
+                data = self.compressor.compress(data)
+                flags = INDEX_ZSTD
+            offset, length = self.offset, len(data)
+            self.file.write(data)
+            self.offset += length
+            self.blobs[file_path] = (offset, length, flags)
+        self.entries.append((file_path, offset, length, flags))
+        self.count += 1
+
+    def write_index(self):
+        entries_offset = self.offset
+        entry_offsets = []
+        for file_path, offset, length, flags in self.entries:
+            path_bytes = file_path.encode('utf-8')
+            entry_offsets.append(self.offset)
+            self.file.write(INDEX_ENTRY.pack(offset, length, flags, len(path_bytes)))
+            self.file.write(path_bytes)
+            self.offset += INDEX_ENTRY.size + len(path_bytes)
+
+        # Open addressing with linear probing, at most half full.
+        slot_count = 1
+        while slot_count < 2 * len(self.entries):
+            slot_count *= 2
+        slots = [(0, 0)] * slot_count
+        for (file_path, _, _, _), entry_offset in zip(self.entries, entry_offsets):
+            path_hash = index_path_hash(file_path)
+            slot = path_hash & (slot_count - 1)
+            while slots[slot][0]:
+                slot = (slot + 1) & (slot_count - 1)
+            slots[slot] = (path_hash, entry_offset + 1)
+        table_offset = self.offset
+        self.file.write(b''.join(INDEX_SLOT.pack(*slot) for slot in slots))
+        self.file.write(INDEX_FOOTER.pack(entries_offset, len(self.entries), table_offset, slot_count, INDEX_MAGIC))
+
+    def close(self):
+        if self.closed:
+            return
+        self.write_index()
+        if self.path == '-':
+            self.file.flush()
+        else:
+            self.file.close()
+        self.closed = True
+
+class IndexedReader:
+    # Random access to an indexed export: get(file_path) reads one record
+    # without parsing or loading the others.
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < len(INDEX_MAGIC) + INDEX_FOOTER.size or self.map[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not an indexed export")
+        (self.entries_offset, self.entry_count, self.table_offset, self.slot_count,
+         magic) = INDEX_FOOTER.unpack_from(self.map, len(self.map) - INDEX_FOOTER.size)
+        if magic != INDEX_MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is truncated")
+        self.decompressor = None
+
+    def read_entry(self, entry_offset):
+        offset, length, flags, path_length = INDEX_ENTRY.unpack_from(self.map, entry_offset)
+        path_start = entry_offset + INDEX_ENTRY.size
+        file_path = self.map[path_start:path_start + path_length].decode('utf-8')
+        return file_path, offset, length, flags, path_start + path_length
+
+    def find(self, file_path):
+        path_hash = index_path_hash(file_path)
+        slot = path_hash & (self.slot_count - 1)
+        while True:
+            slot_hash, entry_offset = INDEX_SLOT.unpack_from(self.map, self.table_offset + slot * INDEX_SLOT.size)
+            if not slot_hash:
+                return None
+            if slot_hash == path_hash:
+                entry = self.read_entry(entry_offset - 1)
+                if entry[0] == file_path:
+                    return entry
+            slot = (slot + 1) & (self.slot_count - 1)
+
+    def content(self, offset, length, flags):
+        data = self.map[offset:offset + length]
+        if flags & INDEX_ZLIB:
+            data = zlib.decompress(data)
+        elif flags & INDEX_ZSTD:
+            if self.decompressor is None:
+                import zstandard
+                self.decompressor = zstandard.ZstdDecompressor()
+            data = self.decompressor.decompress(data)
+        return data.decode('utf-8')
+
+    def get(self, file_path, default=None):
+        entry = self.find(file_path)
+        if entry is None:
+            return default
+        return self.content(*entry[1:4])
+
+    def __getitem__(self, file_path):
+        entry = self.find(file_path)
+        if entry is None:
+            raise KeyError(file_path)
+        return self.content(*entry[1:4])
+
+    def __contains__(self, file_path):
+        return self.find(file_path) is not None
+
+    def __len__(self):
+        return self.entry_count
+
+    def __iter__(self):
+        # Paths in export order.
+        entry_offset = self.entries_offset
+        for _ in range(self.entry_count):
+            file_path, _, _, _, entry_offset = self.read_entry(entry_offset)
+            yield file_path
+
+    def items(self):
+        entry_offset = self.entries_offset
+        for _ in range(self.entry_count):
+            file_path, offset, length, flags, entry_offset = self.read_entry(entry_offset)
+            yield file_path, self.content(offset, length, flags)
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+EXPORT_WRITERS = {
+    'plain_text': PlainTextWriter,
+    'json': JsonWriter,
+    'yaml': YamlWriter,
+    'yaml_stream': YamlStreamWriter,
+    'jsonl': JsonlWriter,
+    'indexed': IndexedWriter,
+}
+
+# Formats whose records are self-contained, so LiveExport can patch them.
+LIVE_EXPORT_FORMATTERS = {
+    'plain_text': format_plain_text_record,
+    'yaml_stream': format_yaml_document,
+    'jsonl': format_jsonl_record,
+}
+
+class LiveExport:
+    # Keeps an already written Plain Text or JSONL export in sync with
+    # changes. Inserts are appended; updates and deletes rewrite the file from
+    # the first touched record on, copying untouched records byte for byte.
+    def __init__(self, path, export_type, records, minify=False):
+        self.path = path
+        self.format_record = LIVE_EXPORT_FORMATTERS[export_type]
+        self.minify = minify
+        self.order = [file_path for file_path, _ in records]
+        self.sizes = dict(records)
+
+    def encode(self, file_path, file_content):
+        if self.minify:
+            file_content = minify_text(file_content, file_path)
+        record = self.format_record(file_path, file_content).replace('\n', os.linesep)
+        return record.encode('utf-8')
+
+    def apply(self, updated, removed):
+        removed = set(removed)
+        removed_dirs = tuple(path + os.sep for path in removed)
+        touched = [
+            index for index, file_path in enumerate(self.order)
+            if file_path in updated or file_path in removed or file_path.startswith(removed_dirs)
+        ]
+        inserted = [file_path for file_path in updated if file_path not in self.sizes]
+        if not touched and not inserted:
+            return
+
+        start = touched[0] if touched else len(self.order)
+        start_offset = sum(self.sizes[file_path] for file_path in self.order[:start])
+        new_order = self.order[:start]
+        with open(self.path, 'r+b') as f, tempfile.TemporaryFile() as tail:
+            f.seek(start_offset)
+            shutil.copyfileobj(f, tail)
+            f.seek(start_offset)
+            f.truncate()
+            tail.seek(0)
+            for file_path in self.order[start:]:
+                size = self.sizes[file_path]
+                if file_path in removed or file_path.startswith(removed_dirs):
+                    tail.seek(size, os.SEEK_CUR)
+                    del self.sizes[file_path]
+                elif file_path in updated:
+                    tail.seek(size, os.SEEK_CUR)
+                    data = self.encode(file_path, updated[file_path])
+                    f.write(data)
+                    self.sizes[file_path] = len(data)
+                    new_order.append(file_path)
+                else:
+                    copy_bytes(tail, f, size)
+                    new_order.append(file_path)
+            for file_path in inserted:
+                data = self.encode(file_path, updated[file_path])
+                f.write(data)
+                self.sizes[file_path] = len(data)
+                new_order.append(file_path)
+        self.order = new_order
+
+def has_excluded_part(relative_path, excluded_folders):
+    return any(part in excluded_folders for part in relative_path.split(os.sep)[:-1])
+
+def print_skip(file_path, reason, message):
+    print(f"Skipped {file_path} ({SKIP_REASONS[reason]}): {message}", file=sys.stderr)
+
+def scan(folders, file_types=(), excluded_folders=(), path_filter=None, on_skip=print_skip):
+    from sources import list_source, split_sources
+    folders, sources = split_sources(folders, on_skip)
+    for _, file_path in DirectoryScanner(folders, file_types, excluded_folders, path_filter).scan():
+        yield file_path
+    for source in sources:
+        try:
+            yield from list_source(source, file_types, excluded_folders, path_filter)
+        finally:
+            source.close()
+
+def collect(folders, file_types=(), excluded_folders=(), use_relative_path=False, read_workers=DEFAULT_READ_WORKERS,
+            cache=None, progress=None, on_skip=print_skip, reader=None, deduplicator=None, path_filter=None,
+            metrics=None):
+    # Yields (file_path, content) for every readable text file, in walk order.
+    # Skipped files are reported as on_skip(file_path, reason, message). With
+    # a deduplicator, repeated contents come out as DuplicateReference. A
+    # patterns.PathFilter applies include/exclude patterns and .gitignore files.
+    # progress(percent, eta) is weighted by bytes to read; eta is in seconds, or
+    # None until there is a rate. A metrics.Metrics records the scan and
+    # every read. Archives and git repositories among folders are read after
+    # the folders, member by member (see sources.py).
+    from sources import read_source, split_sources
+    reader = reader or FileReader()
+    if metrics is not None:
+        skip = on_skip
+        def on_skip(file_path, reason, message):
+            metrics.skip(reason)
+            skip(file_path, reason, message)
+    folders, sources = split_sources(folders, on_skip)
+    weigh = reader.bytes_to_read if progress is not None or metrics is not None else None
+    scanner = DirectoryScanner(folders, file_types, excluded_folders, path_filter, weigh)
+    sources_bytes = sum(source.total_bytes for source in sources)
+    estimator = ProgressEstimator()
+    processed_bytes = 0
+    last_progress = -1
+
+    if cache is not None:
+        cache.load_keys(folders)
+        read_file = lambda file_path: cache.read(file_path, reader)
+    else:
+        read_file = reader.read
+    if metrics is not None:
+        def read_entry(entry):
+            # Skipped files count with no bytes, so they do not inflate MB/s.
+            start = time.perf_counter()
+            try:
+                content = read_file(entry[1])
+            except Exception:
+                metrics.record('read', start, time.perf_counter() - start, file_path=entry[1])
+                raise
+            metrics.record('read', start, time.perf_counter() - start, 1, scanner.sizes.get(entry[1], 0), entry[1])
+            return content
+        entries = metrics.timed('scan', scanner.scan())
+    else:
+        read_entry = lambda entry: read_file(entry[1])
+        entries = scanner.scan()
+    results = ordered_parallel_map(read_entry, entries, read_workers)
+    for (folder, file_path), content, error in results:
+        processed_bytes += scanner.sizes.pop(file_path, 0)
+        if isinstance(error, SkippedFile):
+            on_skip(file_path, error.reason, str(error))
+        elif error is not None:
+            on_skip(file_path, 'read_error', str(error))
+        else:
+            if use_relative_path:
+                file_path = os.path.relpath(file_path, folder)
+            if deduplicator is not None:
+                content = deduplicator.process(file_path, content)
+            yield file_path, content
+        if progress is not None:
+            # Only report when the percentage moves.
+            value, eta = estimator.update(processed_bytes, scanner.estimated_total_bytes() + sources_bytes)
+            if value > last_progress:
+                last_progress = value
+                progress(value, eta)
+
+    for index, source in enumerate(sources):
+        try:
+            for file_path, content in read_source(source, reader, file_types, excluded_folders, path_filter,
+                                                  use_relative_path, on_skip, metrics):
+                if deduplicator is not None:
+                    content = deduplicator.process(file_path, content)
+                yield file_path, content
+                if progress is not None:
+                    done = processed_bytes + sum(source.done_bytes for source in sources[:index + 1])
+                    value, eta = estimator.update(done, scanner.estimated_total_bytes() + sources_bytes)
+                    if value > last_progress:
+                        last_progress = value
+                        progress(value, eta)
+        except Exception as e:
+            on_skip(source.root, 'read_error', str(e))
+        finally:
+            source.close()
+
+    if progress is not None:
+        progress(100, 0)
+
+def resolve_delta_duplicates(changes, contents=None, minify=False):
+    # Which files a delta leaves out is only known after minification, so
+    # resolved duplicates are minified here.
+    written = set()
+    for change, file_path, content in changes:
+        if contents is not None and isinstance(content, DuplicateReference) and content.canonical_path not in written:
+            content = resolve_duplicate(content, contents)
+            if minify:
+                content = minify_text(content, file_path)
+        written.add(file_path)
+        yield file_path, (change, content)
+
+def export(records, path, export_type, minify=False, track_records=False, compression=None, minify_stats=None,
+           metrics=None, snapshot=None, previous=None, contents=None):
+    # Writes (file_path, content) records to path ('-' for stdout). Returns the
+    # per-record sizes when track_records is set, for LiveExport. Minification
+    # runs in worker processes and fills minify_stats when given. A
+    # snapshots.Snapshot gets the hash of every exported record; with the
+    # previous Snapshot as well, only the changes since then are written, as
+    # Plain Text or JSONL operations. Duplicates whose canonical file is not
+    # written are exported with its text from contents (file path -> content)
+    # when given.
+    if previous is None:
+        records = resolve_duplicates(records, contents)
+    elif contents is None:
+        # A delta leaves unchanged canonical files out, so their duplicates
+        # take the text from the records.
+        contents = {}
+        records = keep_texts(records, contents)
+    if minify:
+        from minifiers import minify_records
+        records = minify_records(records, stats=minify_stats, metrics=metrics)
+    if previous is not None:
+        from snapshots import DELTA_WRITERS
+        if export_type not in DELTA_WRITERS:
+            raise ValueError(f"Delta exports are written as Plain Text or JSONL, not {export_type}")
+        writer_class = DELTA_WRITERS[export_type]
+        records = resolve_delta_duplicates(snapshot.delta(records, previous), contents, minify)
+        track_records = False
+    else:
+        writer_class = EXPORT_WRITERS[export_type]
+        if snapshot is not None:
+            records = snapshot.record(records)
+    with writer_class(path, track_records=track_records, compression=compression) as writer:
+        if metrics is None:
+            for file_path, content in records:
+                writer.write(file_path, content)
+        else:
+            for file_path, content in records:
+                with metrics.timer('export', file_path):
+                    writer.write(file_path, content)
+    if metrics is not None and path != '-':
+        metrics.count('export', size=os.path.getsize(path))
+    return writer.records
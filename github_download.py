@@ -0,0 +1,323 @@
+import os
+import json
+import base64
+import hashlib
+import threading
+import time
+import tarfile
+import http.client
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from core import APP_DATA_DIR, JsonWriter, compile_extension_matcher
+
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+GITHUB_ENGINES = {
+    "Archive": 'archive',
+    "Sync": 'sync',
+    "Contents API": 'contents',
+}
+GITHUB_SYNC_WORKERS = 8
+BLOB_STORE_PATH = os.path.join(APP_DATA_DIR, 'blobs')
+SYNC_STATE_PATH = os.path.join(APP_DATA_DIR, 'sync')
+
+def parse_github_repo(repo_url):
+    # "https://github.com/owner/repo/tree/some/ref" -> ("owner/repo", "some/ref")
+    path = repo_url.split("github.com/")[-1].strip('/')
+    if path.endswith('.git'):
+        path = path[:-4]
+    parts = path.split('/')
+    ref = '/'.join(parts[3:]) if len(parts) > 3 and parts[2] == 'tree' else ''
+    return '/'.join(parts[:2]), ref
+
+def github_headers(accept='application/vnd.github+json'):
+    headers = {'Accept': accept, 'User-Agent': 'content-collector'}
+    token = os.environ.get('GITHUB_TOKEN')
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    return headers
+
+def github_request(url, accept='application/vnd.github+json'):
+    return urllib.request.Request(url, headers=github_headers(accept))
+
+def git_blob_sha(data):
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+class HttpSession:
+    # Keep-alive connections, one per host and thread, so concurrent workers
+    # reuse their sockets instead of reconnecting for every request.
+    MAX_REDIRECTS = 5
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+
+    def connection(self, scheme, netloc, fresh=False):
+        connections = self.local.__dict__.setdefault('connections', {})
+        conn = connections.get((scheme, netloc))
+        if conn is None or fresh:
+            if conn is not None:
+                conn.close()
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conn = connection_class(netloc, timeout=60)
+            connections[(scheme, netloc)] = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def get(self, url, headers=None):
+        # Returns (status, headers, body). 304 is returned, other errors raise.
+        for _ in range(self.MAX_REDIRECTS):
+            parts = urllib.parse.urlsplit(url)
+            target = parts.path + (f"?{parts.query}" if parts.query else '')
+            try:
+                response = self.send(parts, target, headers)
+            except (http.client.HTTPException, ConnectionError):
+                response = self.send(parts, target, headers, fresh=True)
+            body = response.read()
+            if response.status in (301, 302, 303, 307, 308):
+                url = urllib.parse.urljoin(url, response.getheader('Location'))
+                continue
+            if response.status >= 400:
+                raise OSError(f"HTTP {response.status} for {url}")
+            return response.status, response.headers, body
+        raise OSError(f"Too many redirects for {url}")
+
+    def send(self, parts, target, headers, fresh=False):
+        conn = self.connection(parts.scheme, parts.netloc, fresh)
+        conn.request('GET', target, headers=headers or {})
+        return conn.getresponse()
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+
+class BlobStore:
+    # Content-addressed store of raw git blobs, shared by every synced repo.
+    def __init__(self, root=BLOB_STORE_PATH):
+        self.root = root
+
+    def path(self, sha):
+        return os.path.join(self.root, sha[:2], sha[2:])
+
+    def has(self, sha):
+        return os.path.exists(self.path(sha))
+
+    def get(self, sha):
+        with open(self.path(sha), 'rb') as f:
+            return f.read()
+
+    def put(self, sha, data):
+        path = self.path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+def safe_member_parts(name):
+    # Strips the "<owner>-<repo>-<sha>/" prefix GitHub puts on archive members
+    # and rejects anything that would escape the output folder.
+    parts = name.split('/')[1:]
+    if not parts or any(part in ('', '.', '..') for part in parts):
+        return None
+    return parts
+
+class ProgressReader:
+    def __init__(self, stream, callback):
+        self.stream = stream
+        self.callback = callback
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        self.callback(self.bytes_read)
+        return data
+
+class GithubDownloader:
+    def __init__(self, repo_url, output_folder, file_types=(), excluded_folders=(), api_url=GITHUB_API_URL, progress=None,
+                 metrics=None):
+        self.repo_url = repo_url
+        self.output_folder = output_folder
+        self.file_types = file_types
+        self.excluded_folders = set(excluded_folders)
+        self.api_url = api_url.rstrip('/')
+        self.progress = progress or (lambda current, total: None)
+        # A metrics.Metrics receiving the time and size of every file.
+        self.metrics = metrics
+
+    def download(self, engine='archive'):
+        try:
+            if engine == 'archive':
+                self.download_archive()
+            elif engine == 'sync':
+                self.sync_tree()
+            else:
+                self.download_contents()
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.error('download', str(e))
+            raise
+
+    def download_contents(self):
+        from github import Github
+
+        g = Github()
+        repo = g.get_repo(self.repo_url.split("github.com/")[-1])
+
+        contents = {}
+        self.process_contents(repo, "", contents)
+
+        with open(os.path.join(self.output_folder, 'repo_contents.json'), 'w', encoding='utf-8') as f:
+            json.dump(contents, f, indent=2, ensure_ascii=False)
+
+    def download_archive(self):
+        # One streamed request for the whole tarball. Members are filtered
+        # while extracting, so excluded files never touch the disk.
+        repo, ref = parse_github_repo(self.repo_url)
+        url = f"{self.api_url}/repos/{repo}/tarball" + (f"/{ref}" if ref else "")
+        matches = compile_extension_matcher(self.file_types)
+        with urllib.request.urlopen(github_request(url)) as response:
+            total = int(response.headers.get('Content-Length') or 0)
+            reader = ProgressReader(response, lambda done: self.progress(done, total))
+            contents_path = os.path.join(self.output_folder, 'repo_contents.json')
+            with tarfile.open(fileobj=reader, mode='r|gz') as archive, JsonWriter(contents_path) as contents:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    parts = safe_member_parts(member.name)
+                    if parts is None or any(part in self.excluded_folders for part in parts[:-1]) or not matches(parts[-1]):
+                        continue
+                    # Reading a member is what pulls its bytes off the network.
+                    start = time.perf_counter()
+                    data = archive.extractfile(member).read()
+                    if self.metrics is not None:
+                        self.metrics.record('download', start, time.perf_counter() - start, 1, len(data), '/'.join(parts))
+                    file_path = os.path.join(self.output_folder, *parts)
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    with open(file_path, 'wb') as f:
+                        f.write(data)
+                    try:
+                        contents.write('/'.join(parts), data.decode('utf-8'))
+                    except UnicodeDecodeError:
+                        contents.write('/'.join(parts), "Unable to decode file content")
+
+    def sync_tree(self):
+        # Fetches the recursive tree for the ref in one conditional request
+        # and downloads only the blobs that are not in the local store yet.
+        repo, ref = parse_github_repo(self.repo_url)
+        state_key = hashlib.sha1(f"{self.api_url}|{repo}|{os.path.abspath(self.output_folder)}".encode('utf-8')).hexdigest()
+        state_path = os.path.join(SYNC_STATE_PATH, f"{state_key}.json")
+        state = {}
+        if os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+
+        session = HttpSession()
+        store = BlobStore()
+        try:
+            if not ref:
+                status, headers, body = session.get(f"{self.api_url}/repos/{repo}", github_headers())
+                ref = json.loads(body)['default_branch']
+
+            request_headers = github_headers()
+            if state.get('ref') == ref and state.get('tree_etag') and 'tree' in state:
+                request_headers['If-None-Match'] = state['tree_etag']
+            status, headers, body = session.get(f"{self.api_url}/repos/{repo}/git/trees/{urllib.parse.quote(ref, safe='')}?recursive=1", request_headers)
+            previous_files = state.get('files', {}) if state.get('ref') == ref else {}
+            if status == 304:
+                tree_entries = state['tree']
+            else:
+                tree = json.loads(body)
+                if tree.get('truncated'):
+                    # Too large for a single tree listing; fall back to the archive.
+                    self.download_archive()
+                    return
+                tree_entries = [
+                    {key: entry[key] for key in ('path', 'mode', 'type', 'sha')} for entry in tree['tree']
+                ]
+            files = self.filter_tree(tree_entries)
+
+            missing = sorted({sha for sha in files.values() if not store.has(sha)})
+            self.progress(0, len(missing))
+            blob_paths = {sha: path for path, sha in files.items()}
+
+            def fetch_blob(sha):
+                start = time.perf_counter()
+                _, _, data = session.get(f"{self.api_url}/repos/{repo}/git/blobs/{sha}", github_headers('application/vnd.github.raw'))
+                if git_blob_sha(data) != sha:
+                    raise OSError(f"Blob {sha} failed verification")
+                store.put(sha, data)
+                if self.metrics is not None:
+                    self.metrics.record('download', start, time.perf_counter() - start, 1, len(data), blob_paths[sha])
+
+            with ThreadPoolExecutor(max_workers=GITHUB_SYNC_WORKERS) as executor:
+                for done, _ in enumerate(executor.map(fetch_blob, missing), 1):
+                    self.progress(done, len(missing))
+        finally:
+            session.close()
+
+        changed = False
+        for path, sha in files.items():
+            file_path = os.path.join(self.output_folder, *path.split('/'))
+            if previous_files.get(path) != sha or not os.path.exists(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, 'wb') as f:
+                    f.write(store.get(sha))
+                changed = True
+        for path in previous_files.keys() - files.keys():
+            file_path = os.path.join(self.output_folder, *path.split('/'))
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            changed = True
+
+        contents_path = os.path.join(self.output_folder, 'repo_contents.json')
+        if changed or not os.path.exists(contents_path):
+            with JsonWriter(contents_path) as contents:
+                for path, sha in files.items():
+                    try:
+                        contents.write(path, store.get(sha).decode('utf-8'))
+                    except UnicodeDecodeError:
+                        contents.write(path, "Unable to decode file content")
+
+        os.makedirs(SYNC_STATE_PATH, exist_ok=True)
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump({'ref': ref, 'tree_etag': headers.get('ETag') or state.get('tree_etag'), 'tree': tree_entries, 'files': files}, f)
+
+    def filter_tree(self, entries):
+        matches = compile_extension_matcher(self.file_types)
+        files = {}
+        for entry in entries:
+            # Skips trees, submodules ("commit") and symlinks (mode 120000).
+            if entry['type'] != 'blob' or entry['mode'] == '120000':
+                continue
+            parts = entry['path'].split('/')
+            if any(part in ('', '.', '..') for part in parts):
+                continue
+            if any(part in self.excluded_folders for part in parts[:-1]) or not matches(parts[-1]):
+                continue
+            files[entry['path']] = entry['sha']
+        return files
+
+    def process_contents(self, repo, path, contents):
+        items = repo.get_contents(path)
+        total_items = len(items)
+        for index, item in enumerate(items):
+            self.progress(index + 1, total_items)
+            if item.type == "dir":
+                self.process_contents(repo, item.path, contents)
+            else:
+                try:
+                    file_content = base64.b64decode(item.content).decode('utf-8')
+                    file_path = os.path.join(self.output_folder, item.path)
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        f.write(file_content)
+                    contents[item.path] = file_content
+                except:
+                    contents[item.path] = "Unable to decode file content"
@@ -1,130 +1,445 @@
 import sys
 import os
-import json
-import yaml
-import textwrap
-import tempfile
-import shutil
-import base64
+import re
+import copy
+import time
 import threading
-from github import Github
+from array import array
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QListWidget, QLineEdit, QLabel, QRadioButton, QFileDialog,
     QMessageBox, QButtonGroup, QCheckBox, QListWidgetItem, QComboBox, QInputDialog,
-    QGroupBox, QSplitter, QProgressBar, QTabWidget, QTextEdit
+    QGroupBox, QSplitter, QProgressBar, QTabWidget, QPlainTextEdit, QSpinBox, QTableView, QHeaderView
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal, QAbstractTableModel, QModelIndex
 from PyQt6.QtGui import QFont
 
+from core import (
+    COMPRESSIONS, DEFAULT_CACHE_PATH, DEFAULT_EXCLUDED_FOLDERS, DEFAULT_MAX_FILE_SIZE, DEFAULT_PROFILES,
+    DEFAULT_READ_WORKERS, DEFAULT_TOKEN_ESTIMATOR, ENCODING_FALLBACKS, EXPORT_WRITERS, LIVE_EXPORT_FORMATTERS, MAX_READ_WORKERS,
+    OVERSIZE_POLICIES, SKIP_REASONS, TOKEN_ESTIMATORS, CollectionCache, Deduplicator, DuplicateReference, FileReader,
+    LiveExport, LRUCache, collect, compressed_path, export, make_preview, minify_text, read_preview, rebase_duplicates
+)
+from sharding import SHARD_UNITS, export_shards
+from minifiers import MinifyStats
+from metrics import Metrics, ProgressEstimator, format_eta
+from search import ContentIndex, SearchQuery
+from snapshots import DELTA_WRITERS, Snapshot, snapshot_path
+from patterns import PathFilter
+from sources import ARCHIVE_FILTER, GIT_REF_SEPARATOR, is_git_repository, is_source
+from github_download import GITHUB_API_URL, GITHUB_ENGINES, GithubDownloader
+from watcher import FolderWatcher, Inotify
+
+# Collected and skipped files reach the GUI in batches at most this often.
+BATCH_INTERVAL = 0.05
+# Milliseconds to wait after typing, and between refreshes while files
+# arrive, before searching.
+SEARCH_DELAY = 150
+SEARCH_REFRESH_DELAY = 500
+
+FILE_STATUSES = ("Collected", "Duplicate", "Added", "Modified")
+
+def file_row(file_path, content, estimate_tokens, status=0):
+    # (path, size in bytes, tokens, status) as held by FileListModel.
+    if isinstance(content, DuplicateReference):
+        return file_path, content.size, 0, FILE_STATUSES.index("Duplicate")
+    return file_path, len(content.encode('utf-8', 'replace')), estimate_tokens(content), status
+
+class FileListModel(QAbstractTableModel):
+    # Backs the file list with flat columns instead of one widget per file,
+    # so views only ever touch the visible rows. With a filter set, view maps
+    # the rows shown to the rows stored.
+    HEADERS = ("Path", "Size", "Tokens", "Status")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paths = []
+        self.sizes = array('q')
+        self.tokens = array('q')
+        self.statuses = bytearray()
+        self.rows = {}
+        self.filter = None
+        self.view = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths) if self.view is None else len(self.view)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = self.stored_row(index.row()), index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return self.paths[row]
+            if column == 1:
+                return f"{self.sizes[row]:,}"
+            if column == 2:
+                return f"{self.tokens[row]:,}"
+            return FILE_STATUSES[self.statuses[row]]
+        if role == Qt.ItemDataRole.TextAlignmentRole and column in (1, 2):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.UserRole:
+            return self.paths[row]
+        return None
+
+    def stored_row(self, row):
+        return row if self.view is None else self.view[row]
+
+    def path(self, row):
+        return self.paths[self.stored_row(row)]
+
+    def set_filter(self, file_paths):
+        # Shows only file_paths, or every file for None.
+        self.beginResetModel()
+        self.filter = file_paths
+        if file_paths is None:
+            self.view = None
+        else:
+            self.view = array('q', sorted(self.rows[file_path] for file_path in file_paths if file_path in self.rows))
+        self.endResetModel()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, file_path):
+        return file_path in self.rows
+
+    def add_files(self, batch):
+        # Appends new paths in one insert and updates known ones in place.
+        new_rows = []
+        first_changed = last_changed = None
+        for file_path, size, tokens, status in batch:
+            row = self.rows.get(file_path)
+            if row is None:
+                new_rows.append((file_path, size, tokens, status))
+                continue
+            self.sizes[row] = size
+            self.tokens[row] = tokens
+            self.statuses[row] = status
+            first_changed = row if first_changed is None else min(first_changed, row)
+            last_changed = row if last_changed is None else max(last_changed, row)
+        if first_changed is not None and self.view is not None:
+            # Changed rows could be anywhere in the filtered view.
+            first_changed, last_changed = (0, len(self.view) - 1) if self.view else (None, None)
+        if first_changed is not None:
+            self.dataChanged.emit(self.index(first_changed, 1), self.index(last_changed, len(self.HEADERS) - 1))
+        if new_rows:
+            start = len(self.paths)
+            if self.view is None:
+                self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            for row, (file_path, size, tokens, status) in enumerate(new_rows, start):
+                self.rows[file_path] = row
+                self.paths.append(file_path)
+                self.sizes.append(size)
+                self.tokens.append(tokens)
+                self.statuses.append(status)
+            if self.view is None:
+                self.endInsertRows()
+            else:
+                # New rows only show up if the filter already names them.
+                shown = [row for row in range(start, len(self.paths)) if self.paths[row] in self.filter]
+                if shown:
+                    self.beginInsertRows(QModelIndex(), len(self.view), len(self.view) + len(shown) - 1)
+                    self.view.extend(shown)
+                    self.endInsertRows()
+
+    def remove_files(self, file_paths):
+        rows = sorted((self.rows[file_path] for file_path in file_paths if file_path in self.rows), reverse=True)
+        if not rows:
+            return
+        if self.view is not None:
+            # Stored rows shift, so the filtered view is rebuilt.
+            self.beginResetModel()
+            for row in rows:
+                del self.paths[row]
+                del self.sizes[row]
+                del self.tokens[row]
+                del self.statuses[row]
+            self.rows = {file_path: row for row, file_path in enumerate(self.paths)}
+            self.view = array('q', sorted(self.rows[file_path] for file_path in self.filter if file_path in self.rows))
+            self.endResetModel()
+            return
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.paths[row]
+            del self.sizes[row]
+            del self.tokens[row]
+            del self.statuses[row]
+            self.endRemoveRows()
+        self.rows = {file_path: row for row, file_path in enumerate(self.paths)}
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths = []
+        self.sizes = array('q')
+        self.tokens = array('q')
+        self.statuses = bytearray()
+        self.rows = {}
+        if self.filter is not None:
+            self.filter = set()
+            self.view = array('q')
+        self.endResetModel()
+
 class FileCollectorThread(QThread):
-    progress_update = pyqtSignal(int)
-    file_collected = pyqtSignal(str)
+    # Percentage weighted by bytes and the seconds left, -1 while unknown.
+    progress_update = pyqtSignal(int, float)
+    files_collected = pyqtSignal(list)
+    files_skipped = pyqtSignal(list)
+    export_failed = pyqtSignal(str)
     finished = pyqtSignal(dict)
 
-    def __init__(self, folders, file_types, excluded_folders, use_relative_path):
+    def __init__(self, folders, file_types, excluded_folders, use_relative_path, read_workers=DEFAULT_READ_WORKERS,
+                 export_writer=None, minify=False, cache_path=None, reader=None, deduplicate=False,
+                 token_estimator=DEFAULT_TOKEN_ESTIMATOR, path_filter=None, metrics=None, index=None):
         super().__init__()
         self.folders = folders
         self.file_types = file_types
         self.excluded_folders = excluded_folders
         self.use_relative_path = use_relative_path
+        self.read_workers = read_workers
+        # When an export writer is given, records are streamed to it and
+        # nothing is kept in collected_content but the duplicate references,
+        # in references, for watch mode to re-base.
+        self.export_writer = export_writer
+        self.references = {}
+        self.minify = minify
+        self.cache_path = cache_path
+        self.reader = reader or FileReader()
+        self.deduplicator = Deduplicator() if deduplicate else None
+        self.path_filter = path_filter
+        self.estimate_tokens = TOKEN_ESTIMATORS[token_estimator]
+        self.metrics = metrics or Metrics()
+        # A search.ContentIndex filled batch by batch; streamed exports keep
+        # no content to search.
+        self.index = index if export_writer is None else None
 
     def run(self):
+        cache = None
+        if self.cache_path:
+            try:
+                cache = CollectionCache(self.cache_path)
+            except Exception as e:
+                self.metrics.error('collect', f"Could not open the collection cache: {str(e)}")
+                self.files_skipped.emit([(self.cache_path, 'read_error', f"Could not open the collection cache: {str(e)}")])
+        try:
+            if self.export_writer is None:
+                self.finished.emit(self.collect(cache))
+                return
+            try:
+                with self.export_writer:
+                    self.collect(cache)
+            except Exception as e:
+                self.metrics.error('export', str(e))
+                self.export_failed.emit(str(e))
+            self.finished.emit({})
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def collect(self, cache=None):
         collected_content = {}
-        total_files = sum(sum(len(files) for _, _, files in os.walk(folder)) for folder in self.folders)
-        processed_files = 0
-
-        for folder in self.folders:
-            for root, dirs, files in os.walk(folder):
-                dirs[:] = [d for d in dirs if d not in self.excluded_folders]
-                for file in files:
-                    if not self.file_types or any(file.endswith(ftype) for ftype in self.file_types):
-                        try:
-                            file_path = os.path.join(root, file)
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                                if self.use_relative_path:
-                                    relative_path = os.path.relpath(file_path, folder)
-                                    collected_content[relative_path] = content
-                                    self.file_collected.emit(relative_path)
-                                else:
-                                    collected_content[file_path] = content
-                                    self.file_collected.emit(file_path)
-                        except Exception as e:
-                            print(f"Error reading file {file}: {str(e)}")
-                    processed_files += 1
-                    progress = int(processed_files / total_files * 100)
-                    self.progress_update.emit(progress)
-
-        self.finished.emit(collected_content)
+        collected = []
+        skipped = []
+        unindexed = []
+        last_flush = time.monotonic()
+        records = collect(self.folders, self.file_types, self.excluded_folders, self.use_relative_path,
+                          self.read_workers, cache, self.report_progress, lambda *skip: skipped.append(skip),
+                          self.reader, self.deduplicator, self.path_filter, self.metrics)
+        try:
+            for file_path, content in records:
+                row = file_row(file_path, content, self.estimate_tokens)
+                if self.export_writer is not None:
+                    self.write_record(file_path, content, row[1])
+                    if isinstance(content, DuplicateReference):
+                        self.references[file_path] = content
+                else:
+                    collected_content[file_path] = content
+                    unindexed.append((file_path, content))
+                collected.append(row)
+                if time.monotonic() - last_flush >= BATCH_INTERVAL:
+                    self.index_batch(unindexed)
+                    self.flush_batches(collected, skipped)
+                    last_flush = time.monotonic()
+        finally:
+            self.index_batch(unindexed)
+            self.flush_batches(collected, skipped)
+        return collected_content
+
+    def index_batch(self, records):
+        # Indexed before the batch reaches the list, so a search that runs
+        # when the rows arrive already finds them.
+        if self.index is not None and records:
+            with self.metrics.timer('index', files=len(records)):
+                self.index.add_many(records)
+        records.clear()
+
+    def report_progress(self, value, eta):
+        self.progress_update.emit(value, -1.0 if eta is None else eta)
+
+    def write_record(self, file_path, content, size):
+        if self.minify:
+            with self.metrics.timer('minify', file_path, size):
+                content = minify_text(content, file_path)
+        with self.metrics.timer('export', file_path):
+            self.export_writer.write(file_path, content)
+
+    def flush_batches(self, collected, skipped):
+        if collected:
+            self.files_collected.emit(collected[:])
+            collected.clear()
+        if skipped:
+            self.files_skipped.emit(skipped[:])
+            skipped.clear()
+
+class FolderWatchThread(QThread):
+    files_changed = pyqtSignal(dict, list)
+    file_skipped = pyqtSignal(str, str, str)
+    rescan_needed = pyqtSignal()
+
+    def __init__(self, folders, file_types, excluded_folders, use_relative_path, reader=None, path_filter=None):
+        super().__init__()
+        self.watcher = FolderWatcher(folders, file_types, excluded_folders, use_relative_path, reader,
+                                     self.file_skipped.emit, path_filter)
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        for changes in self.watcher.watch(lambda: self.running):
+            if changes is None:
+                self.rescan_needed.emit()
+            else:
+                self.files_changed.emit(*changes)
+
+class PreviewThread(QThread):
+    # Builds previews off the GUI thread. Only the latest request is kept, so
+    # scrolling through the list never queues up stale work.
+    preview_ready = pyqtSignal(str, str)
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+        # Previews are recorded in the metrics of the current collection.
+        self.metrics = None
+        self.condition = threading.Condition()
+        self.pending = None
+        self.running = True
+
+    def request(self, file_path, content=None, disk_path=None):
+        with self.condition:
+            self.pending = (file_path, content, disk_path)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                file_path, content, disk_path = self.pending
+                self.pending = None
+            start = time.perf_counter()
+            try:
+                if content is not None:
+                    preview = make_preview(content)
+                elif disk_path:
+                    preview = read_preview(disk_path)
+                else:
+                    preview = "The content of this file is no longer available."
+            except Exception as e:
+                preview = f"Could not preview file: {str(e)}"
+                if self.metrics is not None:
+                    self.metrics.error('preview', f"{file_path}: {str(e)}")
+            if self.metrics is not None:
+                self.metrics.record('preview', start, time.perf_counter() - start, 1,
+                                    len(preview.encode('utf-8', 'replace')), file_path)
+            self.cache.put(file_path, preview)
+            self.preview_ready.emit(file_path, preview)
+
+class ExportThread(QThread):
+    # Runs an export job so minifying and writing never block the GUI.
+    export_complete = pyqtSignal(object)
+    export_failed = pyqtSignal(str)
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        try:
+            self.export_complete.emit(self.job())
+        except Exception as e:
+            self.export_failed.emit(str(e))
 
 class GithubDownloadThread(QThread):
     download_complete = pyqtSignal(str)
     download_progress = pyqtSignal(int, int)
 
-    def __init__(self, repo_url, output_folder):
+    def __init__(self, repo_url, output_folder, file_types=(), excluded_folders=(), engine='archive', api_url=GITHUB_API_URL,
+                 metrics=None):
         super().__init__()
-        self.repo_url = repo_url
         self.output_folder = output_folder
+        self.engine = engine
+        self.downloader = GithubDownloader(repo_url, output_folder, file_types, excluded_folders, api_url,
+                                           self.download_progress.emit, metrics)
 
     def run(self):
         try:
-            g = Github()
-            repo = g.get_repo(self.repo_url.split("github.com/")[-1])
-
-            contents = {}
-            self.process_contents(repo, "", contents)
-
-            with open(os.path.join(self.output_folder, 'repo_contents.json'), 'w', encoding='utf-8') as f:
-                json.dump(contents, f, indent=2, ensure_ascii=False)
-
+            self.downloader.download(self.engine)
             self.download_complete.emit("Download complete!")
         except Exception as e:
             self.download_complete.emit(f"Error: {str(e)}")
 
-    def process_contents(self, repo, path, contents):
-        items = repo.get_contents(path)
-        total_items = len(items)
-        for index, item in enumerate(items):
-            self.download_progress.emit(index + 1, total_items)
-            if item.type == "dir":
-                self.process_contents(repo, item.path, contents)
-            else:
-                try:
-                    file_content = base64.b64decode(item.content).decode('utf-8')
-                    file_path = os.path.join(self.output_folder, item.path)
-                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(file_content)
-                    contents[item.path] = file_content
-                except:
-                    contents[item.path] = "Unable to decode file content"
-
 class FileCollectorApp(QWidget):
     def __init__(self):
         super().__init__()
         self.selected_folders = []
         self.file_types = []
-        self.excluded_folders = ["node_modules", "vendor", ".git", ".idea", ".github", ".husky", ".vscode", ".archive", ".cypress", ".scaffoldes", ".storybook", "build", "dist", "public"]
-        self.profiles = {
-            "": {
-                'file_types': [],
-                'excluded_folders': []
-            },
-            "Node/TypeScript Project": {
-                'file_types': ['ts', 'tsx', 'js', 'jsx', 'json', 'yaml', 'yml', 'md', 'html', 'css', 'scss', 'less', 'graphql'],
-                'excluded_folders': ['build', 'dist', 'node_modules', 'public', 'vendor']
-            },
-            "PHP Project": {
-                'file_types': ['php', 'html', 'css', 'scss', 'less', 'js', 'json', 'yaml', 'yml', 'md', 'xml', 'twig', 'blade.php'],
-                'excluded_folders': ['build', 'dist', 'node_modules', 'public', 'vendor']
-            },
-            "Python Project": {
-                'file_types': ['py', 'ipynb', 'json', 'yaml', 'yml', 'md', 'txt', 'html', 'css', 'js', 'csv', 'tsv', 'ini', 'cfg', 'rst'],
-                'excluded_folders': ['__pycache__', '.ipynb_checkpoints', 'build', 'dist', 'node_modules', 'public', 'vendor']
-            }
-        }
+        self.read_workers = DEFAULT_READ_WORKERS
+        self.max_file_size = DEFAULT_MAX_FILE_SIZE
+        self.oversize_policy = 'skip'
+        self.encoding_fallback = 'skip'
+        self.excluded_folders = list(DEFAULT_EXCLUDED_FOLDERS)
+        self.include_patterns = []
+        self.exclude_patterns = []
+        self.use_gitignore = False
+        self.profiles = copy.deepcopy(DEFAULT_PROFILES)
         self.collected_content = {}
+        # The duplicate references of a streamed export, see apply_file_changes.
+        self.stream_references = {}
+        self.stream_export_path = None
+        self.live_export = None
+        self.watch_thread = None
+        self.collection_settings = ((), (), (), False, None, None)
+        self.preview_path = None
+        self.preview_cache = LRUCache()
+        self.metrics = Metrics()
+        self.content_index = ContentIndex()
+        self.search_results = None
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+        self.github_estimator = None
+        self.preview_thread = PreviewThread(self.preview_cache)
+        self.preview_thread.preview_ready.connect(self.render_preview)
+        self.preview_thread.start()
         self.initUI()
 
     def initUI(self):
@@ -143,10 +458,13 @@ class FileCollectorApp(QWidget):
         github_layout = QHBoxLayout()
         self.github_input = QLineEdit()
         self.github_input.setPlaceholderText("Enter GitHub repository URL")
+        self.github_engine_combo = QComboBox()
+        self.github_engine_combo.addItems(GITHUB_ENGINES.keys())
         self.github_button = QPushButton("Download")
         self.github_button.clicked.connect(self.start_github_download)
         github_layout.addWidget(QLabel("GitHub Link:"))
         github_layout.addWidget(self.github_input)
+        github_layout.addWidget(self.github_engine_combo)
         github_layout.addWidget(self.github_button)
         main_layout.addLayout(github_layout)
 
@@ -183,6 +501,10 @@ class FileCollectorApp(QWidget):
         exclusion_group = self.create_exclusion_group()
         left_layout.addWidget(exclusion_group)
 
+        # File Handling
+        file_handling_group = self.create_file_handling_group()
+        left_layout.addWidget(file_handling_group)
+
         # Export Settings
         export_group = self.create_export_group()
         left_layout.addWidget(export_group)
@@ -200,18 +522,67 @@ class FileCollectorApp(QWidget):
         # File list tab
         file_list_widget = QWidget()
         file_list_layout = QVBoxLayout(file_list_widget)
-        self.file_list = QListWidget()
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search file contents")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start(SEARCH_DELAY))
+        self.search_regex_checkbox = QCheckBox("Regex")
+        self.search_regex_checkbox.toggled.connect(lambda: self.search_timer.start(SEARCH_DELAY))
+        self.search_case_checkbox = QCheckBox("Match Case")
+        self.search_case_checkbox.toggled.connect(lambda: self.search_timer.start(SEARCH_DELAY))
+        self.search_status_label = QLabel("")
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(self.search_regex_checkbox)
+        search_layout.addWidget(self.search_case_checkbox)
+        search_layout.addWidget(self.search_status_label)
+        file_list_layout.addLayout(search_layout)
+        self.file_model = FileListModel(self)
+        self.file_list = QTableView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.file_list.setShowGrid(False)
+        self.file_list.verticalHeader().setVisible(False)
+        # Fixed row heights keep the view from measuring every row.
+        self.file_list.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.file_list.verticalHeader().setDefaultSectionSize(self.file_list.fontMetrics().height() + 6)
+        self.file_list.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.file_list.selectionModel().currentRowChanged.connect(self.show_preview)
+        self.file_list.doubleClicked.connect(lambda index: self.tab_widget.setCurrentIndex(1))
         file_list_layout.addWidget(self.file_list)
         self.tab_widget.addTab(file_list_widget, "File List")
 
         # Preview tab
         preview_widget = QWidget()
         preview_layout = QVBoxLayout(preview_widget)
-        self.preview_text = QTextEdit()
+        self.preview_text = QPlainTextEdit()
         self.preview_text.setReadOnly(True)
+        self.preview_text.setPlaceholderText("Select a file in the File List to preview it.")
         preview_layout.addWidget(self.preview_text)
         self.tab_widget.addTab(preview_widget, "Preview")
 
+        # Skipped files tab
+        skipped_widget = QWidget()
+        skipped_layout = QVBoxLayout(skipped_widget)
+        self.skipped_list = QListWidget()
+        skipped_layout.addWidget(self.skipped_list)
+        self.tab_widget.addTab(skipped_widget, "Skipped")
+
+        # Metrics tab
+        metrics_widget = QWidget()
+        metrics_layout = QVBoxLayout(metrics_widget)
+        self.metrics_text = QPlainTextEdit()
+        self.metrics_text.setReadOnly(True)
+        self.metrics_text.setFont(QFont("Monospace"))
+        self.metrics_text.setPlaceholderText("Timings appear here after a collection, export or download.")
+        metrics_layout.addWidget(self.metrics_text)
+        metrics_buttons = QHBoxLayout()
+        metrics_buttons.addWidget(self.create_button("Refresh", self.update_metrics_view))
+        metrics_buttons.addWidget(self.create_button("Save Trace", self.save_metrics))
+        metrics_buttons.addStretch()
+        metrics_layout.addLayout(metrics_buttons)
+        self.tab_widget.addTab(metrics_widget, "Metrics")
+
         right_layout.addWidget(self.tab_widget)
 
         # Progress bar
@@ -222,10 +593,27 @@ class FileCollectorApp(QWidget):
         self.relative_path_checkbox = QCheckBox("Use Relative Filepath")
         right_layout.addWidget(self.relative_path_checkbox)
 
+        # Watch mode checkbox
+        self.watch_checkbox = QCheckBox("Watch for Changes")
+        self.watch_checkbox.toggled.connect(self.toggle_watch_mode)
+        right_layout.addWidget(self.watch_checkbox)
+
+        # Read worker count
+        workers_layout = QHBoxLayout()
+        self.read_workers_spinbox = QSpinBox()
+        self.read_workers_spinbox.setRange(1, MAX_READ_WORKERS)
+        self.read_workers_spinbox.setValue(self.read_workers)
+        self.read_workers_spinbox.valueChanged.connect(self.set_read_workers)
+        workers_layout.addWidget(QLabel("Read Workers:"))
+        workers_layout.addWidget(self.read_workers_spinbox)
+        workers_layout.addStretch()
+        right_layout.addLayout(workers_layout)
+
         # Action Buttons
         button_layout = QHBoxLayout()
         collect_button = self.create_button("Collect", self.collect_files)
         export_button = self.create_button("Export", self.export_files)
+        self.export_button = export_button
         preview_button = self.create_button("Generate Preview", self.generate_preview)
         collect_button.setFixedHeight(50)
         export_button.setFixedHeight(50)
@@ -271,8 +659,12 @@ class FileCollectorApp(QWidget):
         self.folder_list = QListWidget()
         folder_buttons_layout = QHBoxLayout()
         add_folder_button = self.create_button("Add Folder", self.add_folder)
+        add_archive_button = self.create_button("Add Archive", self.add_archive)
+        add_git_button = self.create_button("Add Git Repo", self.add_git_repository)
         remove_folder_button = self.create_button("Remove Selected", self.remove_selected_folder)
         folder_buttons_layout.addWidget(add_folder_button)
+        folder_buttons_layout.addWidget(add_archive_button)
+        folder_buttons_layout.addWidget(add_git_button)
         folder_buttons_layout.addWidget(remove_folder_button)
         folder_layout.addWidget(self.folder_list)
         folder_layout.addLayout(folder_buttons_layout)
@@ -309,9 +701,49 @@ class FileCollectorApp(QWidget):
         exclusion_buttons_layout.addWidget(remove_exclusion_button)
         exclusion_layout.addWidget(self.excluded_folders_list)
         exclusion_layout.addLayout(exclusion_buttons_layout)
+        # gitignore syntax, one pattern per line, relative to each folder.
+        self.exclude_patterns_input = QPlainTextEdit()
+        self.exclude_patterns_input.setPlaceholderText("Exclude patterns, e.g. packages/*/generated/** or !keep.min.js")
+        self.exclude_patterns_input.setMaximumHeight(70)
+        self.exclude_patterns_input.textChanged.connect(self.set_exclude_patterns)
+        self.include_patterns_input = QPlainTextEdit()
+        self.include_patterns_input.setPlaceholderText("Include patterns (empty includes everything), e.g. src/**")
+        self.include_patterns_input.setMaximumHeight(70)
+        self.include_patterns_input.textChanged.connect(self.set_include_patterns)
+        self.gitignore_checkbox = QCheckBox("Honour .gitignore Files")
+        self.gitignore_checkbox.toggled.connect(self.set_use_gitignore)
+        exclusion_layout.addWidget(self.exclude_patterns_input)
+        exclusion_layout.addWidget(self.include_patterns_input)
+        exclusion_layout.addWidget(self.gitignore_checkbox)
         exclusion_group.setLayout(exclusion_layout)
         return exclusion_group
 
+    def create_file_handling_group(self):
+        file_handling_group = QGroupBox("File Handling")
+        file_handling_layout = QVBoxLayout()
+        size_layout = QHBoxLayout()
+        self.max_file_size_spinbox = QSpinBox()
+        self.max_file_size_spinbox.setRange(0, 100 * 1024)
+        self.max_file_size_spinbox.setSuffix(" MB")
+        self.max_file_size_spinbox.setSpecialValueText("No limit")
+        self.max_file_size_spinbox.valueChanged.connect(self.set_max_file_size)
+        self.oversize_combo = QComboBox()
+        self.oversize_combo.addItems(OVERSIZE_POLICIES.keys())
+        self.oversize_combo.currentTextChanged.connect(self.set_oversize_policy)
+        size_layout.addWidget(QLabel("Max File Size:"))
+        size_layout.addWidget(self.max_file_size_spinbox)
+        size_layout.addWidget(self.oversize_combo)
+        encoding_layout = QHBoxLayout()
+        self.encoding_fallback_combo = QComboBox()
+        self.encoding_fallback_combo.addItems(ENCODING_FALLBACKS.keys())
+        self.encoding_fallback_combo.currentTextChanged.connect(self.set_encoding_fallback)
+        encoding_layout.addWidget(QLabel("Invalid UTF-8:"))
+        encoding_layout.addWidget(self.encoding_fallback_combo)
+        file_handling_layout.addLayout(size_layout)
+        file_handling_layout.addLayout(encoding_layout)
+        file_handling_group.setLayout(file_handling_layout)
+        return file_handling_group
+
     def create_export_group(self):
         export_group = QGroupBox("Export Settings")
         export_layout = QVBoxLayout()
@@ -319,16 +751,59 @@ class FileCollectorApp(QWidget):
         self.plain_text_radio = QRadioButton("Plain Text")
         self.json_radio = QRadioButton("JSON")
         self.yaml_radio = QRadioButton("YAML")
+        self.yaml_stream_radio = QRadioButton("YAML (One Document per File)")
         self.jsonl_radio = QRadioButton("JSONL")
+        self.indexed_radio = QRadioButton("Indexed (Random Access)")
         self.export_type_group.addButton(self.plain_text_radio)
         self.export_type_group.addButton(self.yaml_radio)
+        self.export_type_group.addButton(self.yaml_stream_radio)
         self.export_type_group.addButton(self.jsonl_radio)
+        self.export_type_group.addButton(self.indexed_radio)
         export_layout.addWidget(self.plain_text_radio)
         export_layout.addWidget(self.json_radio)
         export_layout.addWidget(self.yaml_radio)
+        export_layout.addWidget(self.yaml_stream_radio)
         export_layout.addWidget(self.jsonl_radio)
+        export_layout.addWidget(self.indexed_radio)
+        compression_layout = QHBoxLayout()
+        compression_layout.addWidget(QLabel("Compression:"))
+        self.compression_combo = QComboBox()
+        self.compression_combo.addItems(COMPRESSIONS.keys())
+        compression_layout.addWidget(self.compression_combo)
+        export_layout.addLayout(compression_layout)
         self.minify_checkbox = QCheckBox("Minify Content")
         export_layout.addWidget(self.minify_checkbox)
+        self.stream_export_checkbox = QCheckBox("Stream Export During Collection")
+        export_layout.addWidget(self.stream_export_checkbox)
+        self.deduplicate_checkbox = QCheckBox("Deduplicate Identical Files")
+        export_layout.addWidget(self.deduplicate_checkbox)
+        self.use_cache_checkbox = QCheckBox("Use Collection Cache")
+        # Reading from the cache only beats reading files that are slow to
+        # read, such as on network drives.
+        self.use_cache_checkbox.setChecked(False)
+        export_layout.addWidget(self.use_cache_checkbox)
+        self.snapshot_checkbox = QCheckBox("Write Snapshot Manifest")
+        export_layout.addWidget(self.snapshot_checkbox)
+        self.delta_checkbox = QCheckBox("Export Only Changes Since a Snapshot")
+        export_layout.addWidget(self.delta_checkbox)
+        shard_layout = QHBoxLayout()
+        self.shard_checkbox = QCheckBox("Split Into Shards of")
+        shard_layout.addWidget(self.shard_checkbox)
+        self.shard_limit_spinbox = QSpinBox()
+        self.shard_limit_spinbox.setRange(1, 10000000)
+        self.shard_limit_spinbox.setValue(100000)
+        shard_layout.addWidget(self.shard_limit_spinbox)
+        self.shard_unit_combo = QComboBox()
+        self.shard_unit_combo.addItems(SHARD_UNITS.keys())
+        shard_layout.addWidget(self.shard_unit_combo)
+        export_layout.addLayout(shard_layout)
+        estimator_layout = QHBoxLayout()
+        estimator_layout.addWidget(QLabel("Token Estimator:"))
+        self.token_estimator_combo = QComboBox()
+        self.token_estimator_combo.addItems(TOKEN_ESTIMATORS.keys())
+        self.token_estimator_combo.setCurrentText(DEFAULT_TOKEN_ESTIMATOR)
+        estimator_layout.addWidget(self.token_estimator_combo)
+        export_layout.addLayout(estimator_layout)
         export_group.setLayout(export_layout)
         return export_group
 
@@ -343,6 +818,28 @@ class FileCollectorApp(QWidget):
             self.selected_folders.append(folder)
             self.folder_list.addItem(folder)
 
+    def add_archive(self):
+        archive, _ = QFileDialog.getOpenFileName(self, "Select Archive", "", ARCHIVE_FILTER)
+        if archive:
+            self.selected_folders.append(archive)
+            self.folder_list.addItem(archive)
+
+    def add_git_repository(self):
+        # Members are read from the repository's object store at the chosen
+        # ref, so uncommitted changes are not collected.
+        repo = QFileDialog.getExistingDirectory(self, "Select Git Repository")
+        if not repo:
+            return
+        if not is_git_repository(repo):
+            QMessageBox.warning(self, "Not a Git Repository", f"{repo} is not a git repository.")
+            return
+        ref, ok = QInputDialog.getText(self, 'Git Ref', 'Branch, tag or commit to collect:', text='HEAD')
+        ref = ref.strip()
+        if ok and ref:
+            spec = f"{repo}{GIT_REF_SEPARATOR}{ref}"
+            self.selected_folders.append(spec)
+            self.folder_list.addItem(spec)
+
     def remove_selected_folder(self):
         for item in self.folder_list.selectedItems():
             self.selected_folders.remove(item.text())
@@ -377,7 +874,14 @@ class FileCollectorApp(QWidget):
         if ok and profile_name:
             self.profiles[profile_name] = {
                 'file_types': self.file_types.copy(),
-                'excluded_folders': self.excluded_folders.copy()
+                'excluded_folders': self.excluded_folders.copy(),
+                'include_patterns': self.include_patterns.copy(),
+                'exclude_patterns': self.exclude_patterns.copy(),
+                'use_gitignore': self.use_gitignore,
+                'read_workers': self.read_workers,
+                'max_file_size': self.max_file_size,
+                'oversize_policy': self.oversize_policy,
+                'encoding_fallback': self.encoding_fallback
             }
             self.profile_combo.addItem(profile_name)
             self.profile_combo.setCurrentText(profile_name)
@@ -387,6 +891,13 @@ class FileCollectorApp(QWidget):
             profile = self.profiles[profile_name]
             self.file_types = profile['file_types']
             self.excluded_folders = profile['excluded_folders']
+            self.include_patterns = list(profile.get('include_patterns', []))
+            self.exclude_patterns = list(profile.get('exclude_patterns', []))
+            self.use_gitignore = profile.get('use_gitignore', False)
+            self.read_workers = profile.get('read_workers', DEFAULT_READ_WORKERS)
+            self.max_file_size = profile.get('max_file_size', DEFAULT_MAX_FILE_SIZE)
+            self.oversize_policy = profile.get('oversize_policy', 'skip')
+            self.encoding_fallback = profile.get('encoding_fallback', 'skip')
             self.update_ui_from_profile()
 
     def update_ui_from_profile(self):
@@ -394,6 +905,42 @@ class FileCollectorApp(QWidget):
         self.file_types_list.addItems(self.file_types)
         self.excluded_folders_list.clear()
         self.excluded_folders_list.addItems(self.excluded_folders)
+        self.read_workers_spinbox.setValue(self.read_workers)
+        # Read the values up front, the setters below fire change signals.
+        max_file_size, oversize_policy, encoding_fallback = self.max_file_size, self.oversize_policy, self.encoding_fallback
+        include_patterns, exclude_patterns = self.include_patterns, self.exclude_patterns
+        self.exclude_patterns_input.setPlainText('\n'.join(exclude_patterns))
+        self.include_patterns_input.setPlainText('\n'.join(include_patterns))
+        self.include_patterns, self.exclude_patterns = include_patterns, exclude_patterns
+        self.gitignore_checkbox.setChecked(self.use_gitignore)
+        self.max_file_size_spinbox.setValue(max_file_size // (1024 * 1024))
+        self.oversize_combo.setCurrentText(next(k for k, v in OVERSIZE_POLICIES.items() if v == oversize_policy))
+        self.encoding_fallback_combo.setCurrentText(next(k for k, v in ENCODING_FALLBACKS.items() if v == encoding_fallback))
+        self.max_file_size = max_file_size
+
+    def set_exclude_patterns(self):
+        self.exclude_patterns = [line for line in self.exclude_patterns_input.toPlainText().splitlines() if line.strip()]
+
+    def set_include_patterns(self):
+        self.include_patterns = [line for line in self.include_patterns_input.toPlainText().splitlines() if line.strip()]
+
+    def set_use_gitignore(self, checked):
+        self.use_gitignore = checked
+
+    def set_read_workers(self, value):
+        self.read_workers = value
+
+    def set_max_file_size(self, value):
+        self.max_file_size = value * 1024 * 1024
+
+    def set_oversize_policy(self, text):
+        self.oversize_policy = OVERSIZE_POLICIES[text]
+
+    def set_encoding_fallback(self, text):
+        self.encoding_fallback = ENCODING_FALLBACKS[text]
+
+    def create_reader(self):
+        return FileReader(self.max_file_size, self.oversize_policy, self.encoding_fallback)
 
     def delete_profile(self):
         profile_name = self.profile_combo.currentText()
@@ -406,27 +953,212 @@ class FileCollectorApp(QWidget):
             QMessageBox.warning(self, "No Folders Selected", "Please select at least one folder.")
             return
 
+        export_writer = None
+        self.stream_export_path = None
+        if self.stream_export_checkbox.isChecked():
+            export_type = self.get_export_type()
+            if not export_type:
+                QMessageBox.warning(self, "No Export Type Selected", "Please select an export type.")
+                return
+            save_path = self.get_save_path(export_type)
+            if not save_path:
+                return
+            try:
+                export_writer = EXPORT_WRITERS[export_type](save_path, track_records=self.is_live_export_type(export_type),
+                                                            compression=self.get_compression())
+            except Exception as e:
+                QMessageBox.warning(self, "Error Exporting File", f"Could not export file: {str(e)}")
+                return
+            self.stream_export_path = save_path
+            self.stream_export_type = export_type
+
+        self.watch_checkbox.setChecked(False)
+        self.live_export = None
+        self.metrics = Metrics()
+        self.preview_thread.metrics = self.metrics
+        self.content_index = ContentIndex()
         self.progress_bar.setValue(0)
-        self.file_list.clear()
+        self.progress_bar.setFormat("%p%")
+        self.file_model.clear()
+        self.preview_cache.clear()
+        self.preview_path = None
+        self.preview_text.clear()
+        self.skipped_list.clear()
         self.collected_content.clear()
+        self.stream_references = {}
 
         use_relative_path = self.relative_path_checkbox.isChecked()
-
-        self.collector_thread = FileCollectorThread(self.selected_folders, self.file_types, self.excluded_folders, use_relative_path)
+        reader = self.create_reader()
+        path_filter = PathFilter(self.include_patterns, self.exclude_patterns, self.use_gitignore)
+        self.collection_settings = (list(self.selected_folders), list(self.file_types), list(self.excluded_folders), use_relative_path, reader, path_filter)
+
+        self.collector_thread = FileCollectorThread(self.selected_folders, self.file_types, self.excluded_folders, use_relative_path, self.read_workers,
+                                                    export_writer, self.minify_checkbox.isChecked(),
+                                                    DEFAULT_CACHE_PATH if self.use_cache_checkbox.isChecked() else None, reader,
+                                                    self.deduplicate_checkbox.isChecked(),
+                                                    self.token_estimator_combo.currentText(), path_filter, self.metrics,
+                                                    self.content_index)
         self.collector_thread.progress_update.connect(self.update_progress)
-        self.collector_thread.file_collected.connect(self.update_file_list)
+        self.collector_thread.files_collected.connect(self.file_model.add_files)
+        self.collector_thread.files_collected.connect(self.refresh_search)
+        self.collector_thread.files_skipped.connect(self.add_skipped_files)
+        self.collector_thread.export_failed.connect(self.stream_export_failed)
         self.collector_thread.finished.connect(self.collection_finished)
         self.collector_thread.start()
 
-    def update_progress(self, value):
+    def update_progress(self, value, eta):
         self.progress_bar.setValue(value)
+        if value >= 100:
+            self.progress_bar.setFormat("%p%")
+        else:
+            self.progress_bar.setFormat(f"%p% - {format_eta(eta if eta >= 0 else None)} left")
+
+    def refresh_search(self):
+        # Keeps an active search current while files arrive or change.
+        if self.search_input.text() and not self.search_timer.isActive():
+            self.search_timer.start(SEARCH_REFRESH_DELAY)
+
+    def run_search(self):
+        text = self.search_input.text()
+        if not text:
+            self.search_results = None
+            self.file_model.set_filter(None)
+            self.search_status_label.setText("")
+            return
+        if self.stream_export_path:
+            self.search_results = None
+            self.file_model.set_filter(None)
+            self.search_status_label.setText("Streamed exports keep no content to search")
+            return
+        try:
+            query = SearchQuery(text, self.search_regex_checkbox.isChecked(), self.search_case_checkbox.isChecked())
+        except re.error as e:
+            self.search_status_label.setText(f"Invalid regex: {str(e)}")
+            return
+        start = time.perf_counter()
+        self.search_results = self.content_index.search(query)
+        elapsed = time.perf_counter() - start
+        self.metrics.record('search', start, elapsed, len(self.search_results))
+        self.file_model.set_filter(self.search_results)
+        self.search_status_label.setText(
+            f"{len(self.search_results):,} of {len(self.file_model):,} files ({elapsed * 1000:.0f} ms)")
+
+    def update_metrics_view(self):
+        self.metrics_text.setPlainText("\n".join(self.metrics.report()))
+
+    def save_metrics(self):
+        save_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save Metrics", "", "JSON Summary (*.json);;Chrome Trace (*.json)")
+        if not save_path:
+            return
+        try:
+            self.metrics.save(save_path, 'chrome' if selected_filter.startswith("Chrome") else 'json')
+        except Exception as e:
+            QMessageBox.warning(self, "Error Saving Metrics", f"Could not save metrics: {str(e)}")
+
+    def add_skipped_file(self, file_path, reason, message):
+        self.skipped_list.addItem(f"{file_path} - {SKIP_REASONS[reason]}: {message}")
 
-    def update_file_list(self, file_path):
-        self.file_list.addItem(file_path)
+    def add_skipped_files(self, skipped):
+        self.skipped_list.addItems([f"{file_path} - {SKIP_REASONS[reason]}: {message}" for file_path, reason, message in skipped])
 
     def collection_finished(self, collected_content):
         self.collected_content = collected_content
-        QMessageBox.information(self, "Collection Complete", f"Collected {len(self.collected_content)} files.")
+        self.update_metrics_view()
+        if self.search_input.text():
+            self.run_search()
+        self.stream_references = self.collector_thread.references
+        writer = self.collector_thread.export_writer
+        if self.stream_export_path and writer.records is not None:
+            self.live_export = LiveExport(self.stream_export_path, self.stream_export_type, writer.records, self.collector_thread.minify)
+        skipped = f" Skipped {self.skipped_list.count()} files, see the Skipped tab." if self.skipped_list.count() else ""
+        deduplicator = self.collector_thread.deduplicator
+        if deduplicator is not None and deduplicator.duplicates:
+            skipped += f" {deduplicator.duplicates} duplicates stored as references, saving {deduplicator.bytes_saved:,} bytes."
+        if self.stream_export_path:
+            QMessageBox.information(self, "Collection Complete", f"Collected {len(self.file_model)} files and exported them to {self.stream_export_path}.{skipped}")
+        else:
+            QMessageBox.information(self, "Collection Complete", f"Collected {len(self.collected_content)} files.{skipped}")
+
+    def stream_export_failed(self, message):
+        self.stream_export_path = None
+        QMessageBox.warning(self, "Error Exporting File", f"Could not export file: {message}")
+
+    def toggle_watch_mode(self, enabled):
+        if self.watch_thread is not None:
+            self.watch_thread.stop()
+            self.watch_thread.wait()
+            self.watch_thread = None
+        if not enabled:
+            return
+        if not len(self.file_model):
+            QMessageBox.warning(self, "No Files Collected", "Please collect files before enabling watch mode.")
+            self.watch_checkbox.setChecked(False)
+            return
+        try:
+            Inotify().close()
+        except OSError as e:
+            QMessageBox.warning(self, "Watch Mode Unavailable", f"Could not watch folders: {str(e)}")
+            self.watch_checkbox.setChecked(False)
+            return
+        # Archives and git refs do not change under us.
+        folders = [folder for folder in self.collection_settings[0] if not is_source(folder)]
+        if not folders:
+            QMessageBox.warning(self, "Watch Mode Unavailable", "Watch mode only watches folders, not archives or git repositories.")
+            self.watch_checkbox.setChecked(False)
+            return
+        self.watch_thread = FolderWatchThread(folders, *self.collection_settings[1:])
+        self.watch_thread.files_changed.connect(self.apply_file_changes)
+        self.watch_thread.file_skipped.connect(self.add_skipped_file)
+        self.watch_thread.rescan_needed.connect(self.collect_files)
+        self.watch_thread.start()
+
+    def apply_file_changes(self, updated, removed):
+        removed_dirs = tuple(path + os.sep for path in removed)
+        removed_keys = set(removed)
+        if removed_dirs:
+            removed_keys.update(file_path for file_path in self.file_model.paths if file_path.startswith(removed_dirs))
+        # Duplicates of a changed canonical file are re-based before its old
+        # text is replaced.
+        contents = self.stream_references if self.stream_export_path else self.collected_content
+        read = self.watch_thread.watcher.read_key if self.watch_thread is not None else None
+        rebased = rebase_duplicates(contents, removed_keys | set(updated), read)
+        if rebased:
+            updated = {**rebased, **updated}
+        if self.stream_export_path:
+            for file_path in removed_keys:
+                self.stream_references.pop(file_path, None)
+            for file_path, content in updated.items():
+                if isinstance(content, DuplicateReference):
+                    self.stream_references[file_path] = content
+                else:
+                    self.stream_references.pop(file_path, None)
+        for file_path in removed_keys | set(updated):
+            self.preview_cache.discard(file_path)
+        for file_path in removed_keys:
+            self.collected_content.pop(file_path, None)
+        if not self.stream_export_path:
+            self.content_index.remove(removed_keys)
+            self.content_index.add_many(updated.items())
+        self.file_model.remove_files(removed_keys)
+        estimate_tokens = TOKEN_ESTIMATORS[self.token_estimator_combo.currentText()]
+        self.file_model.add_files([
+            file_row(file_path, content, estimate_tokens,
+                     FILE_STATUSES.index("Modified" if file_path in self.file_model else "Added"))
+            for file_path, content in updated.items()
+        ])
+        for file_path, content in updated.items():
+            if not self.stream_export_path:
+                self.collected_content[file_path] = content
+        self.refresh_search()
+        if self.preview_path in updated:
+            self.show_preview(self.file_list.currentIndex())
+        if self.live_export is not None:
+            try:
+                self.live_export.apply(updated, removed_keys)
+            except Exception as e:
+                self.live_export = None
+                QMessageBox.warning(self, "Error Exporting File", f"Could not update export: {str(e)}")
 
     def export_files(self):
         if not self.collected_content:
@@ -438,19 +1170,106 @@ class FileCollectorApp(QWidget):
             QMessageBox.warning(self, "No Export Type Selected", "Please select an export type.")
             return
 
-        if self.minify_checkbox.isChecked():
-            content_to_export = self.minify_content(self.collected_content)
-        else:
-            content_to_export = self.collected_content
+        delta = self.delta_checkbox.isChecked()
+        write_snapshot = delta or self.snapshot_checkbox.isChecked()
+        sharded = self.shard_checkbox.isChecked()
+        if write_snapshot and sharded:
+            QMessageBox.warning(self, "Snapshots Unavailable", "Snapshots and delta exports can't be split into shards.")
+            return
+        if delta and export_type not in DELTA_WRITERS:
+            QMessageBox.warning(self, "Delta Export Unavailable", "Delta exports are written as Plain Text or JSONL.")
+            return
+        if delta and self.search_results is not None:
+            # Files the search leaves out would be written as deleted.
+            QMessageBox.warning(self, "Delta Export Unavailable", "Clear the search to export only changes since a snapshot.")
+            return
 
-        save_path, _ = QFileDialog.getSaveFileName(self, "Save File", "", self.get_file_extension(export_type))
+        save_path = self.get_save_path(export_type)
+        if not save_path:
+            return
 
-        if save_path:
+        previous = None
+        if delta:
+            previous_path, _ = QFileDialog.getOpenFileName(self, "Select Previous Snapshot", snapshot_path(save_path),
+                                                           "Snapshots (*.snapshot.json);;JSON Files (*.json)")
+            if not previous_path:
+                return
             try:
-                self.save_content(content_to_export, save_path, export_type)
-                QMessageBox.information(self, "Export Successful", f"Content exported successfully to {save_path}")
-            except Exception as e:
-                QMessageBox.warning(self, "Error Exporting File", f"Could not export file: {str(e)}")
+                previous = Snapshot.load(previous_path)
+            except (OSError, ValueError) as e:
+                QMessageBox.warning(self, "Error Reading Snapshot", f"Could not read snapshot: {str(e)}")
+                return
+        snapshot = Snapshot() if write_snapshot else None
+
+        # Watch mode may change collected_content while the export runs.
+        search_text = None if self.search_results is None else self.search_input.text()
+        contents = None
+        if search_text is None:
+            records = list(self.collected_content.items())
+        else:
+            # Where duplicates left out of the search resolve their text from.
+            contents = dict(self.collected_content)
+            records = [(file_path, content) for file_path, content in self.collected_content.items()
+                       if file_path in self.search_results]
+            if not records:
+                QMessageBox.warning(self, "No Matching Files", "No collected file matches the search.")
+                return
+        minify = self.minify_checkbox.isChecked()
+        minify_stats = MinifyStats() if minify else None
+        compression = self.get_compression()
+        metrics = self.metrics
+        if sharded:
+            unit = SHARD_UNITS[self.shard_unit_combo.currentText()]
+            limit = self.shard_limit_spinbox.value()
+            if unit == 'bytes':
+                limit *= 1024
+            estimator = self.token_estimator_combo.currentText()
+            job = lambda: export_shards(records, save_path, export_type, limit, unit, estimator, minify=minify,
+                                        compression=compression, minify_stats=minify_stats, metrics=metrics,
+                                        contents=contents)
+        else:
+            track_records = self.is_live_export_type(export_type)
+
+            def job():
+                result = export(records, save_path, export_type, minify, track_records, compression, minify_stats,
+                                metrics, snapshot, previous, contents)
+                if snapshot is not None:
+                    # Saved only once the export is complete.
+                    snapshot.save(snapshot_path(save_path))
+                return result
+
+        self.export_button.setEnabled(False)
+        self.export_thread = ExportThread(job)
+        self.export_thread.export_complete.connect(
+            lambda result: self.export_finished(result, save_path, export_type, minify, minify_stats, sharded, search_text,
+                                                snapshot if previous is not None else None))
+        self.export_thread.export_failed.connect(self.export_failed)
+        self.export_thread.start()
+
+    def export_finished(self, result, save_path, export_type, minify, minify_stats, sharded, search_text=None, delta=None):
+        self.export_button.setEnabled(True)
+        self.update_metrics_view()
+        if sharded:
+            message = f"Content exported to {len(result['shards'])} shards next to {save_path}"
+        else:
+            if result is not None and search_text is None:
+                # A filtered export would pick up every changed file.
+                self.live_export = LiveExport(save_path, export_type, result, minify)
+            message = f"Content exported successfully to {save_path}"
+        if delta is not None:
+            message += f"\n\nChanges since the snapshot: {delta.summary()}."
+        if search_text is not None:
+            message += f"\n\nOnly the files matching \"{search_text}\" were exported."
+        if minify_stats is not None and minify_stats.by_type:
+            before, after = minify_stats.total()
+            message += f"\n\nMinified {before:,} to {after:,} bytes:\n" + "\n".join(minify_stats.summary())
+        QMessageBox.information(self, "Export Successful", message)
+
+    def export_failed(self, message):
+        self.export_button.setEnabled(True)
+        self.metrics.error('export', message)
+        self.update_metrics_view()
+        QMessageBox.warning(self, "Error Exporting File", f"Could not export file: {message}")
 
     def get_export_type(self):
         if self.plain_text_radio.isChecked():
@@ -459,57 +1278,81 @@ class FileCollectorApp(QWidget):
             return 'json'
         elif self.yaml_radio.isChecked():
             return 'yaml'
+        elif self.yaml_stream_radio.isChecked():
+            return 'yaml_stream'
         elif self.jsonl_radio.isChecked():
             return 'jsonl'
+        elif self.indexed_radio.isChecked():
+            return 'indexed'
         return None
 
+    def get_compression(self):
+        return COMPRESSIONS[self.compression_combo.currentText()]
+
+    def is_live_export_type(self, export_type):
+        # Compressed exports can't be patched in place.
+        return export_type in LIVE_EXPORT_FORMATTERS and not self.get_compression()
+
+    def get_save_path(self, export_type):
+        save_path, _ = QFileDialog.getSaveFileName(self, "Save File", "", self.get_file_extension(export_type))
+        if save_path and export_type != 'indexed':
+            # Indexed exports compress each record, not the whole file.
+            save_path = compressed_path(save_path, self.get_compression())
+        return save_path
+
     def get_file_extension(self, export_type):
         if export_type == 'plain_text':
             return "Text Files (*.txt)"
         elif export_type == 'json':
             return "JSON Files (*.json)"
-        elif export_type == 'yaml':
+        elif export_type in ('yaml', 'yaml_stream'):
             return "YAML Files (*.yaml)"
         elif export_type == 'jsonl':
             return "JSONL Files (*.jsonl)"
+        elif export_type == 'indexed':
+            return "Indexed Exports (*.ccx)"
         return ""
 
-    def minify_content(self, content):
-        minified_content = {}
-        for path, text in content.items():
-            minified_content[path] = textwrap.dedent(text).replace('\n', ' ').replace('\r', ' ').strip()
-        return minified_content
-
-    def save_content(self, content, path, export_type):
-        if export_type == 'plain_text':
-            with open(path, 'w', encoding='utf-8') as f:
-                for file_path, file_content in content.items():
-                    f.write(f"File: {file_path}\n\n{file_content}\n\n{'='*80}\n\n")
-        elif export_type == 'json':
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(content, f, indent=2, ensure_ascii=False)
-        elif export_type == 'yaml':
-            with open(path, 'w', encoding='utf-8') as f:
-                yaml.dump(content, f, allow_unicode=True)
-        elif export_type == 'jsonl':
-            with open(path, 'w', encoding='utf-8') as f:
-                for file_path, file_content in content.items():
-                    f.write(json.dumps({file_path: file_content}, ensure_ascii=False) + '\n')
-
     def generate_preview(self):
-        if not self.collected_content:
+        if not len(self.file_model):
             QMessageBox.warning(self, "No Files Collected", "Please collect files before generating a preview.")
             return
 
-        preview_text = ""
-        for file_path, content in self.collected_content.items():
-            preview_text += f"File: {file_path}\n\n"
-            preview_text += textwrap.shorten(content, width=500, placeholder="...\n\n")
-            preview_text += f"\n\n{'='*80}\n\n"
-
-        self.preview_text.setPlainText(preview_text)
+        if not self.file_list.currentIndex().isValid():
+            self.file_list.setCurrentIndex(self.file_model.index(0, 0))
         self.tab_widget.setCurrentIndex(1)  # Switch to the Preview tab
 
+    def show_preview(self, current, previous=None):
+        if not current.isValid():
+            return
+        file_path = self.file_model.path(current.row())
+        self.preview_path = file_path
+        preview = self.preview_cache.get(file_path)
+        if preview is not None:
+            self.render_preview(file_path, preview)
+            return
+        self.preview_text.setPlainText(f"File: {file_path}\n\nLoading preview...")
+        content = self.collected_content.get(file_path)
+        self.preview_thread.request(file_path, content, None if content is not None else self.find_on_disk(file_path))
+
+    def find_on_disk(self, file_path):
+        # Streamed exports keep no content in memory, so previews are read
+        # back from the collected folders. Archive and git members cannot be.
+        if os.path.isabs(file_path):
+            return file_path if os.path.isfile(file_path) else None
+        for folder in self.collection_settings[0]:
+            candidate = os.path.join(folder, file_path)
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def render_preview(self, file_path, preview):
+        if file_path != self.preview_path:
+            return
+        row = self.file_model.rows.get(file_path)
+        tokens = f" ({self.file_model.tokens[row]:,} tokens)" if row is not None else ""
+        self.preview_text.setPlainText(f"File: {file_path}{tokens}\n\n{preview}")
+
     def start_github_download(self):
         repo_url = self.github_input.text().strip()
         if not repo_url:
@@ -523,8 +1366,13 @@ class FileCollectorApp(QWidget):
         self.github_button.setEnabled(False)
         self.github_progress_bar.setVisible(True)
         self.github_status_label.setText("Downloading...")
+        self.metrics = Metrics()
+        self.preview_thread.metrics = self.metrics
+        self.github_estimator = ProgressEstimator()
 
-        self.github_thread = GithubDownloadThread(repo_url, output_folder)
+        self.github_thread = GithubDownloadThread(repo_url, output_folder, self.file_types, self.excluded_folders,
+                                                  GITHUB_ENGINES[self.github_engine_combo.currentText()],
+                                                  metrics=self.metrics)
         self.github_thread.download_complete.connect(self.github_download_complete)
         self.github_thread.download_progress.connect(self.update_github_progress)
         self.github_thread.start()
@@ -533,6 +1381,7 @@ class FileCollectorApp(QWidget):
         self.github_status_label.setText(message)
         self.github_button.setEnabled(True)
         self.github_progress_bar.setVisible(False)
+        self.update_metrics_view()
 
         if message.startswith("Download complete"):
             self.selected_folders.append(self.github_thread.output_folder)
@@ -540,13 +1389,23 @@ class FileCollectorApp(QWidget):
             QMessageBox.information(self, "Download Complete", "Repository has been downloaded and added to the folder list.")
 
     def update_github_progress(self, current, total):
-        self.github_progress_bar.setValue(int((current / total) * 100))
+        if total <= 0:
+            # Archive downloads are often sent without a Content-Length.
+            self.github_progress_bar.setRange(0, 0)
+            return
+        value, eta = self.github_estimator.update(current, total)
+        self.github_progress_bar.setRange(0, 100)
+        self.github_progress_bar.setValue(value)
+        self.github_progress_bar.setFormat(f"%p% - {format_eta(eta)} left" if value < 100 else "%p%")
 
     def closeEvent(self, event):
         reply = QMessageBox.question(self, 'Window Close', 'Are you sure you want to close the window?',
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
 
         if reply == QMessageBox.StandardButton.Yes:
+            self.watch_checkbox.setChecked(False)
+            self.preview_thread.stop()
+            self.preview_thread.wait()
             event.accept()
         else:
             event.ignore()
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import heapq
+import threading
+from collections import Counter
+
+DEFAULT_TOP_FILES = 10
+MAX_TRACE_EVENTS = 100000
+METRICS_FORMATS = ('json', 'chrome')
+
+class Metrics:
+    # Thread-safe record of one run: time, files and bytes per phase, skips
+    # by reason, errors, the slowest and largest files, and trace events.
+    # A phase's seconds are the time spent in it summed over all threads and
+    # processes; its span runs from its first start to its last end, and the
+    # rates are taken over the span.
+    def __init__(self, top_files=DEFAULT_TOP_FILES, max_events=MAX_TRACE_EVENTS):
+        self.lock = threading.Lock()
+        self.top_files = top_files
+        self.max_events = max_events
+        self.origin = time.perf_counter()
+        self.started = time.time()
+        self.phases = {}
+        self.skipped = Counter()
+        self.errors = Counter()
+        self.error_messages = []
+        self.slowest = []
+        self.largest = []
+        self.events = []
+        self.dropped_events = 0
+
+    def phase(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = {'seconds': 0.0, 'files': 0, 'bytes': 0, 'first': None, 'last': None}
+        return stats
+
+    def record(self, phase, start, seconds, files=1, size=0, file_path=None, event=True):
+        # start is a time.perf_counter() value. Each call with event set
+        # becomes one span in the trace, on the calling thread.
+        with self.lock:
+            stats = self.phase(phase)
+            stats['seconds'] += seconds
+            stats['files'] += files
+            stats['bytes'] += size
+            if stats['first'] is None or start < stats['first']:
+                stats['first'] = start
+            if stats['last'] is None or start + seconds > stats['last']:
+                stats['last'] = start + seconds
+            if file_path is not None:
+                self.rank(self.slowest, (seconds, file_path, phase))
+                if size and not any(item[1] == file_path for item in self.largest):
+                    self.rank(self.largest, (size, file_path, phase))
+            if event:
+                self.add_event(phase, file_path or phase, start, seconds, {'bytes': size} if size else None)
+
+    def rank(self, heap, item):
+        if len(heap) < self.top_files:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def add_event(self, category, name, start, seconds, args=None):
+        if len(self.events) >= self.max_events:
+            self.dropped_events += 1
+            return
+        self.events.append((category, name, start, seconds, threading.get_ident(), args))
+
+    def count(self, phase, files=0, size=0):
+        with self.lock:
+            stats = self.phase(phase)
+            stats['files'] += files
+            stats['bytes'] += size
+
+    def timer(self, phase, file_path=None, size=0, files=1):
+        return PhaseTimer(self, phase, file_path, size, files)
+
+    def timed(self, phase, items):
+        # Yields from items, counting the time spent producing each one. The
+        # whole loop becomes a single span in the trace.
+        iterator = iter(items)
+        first = None
+        busy = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                if first is None:
+                    first = start
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    busy += time.perf_counter() - start
+                    break
+                seconds = time.perf_counter() - start
+                busy += seconds
+                self.record(phase, start, seconds, event=False)
+                yield item
+        finally:
+            if first is not None:
+                with self.lock:
+                    self.add_event(phase, phase, first, time.perf_counter() - first, {'busy_seconds': round(busy, 6)})
+
+    def skip(self, reason):
+        with self.lock:
+            self.skipped[reason] += 1
+
+    def error(self, phase, message):
+        with self.lock:
+            self.errors[phase] += 1
+            if len(self.error_messages) < self.max_events:
+                self.error_messages.append({'phase': phase, 'message': message})
+
+    def summary(self):
+        with self.lock:
+            phases = {}
+            for name, stats in self.phases.items():
+                span = stats['last'] - stats['first'] if stats['first'] is not None else 0.0
+                phases[name] = {
+                    'seconds': round(stats['seconds'], 6),
+                    'span_seconds': round(span, 6),
+                    'files': stats['files'],
+                    'bytes': stats['bytes'],
+                    'files_per_s': round(stats['files'] / span, 1) if span else None,
+                    'mb_per_s': round(stats['bytes'] / span / 1e6, 2) if span else None,
+                }
+            file_entry = lambda value, key, file_path, phase: {'path': file_path, 'phase': phase, key: value}
+            return {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'wall_seconds': round(time.perf_counter() - self.origin, 6),
+                'phases': phases,
+                'skipped': dict(self.skipped),
+                'errors': dict(self.errors),
+                'error_messages': list(self.error_messages),
+                'slowest_files': [file_entry(round(seconds, 6), 'seconds', file_path, phase)
+                                  for seconds, file_path, phase in sorted(self.slowest, reverse=True)],
+                'largest_files': [file_entry(size, 'bytes', file_path, phase)
+                                  for size, file_path, phase in sorted(self.largest, reverse=True)],
+            }
+
+    def chrome_trace(self):
+        # Trace Event Format, as loaded by chrome://tracing and Perfetto.
+        pid = os.getpid()
+        with self.lock:
+            events = list(self.events)
+            dropped = self.dropped_events
+        trace_events = []
+        for category, name, start, seconds, tid, args in events:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': round((start - self.origin) * 1e6, 3), 'dur': round(seconds * 1e6, 3)}
+            if args:
+                event['args'] = args
+            trace_events.append(event)
+        summary = self.summary()
+        summary['dropped_events'] = dropped
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'otherData': summary}
+
+    def save(self, path, metrics_format='json'):
+        data = self.chrome_trace() if metrics_format == 'chrome' else self.summary()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=None if metrics_format == 'chrome' else 2, ensure_ascii=False)
+
+    def report(self):
+        # Human-readable lines for the GUI and the command line.
+        summary = self.summary()
+        lines = [f"Run started {summary['started']}, {summary['wall_seconds']:.2f}s elapsed"]
+        for name, stats in summary['phases'].items():
+            line = f"{name}: {stats['files']:,} files, {format_size(stats['bytes'])} in {stats['span_seconds']:.2f}s"
+            if stats['files_per_s'] is not None:
+                line += f" ({stats['files_per_s']:,.0f} files/s, {stats['mb_per_s']:.2f} MB/s)"
+            lines.append(line)
+        if summary['skipped']:
+            lines.append("Skipped: " + ", ".join(f"{reason} {count}" for reason, count in sorted(summary['skipped'].items())))
+        if summary['errors']:
+            lines.append("Errors: " + ", ".join(f"{phase} {count}" for phase, count in sorted(summary['errors'].items())))
+            lines.extend(f"  {entry['phase']}: {entry['message']}" for entry in summary['error_messages'][-5:])
+        if summary['slowest_files']:
+            lines.append("Slowest files:")
+            lines.extend(f"  {entry['seconds'] * 1000:8.1f} ms  {entry['phase']:<8} {entry['path']}"
+                         for entry in summary['slowest_files'])
+        if summary['largest_files']:
+            lines.append("Largest files:")
+            lines.extend(f"  {format_size(entry['bytes']):>10}  {entry['path']}" for entry in summary['largest_files'])
+        return lines
+
+class PhaseTimer:
+    def __init__(self, metrics, phase, file_path, size, files):
+        self.metrics = metrics
+        self.phase = phase
+        self.file_path = file_path
+        self.size = size
+        self.files = files
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.record(self.phase, self.start, time.perf_counter() - self.start, self.files, self.size,
+                            self.file_path)
+
+class ProgressEstimator:
+    # Percentage and time left from work done out of a (possibly estimated)
+    # total, in bytes or any other unit. The rate is the average since the
+    # first update, so one slow file does not swing the estimate.
+    MIN_ELAPSED = 0.5
+
+    def __init__(self):
+        self.start = None
+        self.start_done = 0
+
+    def update(self, done, total):
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+            self.start_done = done
+        percent = min(int(done * 100 / total), 100) if total > 0 else 0
+        elapsed = now - self.start
+        rate = (done - self.start_done) / elapsed if elapsed >= self.MIN_ELAPSED else 0
+        eta = max(total - done, 0) / rate if rate > 0 else None
+        return percent, eta
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:,.0f} {unit}" if unit == 'B' else f"{size:,.1f} {unit}"
+        size /= 1024
+
+def format_eta(seconds):
+    if seconds is None:
+        return "estimating..."
+    seconds = int(seconds + 0.5)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}:{seconds % 60:02d}"
@@ -0,0 +1,695 @@
+import io
+import os
+import re
+import ast
+import json
+import time
+import tokenize
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MINIFY_WORKERS = os.cpu_count() or 1
+# Records are sent to the worker processes in chunks of this many files or
+# characters, whichever is reached first.
+MINIFY_CHUNK_FILES = 64
+MINIFY_CHUNK_CHARS = 4 * 1024 * 1024
+
+# File type (as used in profile file_types) -> minifier taking and returning
+# text. Every minifier must return its input unchanged when it can't be sure
+# the result means the same thing.
+MINIFIERS = {}
+
+def register_minifier(file_types, minifier):
+    for file_type in file_types:
+        MINIFIERS[file_type.lstrip('.').lower()] = minifier
+
+def file_type_of(file_path):
+    # Longest registered type the name ends with, so "blade.php" can win over
+    # "php"; otherwise the plain extension.
+    name = os.path.basename(file_path).lower()
+    for file_type in sorted(MINIFIERS, key=len, reverse=True):
+        if name.endswith('.' + file_type):
+            return file_type
+    return os.path.splitext(name)[1][1:]
+
+def is_word_char(char):
+    return char.isalnum() or char in '_$' or ord(char) > 127
+
+def minify_whitespace(text):
+    # Fallback for types without a minifier: trailing whitespace and runs of
+    # blank lines only.
+    lines = []
+    blank = False
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line:
+            if not blank and lines:
+                lines.append('')
+            blank = True
+            continue
+        blank = False
+        lines.append(line)
+    return '\n'.join(lines) + ('\n' if lines else '')
+
+# Python
+
+FSTRING_START = getattr(tokenize, 'FSTRING_START', None)
+FSTRING_END = getattr(tokenize, 'FSTRING_END', None)
+
+def minify_python(text):
+    # Drops comments and blank lines, joins bracketed continuation lines and
+    # indents with one space per level. Docstrings are kept. The result must
+    # parse to the same AST or the original is returned.
+    try:
+        original = ast.dump(ast.parse(text))
+    except (SyntaxError, ValueError):
+        return text
+
+    line_starts = [0]
+    for line in text.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+
+    def offset(position):
+        return line_starts[position[0] - 1] + position[1]
+
+    lines = []
+    current = []
+    depth = 0
+    line_depth = 0
+    previous = ''
+    fstring_depth = 0
+    fstring_start = None
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(text).readline):
+            if fstring_depth:
+                # Python 3.12+ splits f-strings into parts; copy the source.
+                if token.type == FSTRING_START:
+                    fstring_depth += 1
+                elif token.type == FSTRING_END:
+                    fstring_depth -= 1
+                    if not fstring_depth:
+                        string = text[offset(fstring_start):offset(token.end)]
+                        if previous and needs_python_space(previous, string):
+                            current.append(' ')
+                        current.append(string)
+                        previous = string
+                continue
+            if token.type in (tokenize.COMMENT, tokenize.NL, tokenize.ENCODING):
+                continue
+            if token.type == tokenize.INDENT:
+                depth += 1
+                continue
+            if token.type == tokenize.DEDENT:
+                depth -= 1
+                continue
+            if token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                if current:
+                    lines.append(' ' * line_depth + ''.join(current))
+                current = []
+                previous = ''
+                continue
+            if not current:
+                line_depth = depth
+            if token.type == FSTRING_START:
+                fstring_depth = 1
+                fstring_start = token.start
+                continue
+            string = token.string
+            if previous and needs_python_space(previous, string):
+                current.append(' ')
+            current.append(string)
+            previous = string
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return text
+
+    minified = '\n'.join(lines) + '\n'
+    try:
+        if ast.dump(ast.parse(minified)) != original:
+            return text
+    except (SyntaxError, ValueError):
+        return text
+    return minified
+
+def needs_python_space(previous, string):
+    before, after = previous[-1], string[0]
+    if is_word_char(before) and (is_word_char(after) or after in '\'"'):
+        return True
+    # "1 .real" must not become the float "1.real".
+    return before.isdigit() and after == '.'
+
+# JavaScript and TypeScript
+
+JS_REGEX_KEYWORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else', 'yield',
+    'await',
+}
+JS_WHITESPACE = ' \t\r\f\v\u00a0\ufeff'
+JS_NEWLINES = '\n\u2028\u2029'
+
+class UnterminatedLiteral(ValueError):
+    # A string, template, regex or comment runs to the end of the text or, for
+    # strings, the end of the line. The tokenizer has misread the input, so
+    # the minifier gives up and returns it unchanged.
+    pass
+
+def scan_js_string(text, start):
+    quote = text[start]
+    index = start + 1
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            # A backslash before CRLF continues the line.
+            index += 3 if text.startswith('\r\n', index + 1) else 2
+            continue
+        if char == quote:
+            return index + 1
+        if char == '\n':
+            break
+        index += 1
+    raise UnterminatedLiteral(f"Unterminated string at {start}")
+
+def scan_js_template(text, start):
+    # Template literal including nested ${ } expressions, which may hold
+    # strings and templates of their own.
+    index = start + 1
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+        elif char == '`':
+            return index + 1
+        elif text.startswith('${', index):
+            index = scan_js_expression(text, index + 2)
+        else:
+            index += 1
+    raise UnterminatedLiteral(f"Unterminated template at {start}")
+
+def scan_js_expression(text, index):
+    depth = 1
+    while index < len(text):
+        char = text[index]
+        if char in '\'"':
+            index = scan_js_string(text, index)
+        elif char == '`':
+            index = scan_js_template(text, index)
+        elif char == '{':
+            depth += 1
+            index += 1
+        elif char == '}':
+            depth -= 1
+            index += 1
+            if not depth:
+                return index
+        else:
+            index += 1
+    raise UnterminatedLiteral("Unterminated template expression")
+
+def scan_js_regex(text, start):
+    # Returns None if the '/' can't start a regex literal on this line.
+    index = start + 1
+    in_class = False
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '\n':
+            return None
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            index += 1
+            while index < len(text) and is_word_char(text[index]):
+                index += 1
+            return index
+        index += 1
+    return None
+
+def regex_allowed(previous):
+    # Whether a '/' after the previous token starts a regex literal rather
+    # than a division.
+    if not previous:
+        return True
+    if previous in JS_REGEX_KEYWORDS:
+        return True
+    return previous[-1] in '(,=:[!&|?{};+-*%<>~^'
+
+def scan_block_comment(text, start, opening_length=2):
+    end = text.find('*/', start + opening_length)
+    if end < 0:
+        raise UnterminatedLiteral(f"Unterminated comment at {start}")
+    return end + 2
+
+def minify_js(text):
+    # Drops comments (except /*! ... */ license blocks) and whitespace that
+    # separates nothing. Line breaks are kept where automatic semicolon
+    # insertion could depend on them.
+    try:
+        return tokenize_js(text)
+    except UnterminatedLiteral:
+        return text
+
+def tokenize_js(text):
+    out = []
+    previous = ''
+    previous_is_regex = False
+    pending = ''
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char in JS_WHITESPACE:
+            pending = pending or ' '
+            index += 1
+            continue
+        if char in JS_NEWLINES:
+            pending = '\n'
+            index += 1
+            continue
+        if text.startswith('//', index):
+            end = text.find('\n', index)
+            index = length if end < 0 else end
+            continue
+        if text.startswith('/*', index) and not text.startswith('/*!', index):
+            end = scan_block_comment(text, index)
+            pending = '\n' if '\n' in text[index:end] else (pending or ' ')
+            index = end
+            continue
+
+        is_regex = False
+        if text.startswith('/*!', index):
+            end = scan_block_comment(text, index, 3)
+        elif char in '\'"':
+            end = scan_js_string(text, index)
+        elif char == '`':
+            end = scan_js_template(text, index)
+        elif char == '/' and regex_allowed(previous):
+            # Where a regex is allowed, a '/' that doesn't start one means the
+            # tokenizer has lost track.
+            end = scan_js_regex(text, index)
+            if end is None:
+                raise UnterminatedLiteral(f"Unterminated regex at {index}")
+            is_regex = True
+        elif is_word_char(char):
+            end = index + 1
+            while end < length and is_word_char(text[end]):
+                end += 1
+        else:
+            end = index + 1
+        token = text[index:end]
+
+        if pending and previous:
+            if pending == '\n' and previous[-1] not in '{;,([' and token[0] not in ');,]}':
+                out.append('\n')
+            elif needs_js_space(previous, previous_is_regex, token):
+                out.append(' ')
+        out.append(token)
+        previous = token
+        previous_is_regex = is_regex
+        pending = ''
+        index = end
+    return ''.join(out) + '\n' if out else ''
+
+def needs_js_space(previous, previous_is_regex, token):
+    before, after = previous[-1], token[0]
+    if is_word_char(before) and is_word_char(after):
+        return True
+    if previous_is_regex and is_word_char(after):
+        return True
+    if before.isdigit() and after == '.':
+        return True
+    # "a + +b", "a - -b" and "a / /re/" must not merge.
+    return before in '+-/' and after == before
+
+# JSON
+
+def minify_json(text):
+    # Whitespace outside strings only; strings are copied byte for byte.
+    # Anything that isn't strict JSON, such as JSONC with comments, is
+    # returned unchanged, and so is a result that loads to another value.
+    try:
+        original = json.loads(text)
+    except ValueError:
+        return text
+    out = []
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char == '"':
+            end = index + 1
+            while end < length and text[end] != '"':
+                end += 2 if text[end] == '\\' else 1
+            out.append(text[index:end + 1])
+            index = end + 1
+        elif char in ' \t\r\n':
+            index += 1
+        else:
+            out.append(char)
+            index += 1
+    minified = ''.join(out) + '\n' if out else ''
+    try:
+        if json.loads(minified) != original:
+            return text
+    except ValueError:
+        return text
+    return minified
+
+# CSS, SCSS and Less
+
+CSS_URL = re.compile(r'url\(\s*', re.IGNORECASE)
+
+def scan_css_url(text, start, opening_end):
+    # url( ... ) is one token: its argument may be unquoted and hold "//".
+    index = opening_end
+    if index < len(text) and text[index] in '\'"':
+        index = scan_js_string(text, index)
+    end = text.find(')', index)
+    if end < 0:
+        raise UnterminatedLiteral(f"Unterminated url( at {start}")
+    return end + 1
+
+def minify_css(text, line_comments=False):
+    # Drops comments and whitespace next to braces, semicolons, commas and
+    # combinators. Whitespace before ':' is kept because "a :hover" and
+    # "a:hover" are different selectors.
+    try:
+        return tokenize_css(text, line_comments)
+    except UnterminatedLiteral:
+        return text
+
+def tokenize_css(text, line_comments=False):
+    out = []
+    previous = ''
+    pending = False
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if char.isspace():
+            pending = True
+            index += 1
+            continue
+        if text.startswith('/*', index) and not text.startswith('/*!', index):
+            index = scan_block_comment(text, index)
+            pending = True
+            continue
+        if line_comments and text.startswith('//', index) and (not previous or pending or previous[-1] in '{};'):
+            end = text.find('\n', index)
+            index = length if end < 0 else end
+            pending = True
+            continue
+        url = CSS_URL.match(text, index) if char in 'uU' else None
+        if text.startswith('/*!', index):
+            end = scan_block_comment(text, index, 3)
+        elif char in '\'"':
+            end = scan_js_string(text, index)
+        elif url and (not index or not (is_word_char(text[index - 1]) or text[index - 1] == '-')):
+            end = scan_css_url(text, index, url.end())
+        else:
+            end = index + 1
+        token = text[index:end]
+        if token == '}' and out and out[-1] == ';':
+            out.pop()
+        if pending and previous and previous[-1] not in '{};,>(:' and token[0] not in '{};,>)':
+            out.append(' ')
+        out.append(token)
+        previous = token
+        pending = False
+        index = end
+    return ''.join(out) + '\n' if out else ''
+
+def minify_scss(text):
+    return minify_css(text, line_comments=True)
+
+# HTML
+
+HTML_TOKEN = re.compile(
+    r'<!--.*?-->'
+    r'|<(script|style|pre|textarea)\b[^>]*>.*?</\1\s*>'
+    r'|<[^>]*>'
+    r'|[^<]+|<',
+    re.DOTALL | re.IGNORECASE
+)
+HTML_RAW_OPENING = re.compile(r'<(script|style|pre|textarea)\b', re.IGNORECASE)
+HTML_RAW_ELEMENT = re.compile(r'(<(\w+)\b[^>]*>)(.*)(</\w+\s*>)$', re.DOTALL)
+HTML_WHITESPACE = re.compile(r'\s+')
+
+def minify_html(text):
+    # Drops comments (except conditional comments) and collapses runs of
+    # whitespace in text to one character. <pre> and <textarea> are left as
+    # they are; <script> and <style> bodies go through the JS and CSS
+    # minifiers. An unterminated comment or raw element returns the input.
+    out = []
+    for match in HTML_TOKEN.finditer(text):
+        token = match.group(0)
+        if token.startswith('<!--'):
+            if not token.endswith('-->'):
+                return text
+            if token.startswith('<!--[if') or token.startswith('<!--<![endif'):
+                out.append(token)
+        elif match.group(1):
+            element = match.group(1).lower()
+            if element in ('script', 'style'):
+                opening, _, body, closing = HTML_RAW_ELEMENT.match(token).groups()
+                if element == 'style':
+                    body = minify_css(body).rstrip('\n')
+                elif 'type=' not in opening.lower() or re.search(r'type=["\']?(text|application)/(java|ecma)script|type=["\']?module', opening, re.IGNORECASE):
+                    body = minify_js(body).rstrip('\n')
+                token = opening + body + closing
+            out.append(token)
+        elif token.startswith('<'):
+            if HTML_RAW_OPENING.match(token) or text.startswith('<!--', match.start()):
+                return text
+            out.append(token)
+        else:
+            out.append(HTML_WHITESPACE.sub(lambda space: '\n' if '\n' in space.group(0) else ' ', token))
+    return ''.join(out).strip() + '\n' if out else ''
+
+# Markdown
+
+MARKDOWN_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+# An inline code span (a backtick run closed by a run of the same length) or
+# an HTML comment; whichever starts first wins, as in CommonMark.
+MARKDOWN_INLINE = re.compile(r'(?<!`)(`+)(?!`).+?(?<!`)\1(?!`)|<!--.*?-->', re.DOTALL)
+
+def is_indented_code(line):
+    return line.startswith('    ') or line.startswith('\t')
+
+def minify_markdown(text):
+    # Outside fenced and indented code: drops HTML comments that are not in
+    # an inline code span, trailing whitespace (keeping two-space hard breaks)
+    # and repeated blank lines.
+    lines = []
+    fence = None
+    indented = False
+    prose = []
+
+    def flush_prose():
+        if not prose:
+            return
+        blank = bool(lines) and lines[-1] == ''
+        joined = MARKDOWN_INLINE.sub(lambda match: match.group(0) if match.group(1) else '', '\n'.join(prose))
+        for line in joined.split('\n'):
+            stripped = line.rstrip()
+            if not stripped:
+                if not blank and lines:
+                    lines.append('')
+                blank = True
+                continue
+            blank = False
+            lines.append(stripped + '  ' if line.endswith('  ') else stripped)
+        prose.clear()
+
+    for line in text.splitlines():
+        match = MARKDOWN_FENCE.match(line)
+        if fence is None and match:
+            flush_prose()
+            fence = match.group(1)
+            lines.append(line)
+        elif fence is not None:
+            lines.append(line)
+            if line.strip().startswith(fence[0] * len(fence)) and not line.strip().strip(fence[0]):
+                fence = None
+        elif indented and (is_indented_code(line) or not line.strip()):
+            lines.append(line if line.strip() else '')
+        elif is_indented_code(line) and line.strip() and (not prose or not prose[-1].strip()):
+            # Indented code can't interrupt a paragraph, so it starts after a
+            # blank line or at the top and runs until a line that is neither
+            # blank nor indented.
+            flush_prose()
+            indented = True
+            lines.append(line)
+        else:
+            indented = False
+            prose.append(line)
+    flush_prose()
+    while lines and not lines[-1]:
+        lines.pop()
+    return '\n'.join(lines) + '\n' if lines else ''
+
+# YAML
+
+YAML_BLOCK_SCALAR = re.compile(r'(^|[\s:-])[|>][0-9+-]*$')
+
+def strip_yaml_comment(line):
+    quote = None
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if quote:
+            if quote == '"' and char == '\\':
+                index += 1
+            elif quote == "'" and line.startswith("''", index):
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"' and (index == 0 or line[index - 1] in ' \t:-[{,'):
+            quote = char
+        elif char == '#' and (index == 0 or line[index - 1] in ' \t'):
+            return line[:index].rstrip()
+        index += 1
+    return line.rstrip()
+
+def minify_yaml(text):
+    # Drops comments and blank lines outside block scalars. The result must
+    # load to the same documents or the original is returned.
+    try:
+        import yaml
+    except ImportError:
+        return text
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    try:
+        original = list(yaml.load_all(text, Loader=loader))
+    except yaml.YAMLError:
+        return text
+
+    lines = []
+    block_indent = None
+    for line in text.splitlines():
+        indent = len(line) - len(line.lstrip(' '))
+        if block_indent is not None:
+            if not line.strip() or indent > block_indent:
+                lines.append(line)
+                continue
+            block_indent = None
+        stripped = strip_yaml_comment(line)
+        if not stripped.strip():
+            continue
+        lines.append(stripped)
+        if YAML_BLOCK_SCALAR.search(stripped):
+            block_indent = indent
+    while lines and not lines[-1].strip():
+        lines.pop()
+
+    minified = '\n'.join(lines) + '\n' if lines else ''
+    try:
+        if list(yaml.load_all(minified, Loader=loader)) != original:
+            return text
+    except yaml.YAMLError:
+        return text
+    return minified
+
+register_minifier(['py', 'pyw'], minify_python)
+register_minifier(['js', 'mjs', 'cjs', 'ts', 'mts', 'cts'], minify_js)
+register_minifier(['json'], minify_json)
+register_minifier(['css'], minify_css)
+register_minifier(['scss', 'less'], minify_scss)
+register_minifier(['html', 'htm'], minify_html)
+register_minifier(['md', 'markdown'], minify_markdown)
+register_minifier(['yaml', 'yml'], minify_yaml)
+
+def minify_content(file_path, text):
+    return MINIFIERS.get(file_type_of(file_path), minify_whitespace)(text)
+
+class MinifyStats:
+    # Bytes before and after minification per file type.
+    def __init__(self):
+        self.by_type = {}
+
+    def add(self, file_type, before, after):
+        totals = self.by_type.setdefault(file_type or '(none)', [0, 0, 0])
+        totals[0] += 1
+        totals[1] += before
+        totals[2] += after
+
+    def total(self):
+        before = sum(totals[1] for totals in self.by_type.values())
+        after = sum(totals[2] for totals in self.by_type.values())
+        return before, after
+
+    def summary(self):
+        lines = []
+        for file_type, (files, before, after) in sorted(self.by_type.items(), key=lambda item: item[1][1] - item[1][2],
+                                                        reverse=True):
+            saved = 100 - after * 100 / before if before else 0
+            lines.append(f"{file_type}: {files} files, {before:,} -> {after:,} bytes (-{saved:.1f}%)")
+        return lines
+
+def minify_file(file_path, content):
+    # Returns (minified, file_type, bytes before, bytes after, seconds).
+    # Anything that isn't text (a duplicate reference) passes through.
+    if not isinstance(content, str):
+        return content, None, 0, 0, 0.0
+    start = time.perf_counter()
+    minified = minify_content(file_path, content)
+    seconds = time.perf_counter() - start
+    return (minified, file_type_of(file_path), len(content.encode('utf-8', 'replace')),
+            len(minified.encode('utf-8', 'replace')), seconds)
+
+def minify_chunk(chunk):
+    return [minify_file(file_path, content) for file_path, content in chunk]
+
+def minify_records(records, workers=DEFAULT_MINIFY_WORKERS, stats=None, metrics=None):
+    # Minifies (file_path, content) records in worker processes and yields
+    # them in their original order. Inputs that fit in one chunk are done in
+    # this process, which is cheaper than starting the pool. Per-file times
+    # measured in the workers go to metrics when given.
+    executor = None
+    pending = deque()
+    chunk = []
+    chunk_chars = 0
+
+    def results(chunk, minified):
+        now = time.perf_counter()
+        for (file_path, _), (content, file_type, before, after, seconds) in zip(chunk, minified):
+            if stats is not None and file_type is not None:
+                stats.add(file_type, before, after)
+            if metrics is not None and file_type is not None:
+                # Worker clocks are not guaranteed to match ours, so the file is
+                # placed just before its result arrived and left out of the trace.
+                metrics.record('minify', now - seconds, seconds, 1, before, file_path, event=False)
+            yield file_path, content
+
+    try:
+        for file_path, content in records:
+            chunk.append((file_path, content))
+            chunk_chars += len(content) if isinstance(content, str) else 0
+            if len(chunk) < MINIFY_CHUNK_FILES and chunk_chars < MINIFY_CHUNK_CHARS:
+                continue
+            if workers <= 1:
+                yield from results(chunk, minify_chunk(chunk))
+            else:
+                if executor is None:
+                    # Forking a process that runs Qt or other threads is
+                    # unsafe, so workers are spawned.
+                    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+                pending.append((chunk, executor.submit(minify_chunk, chunk)))
+                while len(pending) > workers * 2:
+                    done_chunk, future = pending.popleft()
+                    yield from results(done_chunk, future.result())
+            chunk = []
+            chunk_chars = 0
+        if chunk and executor is None:
+            yield from results(chunk, minify_chunk(chunk))
+        elif chunk:
+            pending.append((chunk, executor.submit(minify_chunk, chunk)))
+        while pending:
+            done_chunk, future = pending.popleft()
+            yield from results(done_chunk, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
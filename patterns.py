@@ -0,0 +1,287 @@
+import os
+import re
+
+GITIGNORE_NAME = '.gitignore'
+# The POSIX classes git accepts in brackets, over ASCII like git's ctype.
+POSIX_CLASSES = {
+    'alnum': 'a-zA-Z0-9',
+    'alpha': 'a-zA-Z',
+    'blank': ' \\t',
+    'cntrl': '\\x00-\\x1f\\x7f',
+    'digit': '0-9',
+    'graph': '!-~',
+    'lower': 'a-z',
+    'print': ' -~',
+    'punct': re.escape('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'),
+    'space': ' \\t\\n\\r\\x0b\\x0c',
+    'upper': 'A-Z',
+    'xdigit': '0-9A-Fa-f',
+}
+# A rule that can never match, for patterns git rejects as malformed.
+NEVER = '(?!)'
+
+def translate_class(pattern, index):
+    # Translates the bracket expression at pattern[index] the way git's
+    # wildmatch reads it. Returns (regex, end) with end just past the closing
+    # bracket, (NEVER, end) for an unknown [:class:], or None when the bracket
+    # is never closed. Like any wildcard, a bracket never matches '/'.
+    length = len(pattern)
+    position = index + 1
+    negated = position < length and pattern[position] in '!^'
+    if negated:
+        position += 1
+    items = []
+    previous = None
+    first = True
+    while position < length and (first or pattern[position] != ']'):
+        first = False
+        char = pattern[position]
+        if char == '\\':
+            position += 1
+            if position == length:
+                return None
+            char = pattern[position]
+            items.append(re.escape(char))
+        elif char == '-' and previous is not None and position + 1 < length and pattern[position + 1] != ']':
+            position += 1
+            last = pattern[position]
+            if last == '\\':
+                position += 1
+                if position == length:
+                    return None
+                last = pattern[position]
+            items.pop()
+            # A reversed range matches nothing.
+            if previous <= last:
+                items.append(f"{re.escape(previous)}-{re.escape(last)}")
+            position += 1
+            previous = None
+            continue
+        elif pattern.startswith('[:', position):
+            close = pattern.find(']', position + 2)
+            if close < 0:
+                return None
+            if close > position + 2 and pattern[close - 1] == ':':
+                name = pattern[position + 2:close - 1]
+                if name not in POSIX_CLASSES:
+                    end = pattern.find(']', close + 1)
+                    return (NEVER, end + 1) if end >= 0 else None
+                items.append(POSIX_CLASSES[name])
+                position = close + 1
+                previous = None
+                continue
+            items.append(re.escape(char))
+        else:
+            items.append(re.escape(char))
+        previous = char
+        position += 1
+    if position >= length:
+        return None
+    body = ''.join(items)
+    if negated:
+        return f'[^/{body}]', position + 1
+    if not body:
+        return NEVER, position + 1
+    regex = f'[{body}]'
+    if re.fullmatch(regex, '/'):
+        regex = '(?!/)' + regex
+    return regex, position + 1
+
+def translate_pattern(pattern):
+    # Turns one gitignore line into (regex, negated, dir_only), or None for
+    # blank lines and comments. The regex matches a '/'-separated path
+    # relative to the directory the pattern belongs to.
+    if pattern.endswith('\n'):
+        pattern = pattern.rstrip('\r\n')
+    while pattern.endswith(' ') and not pattern.endswith('\\ '):
+        pattern = pattern[:-1]
+    if not pattern or pattern.startswith('#'):
+        return None
+    negated = pattern.startswith('!')
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith('\\!') or pattern.startswith('\\#'):
+        pattern = pattern[1:]
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    if not pattern:
+        return None
+    # A slash anywhere but at the end ties the pattern to its directory;
+    # otherwise it matches a name at any depth.
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+
+    parts = []
+    index = 0
+    length = len(pattern)
+    while index < length:
+        char = pattern[index]
+        if pattern.startswith('**', index):
+            at_start = index == 0 or pattern[index - 1] == '/'
+            at_end = index + 2 == length or pattern[index + 2] == '/'
+            if at_start and at_end:
+                if index + 2 == length:
+                    parts.append('.*')
+                    index += 2
+                else:
+                    parts.append('(?:.*/)?')
+                    index += 3
+                continue
+            parts.append('[^/]*')
+            index += 2
+        elif char == '*':
+            parts.append('[^/]*')
+            index += 1
+        elif char == '?':
+            parts.append('[^/]')
+            index += 1
+        elif char == '[':
+            translated = translate_class(pattern, index)
+            if translated is None:
+                parts.append(re.escape(char))
+                index += 1
+                continue
+            parts.append(translated[0])
+            index = translated[1]
+        elif char == '\\' and index + 1 < length:
+            parts.append(re.escape(pattern[index + 1]))
+            index += 2
+        else:
+            parts.append(re.escape(char))
+            index += 1
+    regex = ''.join(parts)
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    return regex, negated, dir_only
+
+def valid_regex(regex):
+    try:
+        re.compile(regex)
+    except re.error:
+        return False
+    return True
+
+class PatternSet:
+    # A list of gitignore rules compiled into one regex per kind of path.
+    # Alternatives are tried last rule first, so the first alternative that
+    # matches is the rule gitignore says wins.
+    def __init__(self, patterns=()):
+        rules = [rule for rule in map(translate_pattern, patterns) if rule is not None]
+        self.empty = not rules
+        self.dir_regex, self.dir_negated = self.compile(rules)
+        self.file_regex, self.file_negated = self.compile([rule for rule in rules if not rule[2]])
+
+    @staticmethod
+    def compile(rules):
+        if not rules:
+            return None, ()
+        rules = rules[::-1]
+        try:
+            regex = re.compile('|'.join(f'({rule[0]})' for rule in rules), re.DOTALL)
+        except re.error:
+            # A rule that does not compile matches nothing; the rest still apply.
+            rules = [rule if valid_regex(rule[0]) else (NEVER,) + rule[1:] for rule in rules]
+            regex = re.compile('|'.join(f'({rule[0]})' for rule in rules), re.DOTALL)
+        return regex, tuple(rule[1] for rule in rules)
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                return cls(f.read().splitlines())
+        except OSError:
+            return cls()
+
+    def match(self, relative_path, is_dir=False):
+        # True if ignored, False if re-included by a negated rule, None if no
+        # rule applies.
+        regex, negated = (self.dir_regex, self.dir_negated) if is_dir else (self.file_regex, self.file_negated)
+        if regex is None:
+            return None
+        match = regex.fullmatch(relative_path)
+        if match is None:
+            return None
+        return not negated[match.lastindex - 1]
+
+def relative_to(base, path):
+    # path is always inside base here, so slicing is enough.
+    relative_path = path[len(base):].lstrip(os.sep)
+    return relative_path.replace(os.sep, '/') if os.sep != '/' else relative_path
+
+class PathFilter:
+    # Include and exclude rules of a profile plus, optionally, the .gitignore
+    # files found while walking. Profile rules are relative to each collected
+    # folder and override .gitignore files; a deeper .gitignore overrides the
+    # ones above it.
+    def __init__(self, include_patterns=(), exclude_patterns=(), use_gitignore=False):
+        self.includes = PatternSet(include_patterns)
+        self.excludes = PatternSet(exclude_patterns)
+        self.use_gitignore = use_gitignore
+
+    def root_context(self, folder):
+        # Rules in effect for the collected folder itself; .git/info/exclude
+        # applies like a top-level .gitignore.
+        context = ()
+        if self.use_gitignore:
+            exclude_path = os.path.join(folder, '.git', 'info', 'exclude')
+            if os.path.isfile(exclude_path):
+                context = ((folder, PatternSet.from_file(exclude_path)),)
+        return context
+
+    def enter(self, context, directory, has_gitignore):
+        # Context for the entries of directory, given whether it holds a
+        # .gitignore.
+        if not self.use_gitignore or not has_gitignore:
+            return context
+        rules = PatternSet.from_file(os.path.join(directory, GITIGNORE_NAME))
+        return context if rules.empty else context + ((directory, rules),)
+
+    def ignored(self, context, folder, path, is_dir):
+        ignored = self.excludes.match(relative_to(folder, path), is_dir)
+        if ignored is not None:
+            return ignored
+        for base, rules in reversed(context):
+            ignored = rules.match(relative_to(base, path), is_dir)
+            if ignored is not None:
+                return ignored
+        return False
+
+    def included(self, folder, path):
+        return self.includes.empty or self.includes.match(relative_to(folder, path)) is True
+
+    def directory_context(self, folder, directory):
+        # Context for the entries of a directory inside folder, or None if the
+        # directory or one above it is ignored.
+        context = self.enter(self.root_context(folder), folder, self.has_gitignore(folder))
+        relative_dir = os.path.relpath(directory, folder)
+        if relative_dir == '.':
+            return context
+        current = folder
+        for part in relative_dir.split(os.sep):
+            current = os.path.join(current, part)
+            if self.ignored(context, folder, current, True):
+                return None
+            context = self.enter(context, current, self.has_gitignore(current))
+        return context
+
+    def allows(self, folder, path):
+        # Full check for a single file, as used for file system events.
+        context = self.directory_context(folder, os.path.dirname(path))
+        return context is not None and not self.ignored(context, folder, path, False) and self.included(folder, path)
+
+    def allows_member(self, relative_path):
+        # Profile patterns for a '/'-separated path inside an archive or a git
+        # tree; there are no directories to read .gitignore files from.
+        parts = relative_path.split('/')
+        for depth in range(1, len(parts)):
+            if self.excludes.match('/'.join(parts[:depth]), True):
+                return False
+        if self.excludes.match(relative_path, False):
+            return False
+        return self.includes.empty or self.includes.match(relative_path) is True
+
+    def has_gitignore(self, directory):
+        return self.use_gitignore and os.path.isfile(os.path.join(directory, GITIGNORE_NAME))
+
+    def __bool__(self):
+        return self.use_gitignore or not self.includes.empty or not self.excludes.empty
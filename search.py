@@ -0,0 +1,229 @@
+import re
+import threading
+from array import array
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from core import DuplicateReference
+
+WORD = re.compile(r'\w+')
+# Fragments shorter than this match too many words to narrow anything down,
+# unless they must be a whole word.
+MIN_FRAGMENT = 3
+# Rebuild the index once more files have been removed than are left.
+COMPACT_AFTER = 1000
+
+# The letters re.IGNORECASE matches beyond what casefold() equates, checked
+# over all of Unicode: 'i' also matches 'ı' and 'İ', which casefold to 'ı' and
+# 'i' plus a combining dot. Case-insensitive regex literals are cut at them,
+# as if the literal ended there.
+IGNORECASE_ONLY = re.compile('[iIıİ]')
+REPEATS = tuple(getattr(sre_parse, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                if hasattr(sre_parse, name))
+
+def word_constraints(literal):
+    # What a match containing literal says about the words of a file, as
+    # (kind, casefolded fragment): a word run inside the literal that has
+    # non-word characters on both sides is a whole word ('exact'), one cut
+    # off at the end is a word's prefix, at the start its suffix, and a
+    # literal that is a single run can be anywhere inside a word.
+    constraints = []
+    literal = literal.casefold()
+    for match in WORD.finditer(literal):
+        starts_word = match.start() > 0
+        ends_word = match.end() < len(literal)
+        fragment = match.group()
+        if starts_word and ends_word:
+            constraints.append(('exact', fragment))
+        elif len(fragment) >= MIN_FRAGMENT:
+            kind = 'prefix' if starts_word else 'suffix' if ends_word else 'contains'
+            constraints.append((kind, fragment))
+    return constraints
+
+def required_literals(pattern, flags=0):
+    # Literal runs every match of the regular expression must contain. Only
+    # plain sequences are followed; anything optional or alternative ends a
+    # run, which can only make the constraints weaker, never wrong.
+    runs = []
+
+    def walk(items, current):
+        for op, value in items:
+            if op == sre_parse.LITERAL:
+                current.append(chr(value))
+                continue
+            if op == sre_parse.SUBPATTERN:
+                current = walk(value[-1], current)
+                continue
+            runs.append(''.join(current))
+            current = []
+            if op in REPEATS and value[0] >= 1:
+                runs.append(''.join(walk(value[2], [])))
+        return current
+
+    runs.append(''.join(walk(sre_parse.parse(pattern, flags), [])))
+    return [run for run in runs if run]
+
+class SearchQuery:
+    # A substring or regular expression to find in file contents, with the
+    # word constraints used to narrow the candidates through a ContentIndex.
+    # Raises re.error for an invalid regular expression.
+    def __init__(self, text, regex=False, case_sensitive=False):
+        flags = 0 if case_sensitive else re.IGNORECASE
+        self.pattern = re.compile(text if regex else re.escape(text), flags | re.MULTILINE)
+        # Plain substrings skip the regex engine, which is several times
+        # slower than casefolding the content and searching it.
+        self.needle = None if regex else text if case_sensitive else text.casefold()
+        self.case_sensitive = case_sensitive
+        literals = required_literals(text, flags) if regex else [text]
+        if regex and not case_sensitive:
+            literals = [piece for literal in literals for piece in IGNORECASE_ONLY.split(literal)]
+        self.constraints = [constraint for literal in literals for constraint in word_constraints(literal)]
+
+    def matches(self, content):
+        if not isinstance(content, str):
+            return False
+        if self.needle is not None:
+            return self.needle in (content if self.case_sensitive else content.casefold())
+        return self.pattern.search(content) is not None
+
+def filter_records(records, query):
+    # Keeps the (file_path, content) records matching query. A duplicate
+    # reference matches when the file it points to did.
+    matched = set()
+    for file_path, content in records:
+        if isinstance(content, DuplicateReference):
+            if content.canonical_path not in matched:
+                continue
+        elif not query.matches(content):
+            continue
+        matched.add(file_path)
+        yield file_path, content
+
+class ContentIndex:
+    # Inverted index from casefolded words to the files containing them,
+    # built incrementally as files are collected. Queries are narrowed to the
+    # files holding every word a match implies and then verified against the
+    # content, which is shared with the collection rather than copied.
+    # Prefix, suffix and substring lookups of words run over one string
+    # holding the whole vocabulary, so they stay in C. Words are casefolded
+    # rather than lowered because lower() depends on context (a Greek final
+    # sigma), which would drop files that match.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.paths = []
+        self.contents = []
+        self.ids = {}
+        self.postings = {}
+        self.duplicates = {}
+        self.removed = 0
+        self.vocabulary = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, file_path, content):
+        with self.lock:
+            if file_path in self.ids:
+                self.discard(file_path)
+            self.insert(file_path, content)
+
+    def add_many(self, records):
+        with self.lock:
+            for file_path, content in records:
+                if file_path in self.ids:
+                    self.discard(file_path)
+                self.insert(file_path, content)
+
+    def remove(self, file_paths):
+        with self.lock:
+            for file_path in file_paths:
+                self.discard(file_path)
+            if self.removed > COMPACT_AFTER and self.removed > len(self.ids):
+                self.compact()
+
+    def insert(self, file_path, content):
+        doc = len(self.paths)
+        self.paths.append(file_path)
+        self.contents.append(content)
+        self.ids[file_path] = doc
+        if isinstance(content, DuplicateReference):
+            self.duplicates.setdefault(content.canonical_path, set()).add(file_path)
+            return
+        if not isinstance(content, str):
+            return
+        postings = self.postings
+        for word in set(WORD.findall(content.casefold())):
+            docs = postings.get(word)
+            if docs is None:
+                postings[word] = array('I', (doc,))
+                self.vocabulary = None
+            else:
+                docs.append(doc)
+
+    def discard(self, file_path):
+        # Postings keep the old id; it is skipped because its content is gone.
+        doc = self.ids.pop(file_path, None)
+        if doc is None:
+            return
+        content = self.contents[doc]
+        if isinstance(content, DuplicateReference):
+            self.duplicates.get(content.canonical_path, set()).discard(file_path)
+        self.paths[doc] = None
+        self.contents[doc] = None
+        self.removed += 1
+
+    def compact(self):
+        live = [(file_path, content) for file_path, content in zip(self.paths, self.contents) if file_path is not None]
+        self.clear()
+        for file_path, content in live:
+            self.insert(file_path, content)
+
+    def vocabulary_text(self):
+        if self.vocabulary is None:
+            self.vocabulary = '\n' + '\n'.join(self.postings) + '\n'
+        return self.vocabulary
+
+    def words_matching(self, kind, fragment):
+        text = self.vocabulary_text()
+        needle = '\n' + fragment if kind == 'prefix' else fragment + '\n' if kind == 'suffix' else fragment
+        words = []
+        position = text.find(needle)
+        while position >= 0:
+            start = text.rfind('\n', 0, position + 1 if kind == 'prefix' else position) + 1
+            end = text.find('\n', start)
+            words.append(text[start:end])
+            position = text.find(needle, end)
+        return words
+
+    def lookup(self, kind, fragment):
+        if kind == 'exact':
+            return set(self.postings.get(fragment, ()))
+        postings = self.postings
+        return set().union(*(postings[word] for word in self.words_matching(kind, fragment)))
+
+    def candidates(self, constraints):
+        # Whole words first: they are one dictionary lookup each.
+        docs = None
+        for kind, fragment in sorted(set(constraints), key=lambda item: (item[0] != 'exact', -len(item[1]))):
+            found = self.lookup(kind, fragment)
+            docs = found if docs is None else docs & found
+            if not docs:
+                return set()
+        return range(len(self.paths)) if docs is None else docs
+
+    def search(self, query):
+        # Returns the set of paths whose content matches query.
+        with self.lock:
+            matched = set()
+            for doc in self.candidates(query.constraints):
+                if query.matches(self.contents[doc]):
+                    matched.add(self.paths[doc])
+            for file_path in list(matched):
+                matched.update(self.duplicates.get(file_path, ()))
+        return matched
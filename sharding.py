@@ -0,0 +1,190 @@
+import os
+import json
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+
+from core import (
+    COMPRESSION_SUFFIXES, DEFAULT_TOKEN_ESTIMATOR, EXPORT_WRITERS, TOKEN_ESTIMATORS, format_jsonl_record, format_plain_text_record,
+    format_yaml_document, format_yaml_record, DuplicateReference, resolve_duplicate
+)
+
+SHARD_UNITS = {
+    "Tokens": 'tokens',
+    "KB": 'bytes',
+}
+DEFAULT_SHARD_WORKERS = 4
+
+# How each export type frames a record, used to measure records before they
+# are assigned to shards. JSON objects are measured like JSONL lines.
+RECORD_FORMATTERS = {
+    'plain_text': format_plain_text_record,
+    'json': format_jsonl_record,
+    'yaml': format_yaml_record,
+    'yaml_stream': format_yaml_document,
+    'jsonl': format_jsonl_record,
+    'indexed': lambda file_path, file_content: f"{file_path}{file_content}",
+}
+
+def split_extension(path):
+    # Keeps a compression suffix with the extension: "export.jsonl.gz" ->
+    # ("export", ".jsonl.gz").
+    base, extension = os.path.splitext(path)
+    if extension in COMPRESSION_SUFFIXES.values():
+        base, inner_extension = os.path.splitext(base)
+        extension = inner_extension + extension
+    return base, extension
+
+def shard_path(path, index):
+    # "export.jsonl" -> "export.001.jsonl"
+    base, extension = split_extension(path)
+    return f"{base}.{index:03d}{extension}"
+
+def manifest_path(path):
+    return f"{split_extension(path)[0]}.manifest.json"
+
+class ShardPlanner:
+    # Packs records into shards of at most `limit` bytes or estimated tokens
+    # with best-fit decreasing. A file is only split when it is over the
+    # limit by itself.
+    def __init__(self, export_type, limit, unit='tokens', estimator=DEFAULT_TOKEN_ESTIMATOR):
+        if limit <= 0:
+            raise ValueError("The shard limit must be positive")
+        self.format_record = RECORD_FORMATTERS[export_type]
+        self.limit = limit
+        self.unit = unit
+        self.estimate_tokens = TOKEN_ESTIMATORS[estimator]
+
+    def measure(self, text):
+        if self.unit == 'bytes':
+            return len(text.encode('utf-8'))
+        return self.estimate_tokens(text)
+
+    def split(self, file_path, content):
+        # Splits an oversized file at line boundaries into parts that fit.
+        # Lines are measured raw, so the budget is scaled by how much the
+        # export format inflates the content (escaping, indentation) and
+        # tightened until every part fits or is down to a single line.
+        overhead = self.measure(self.format_record(f"{file_path} [part 000/000]", ''))
+        lines = content.splitlines(keepends=True)
+        line_sizes = [self.measure(line) for line in lines]
+        inflation = max(self.measure(self.format_record(file_path, content)) - overhead, 1) / max(sum(line_sizes), 1)
+        budget = max((self.limit - overhead) / inflation, 1)
+        while True:
+            chunks = []
+            current = []
+            current_size = 0
+            for line, size in zip(lines, line_sizes):
+                if current and current_size + size > budget:
+                    chunks.append(''.join(current))
+                    current = []
+                    current_size = 0
+                current.append(line)
+                current_size += size
+            if current:
+                chunks.append(''.join(current))
+            parts = [(f"{file_path} [part {index}/{len(chunks)}]", chunk) for index, chunk in enumerate(chunks, 1)]
+            if budget <= 1 or all(
+                self.measure(self.format_record(part_path, chunk)) <= self.limit or '\n' not in chunk.rstrip('\n')
+                for part_path, chunk in parts
+            ):
+                return parts
+            budget = max(budget * 0.9, 1)
+
+    def plan(self, records):
+        # Returns a list of shards, each a list of (file_path, content, size)
+        # in collection order.
+        items = []
+        for file_path, content in records:
+            size = self.measure(self.format_record(file_path, content))
+            if size > self.limit and isinstance(content, str):
+                for part_path, part in self.split(file_path, content):
+                    items.append((len(items), part_path, part, self.measure(self.format_record(part_path, part))))
+            else:
+                items.append((len(items), file_path, content, size))
+
+        # Best fit decreasing: each item goes to the fullest shard it fits in,
+        # found by bisecting the (space left, shard) pairs kept sorted.
+        shards = []
+        spaces = []
+        for item in sorted(items, key=lambda item: item[3], reverse=True):
+            size = item[3]
+            position = bisect.bisect_left(spaces, (size, -1))
+            if position < len(spaces):
+                space, index = spaces.pop(position)
+                shards[index].append(item)
+            else:
+                space, index = self.limit, len(shards)
+                shards.append([item])
+            bisect.insort(spaces, (space - size, index))
+        return [[item[1:] for item in sorted(shard)] for shard in shards]
+
+def write_shard(path, export_type, shard, compression=None, metrics=None):
+    with EXPORT_WRITERS[export_type](path, compression=compression) as writer:
+        for file_path, content, _ in shard:
+            writer.write(file_path, content)
+    size = os.path.getsize(path)
+    if metrics is not None:
+        metrics.count('export', len(shard), size)
+    return size
+
+def resolve_all_duplicates(records, contents=None):
+    # Canonical files come before their duplicates, so the text of each record
+    # is kept for the references after it, unless contents (file path ->
+    # content) already holds it.
+    texts = {} if contents is None else contents
+    for file_path, content in records:
+        if isinstance(content, DuplicateReference):
+            content = resolve_duplicate(content, texts)
+        elif contents is None:
+            texts[file_path] = content
+        yield file_path, content
+
+def export_shards(records, path, export_type, limit, unit='tokens', estimator=DEFAULT_TOKEN_ESTIMATOR,
+                  minify=False, workers=DEFAULT_SHARD_WORKERS, compression=None, minify_stats=None, metrics=None,
+                  contents=None):
+    # Writes numbered shards next to path plus a manifest, and returns the
+    # manifest. Each shard must stand on its own, so duplicates are exported
+    # with their full content.
+    records = resolve_all_duplicates(records, contents)
+    if minify:
+        from minifiers import minify_records
+        records = minify_records(records, stats=minify_stats, metrics=metrics)
+    planner = ShardPlanner(export_type, limit, unit, estimator)
+    if metrics is not None:
+        # Planning holds every record anyway; listing them first keeps the
+        # collection out of the planning time.
+        records = list(records)
+        with metrics.timer('plan', files=len(records)):
+            shards = planner.plan(records)
+    else:
+        shards = planner.plan(records)
+    paths = [shard_path(path, index) for index in range(1, len(shards) + 1)]
+
+    def write(job):
+        if metrics is None:
+            return write_shard(job[0], export_type, job[1], compression)
+        # Files and bytes are counted by write_shard once the shard is closed.
+        with metrics.timer('export', os.path.basename(job[0]), files=0):
+            return write_shard(job[0], export_type, job[1], compression, metrics)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(write, zip(paths, shards)))
+
+    entries = []
+    for shard_file, shard, size in zip(paths, shards, sizes):
+        entry = {'path': os.path.basename(shard_file), 'bytes': size}
+        if unit == 'tokens':
+            entry['tokens'] = sum(measured for _, _, measured in shard)
+        entry['files'] = [{'path': file_path, unit: measured} for file_path, _, measured in shard]
+        entries.append(entry)
+    manifest = {
+        'export_type': export_type,
+        'limit': limit,
+        'unit': unit,
+        'estimator': estimator,
+        'compression': compression,
+        'shards': entries,
+    }
+    with open(manifest_path(path), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
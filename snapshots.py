@@ -0,0 +1,114 @@
+import os
+import json
+import time
+from collections import Counter
+
+from core import DuplicateReference, ExportWriter, content_digest, export_value, format_plain_text_record, xxhash
+from sharding import split_extension
+
+SNAPSHOT_VERSION = 1
+DIGEST_NAME = 'xxh3_128' if xxhash is not None else 'blake2b_128'
+CHANGE_LABELS = {
+    'add': "added",
+    'modify': "modified",
+    'delete': "deleted",
+}
+
+def snapshot_path(path):
+    # "export.jsonl.gz" -> "export.snapshot.json"
+    return f"{split_extension(path)[0]}.snapshot.json"
+
+def record_digest(content, files):
+    # files maps the paths hashed so far to their digests.
+    if isinstance(content, DuplicateReference):
+        # A reference changes when the file it points to does: the canonical
+        # file comes first, so its digest is part of the reference's.
+        data = f"\0duplicate_of\0{content.canonical_path}\0{files.get(content.canonical_path, '')}".encode('utf-8')
+    else:
+        data = content.encode('utf-8')
+    return content_digest(data).hex()
+
+class Snapshot:
+    # Path and content hash of every file in an export, as exported (after
+    # minification). Saved next to an export, it is what the next export is
+    # compared against to write only the changes.
+    def __init__(self, files=None, digest=DIGEST_NAME):
+        self.files = {} if files is None else files
+        self.digest = digest
+        self.changes = Counter()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION or not isinstance(data.get('files'), dict):
+            raise ValueError(f"{path} is not a snapshot manifest")
+        return cls(data['files'], data.get('digest'))
+
+    def save(self, path):
+        # Written to a temporary file first, so the previous snapshot stays
+        # intact if the export fails; it may be the one just compared against.
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'digest': self.digest,
+            'files': self.files,
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=0, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def record(self, records):
+        # Passes (file_path, content) records through, hashing each one.
+        for file_path, content in records:
+            self.files[file_path] = record_digest(content, self.files)
+            yield file_path, content
+
+    def delta(self, records, previous):
+        # Yields (change, file_path, content) for the records added or
+        # modified since the previous Snapshot, then the deleted paths with a
+        # content of None. Every record is hashed into this snapshot.
+        comparable = previous.digest == self.digest
+        for file_path, content in records:
+            digest = self.files[file_path] = record_digest(content, self.files)
+            old_digest = previous.files.get(file_path)
+            if old_digest is None:
+                change = 'add'
+            elif old_digest != digest or not comparable:
+                change = 'modify'
+            else:
+                self.changes['unchanged'] += 1
+                continue
+            self.changes[change] += 1
+            yield change, file_path, content
+        for file_path in previous.files:
+            if file_path not in self.files:
+                self.changes['delete'] += 1
+                yield 'delete', file_path, None
+
+    def summary(self):
+        return ", ".join(f"{self.changes[change]} {label}" for change, label in CHANGE_LABELS.items())
+
+class DeltaJsonlWriter(ExportWriter):
+    # One operation per line: {"op": "add", "path": ..., "content": ...};
+    # deletes have no content.
+    def format_record(self, file_path, change):
+        change, content = change
+        record = {'op': change, 'path': file_path}
+        if change != 'delete':
+            record['content'] = content
+        return json.dumps(record, ensure_ascii=False, default=export_value) + '\n'
+
+class DeltaPlainTextWriter(ExportWriter):
+    # The Plain Text format with the change after each path.
+    def format_record(self, file_path, change):
+        change, content = change
+        if change == 'delete':
+            return f"Deleted: {file_path}\n\n{'='*80}\n\n"
+        return format_plain_text_record(f"{file_path} ({CHANGE_LABELS[change]})", content)
+
+DELTA_WRITERS = {
+    'plain_text': DeltaPlainTextWriter,
+    'jsonl': DeltaJsonlWriter,
+}
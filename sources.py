@@ -0,0 +1,274 @@
+import io
+import os
+import stat
+import time
+import tarfile
+import zipfile
+import threading
+import subprocess
+
+from core import SkippedFile, compile_extension_matcher
+
+ZIP_SUFFIXES = ('.zip', '.jar', '.whl')
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+# "path/to/repo@ref" collects a ref of a local git repository.
+GIT_REF_SEPARATOR = '@'
+ARCHIVE_FILTER = "Archives (*.zip *.jar *.whl *.tar *.tar.gz *.tgz *.tar.bz2 *.tbz2 *.tar.xz *.txz)"
+
+def member_parts(name):
+    # '/'-separated parts of a member name, or None for names that point
+    # outside the archive.
+    parts = [part for part in name.replace('\\', '/').split('/') if part and part != '.']
+    if not parts or '..' in parts:
+        return None
+    return parts
+
+def is_bare_repository(path):
+    return all(os.path.exists(os.path.join(path, name)) for name in ('HEAD', 'objects', 'refs'))
+
+def is_git_repository(path):
+    return os.path.isdir(path) and (is_bare_repository(path) or os.path.exists(os.path.join(path, '.git')))
+
+def source_kind(spec):
+    # 'zip', 'tar' or 'git' for what is collected without a folder walk, or
+    # None for a plain folder. A bare repository collects its HEAD; any
+    # repository can be given as "path@ref".
+    if os.path.isfile(spec):
+        name = spec.lower()
+        if name.endswith(ZIP_SUFFIXES):
+            return 'zip'
+        if name.endswith(TAR_SUFFIXES):
+            return 'tar'
+        return None
+    if os.path.isdir(spec):
+        return 'git' if is_bare_repository(spec) else None
+    repo, separator, ref = spec.rpartition(GIT_REF_SEPARATOR)
+    if separator and ref and is_git_repository(repo):
+        return 'git'
+    return None
+
+def is_source(spec):
+    return source_kind(spec) is not None
+
+def open_source(spec):
+    kind = source_kind(spec)
+    if kind == 'zip':
+        return ZipSource(spec)
+    if kind == 'tar':
+        return TarSource(spec)
+    if kind == 'git':
+        if os.path.isdir(spec):
+            return GitSource(spec)
+        repo, _, ref = spec.rpartition(GIT_REF_SEPARATOR)
+        return GitSource(repo, ref)
+    return None
+
+def split_sources(specs, on_skip):
+    # Returns (folders, sources) in the order given. Sources that cannot be
+    # opened are reported as on_skip(spec, 'read_error', message).
+    folders = []
+    sources = []
+    for spec in specs:
+        try:
+            source = open_source(spec)
+        except Exception as e:
+            on_skip(spec, 'read_error', f"Could not open: {str(e)}")
+            continue
+        if source is None:
+            folders.append(spec)
+        else:
+            sources.append(source)
+    return folders, sources
+
+class ZipSource:
+    # Members are decompressed one at a time straight from the archive.
+    def __init__(self, path):
+        self.root = path
+        self.archive = zipfile.ZipFile(path)
+        self.total_bytes = os.path.getsize(path)
+        self.done_bytes = 0
+
+    def members(self, wanted, reader=None):
+        # Yields (parts, size, open_member) for the regular files wanted(parts)
+        # accepts.
+        for info in self.archive.infolist():
+            self.done_bytes += info.compress_size
+            if info.is_dir() or stat.S_ISLNK(info.external_attr >> 16):
+                continue
+            parts = member_parts(info.filename)
+            if parts is None or not wanted(parts):
+                continue
+            yield parts, info.file_size, lambda info=info: self.archive.open(info)
+
+    def close(self):
+        self.archive.close()
+
+class TarSource:
+    # Read front to back in stream mode, so a compressed tarball is neither
+    # seeked nor extracted. Progress is the position in the archive file.
+    def __init__(self, path):
+        self.root = path
+        self.file = open(path, 'rb')
+        try:
+            self.archive = tarfile.open(fileobj=self.file, mode='r|*')
+        except Exception:
+            self.file.close()
+            raise
+        self.total_bytes = os.path.getsize(path)
+        self.done_bytes = 0
+
+    def members(self, wanted, reader=None):
+        for member in self.archive:
+            self.done_bytes = self.file.tell()
+            # Links and devices have no content of their own.
+            if not member.isfile():
+                continue
+            parts = member_parts(member.name)
+            if parts is None or not wanted(parts):
+                continue
+            yield parts, member.size, lambda member=member: self.archive.extractfile(member)
+        self.done_bytes = self.total_bytes
+
+    def close(self):
+        self.archive.close()
+        self.file.close()
+
+class GitSource:
+    # A ref of a local repository, bare or not, read from its object store:
+    # `git ls-tree` lists the files and one `git cat-file --batch` process
+    # streams the blobs. Nothing is checked out.
+    def __init__(self, repo, ref='HEAD'):
+        self.root = repo
+        self.ref = ref
+        self.entries = self.list_tree()
+        self.total_bytes = sum(size for _, _, size in self.entries)
+        self.done_bytes = 0
+
+    def git(self, *args):
+        return ['git', '-C', self.root, *args]
+
+    def list_tree(self):
+        try:
+            result = subprocess.run(self.git('ls-tree', '-r', '-z', '--long', '--full-tree', self.ref),
+                                    capture_output=True)
+        except FileNotFoundError:
+            raise OSError("git is not installed")
+        if result.returncode:
+            message = result.stderr.decode('utf-8', 'replace').strip()
+            raise OSError(f"git ls-tree {self.ref} failed: {message}")
+        entries = []
+        for line in result.stdout.split(b'\0'):
+            if not line:
+                continue
+            info, _, path = line.partition(b'\t')
+            mode, kind, sha, size = info.split()
+            # Submodules are commits and symlinks have mode 120000.
+            if kind != b'blob' or mode == b'120000':
+                continue
+            entries.append((os.fsdecode(path), sha.decode('ascii'), int(size)))
+        return entries
+
+    def members(self, wanted, reader=None):
+        # Without a reader only names are listed and no blob is fetched.
+        selected = []
+        for path, sha, size in self.entries:
+            parts = path.split('/')
+            if wanted(parts):
+                selected.append((parts, sha, size))
+            else:
+                self.done_bytes += size
+        fetch = [sha for _, sha, size in selected if reader is not None and size and reader.bytes_to_read(size)]
+        if not fetch:
+            for parts, sha, size in selected:
+                self.done_bytes += size
+                yield parts, size, lambda: io.BytesIO(b'')
+            return
+
+        process = subprocess.Popen(self.git('cat-file', '--batch'), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL)
+
+        def request():
+            # Fed from a thread so a full stdout pipe can never block us.
+            try:
+                for sha in fetch:
+                    process.stdin.write(f"{sha}\n".encode('ascii'))
+                process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+
+        writer = threading.Thread(target=request, daemon=True)
+        writer.start()
+        requested = set(fetch)
+        try:
+            for parts, sha, size in selected:
+                self.done_bytes += size
+                if sha not in requested:
+                    # Empty, or skipped for its size before it is opened.
+                    yield parts, size, lambda: io.BytesIO(b'')
+                    continue
+                data = self.read_blob(process.stdout)
+                yield parts, size, lambda data=data: open_blob(data)
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdout.close()
+            writer.join()
+
+    def read_blob(self, stdout):
+        # Returns the blob's bytes, or an OSError for a missing object, which
+        # cat-file reports without a body.
+        header = stdout.readline().split()
+        if len(header) != 3:
+            return OSError(f"Object {header[0].decode('ascii', 'replace') if header else ''} is missing")
+        data = stdout.read(int(header[2]))
+        stdout.read(1)
+        return data
+
+    def close(self):
+        pass
+
+def open_blob(data):
+    if isinstance(data, Exception):
+        raise data
+    return io.BytesIO(data)
+
+def member_filter(file_types=(), excluded_folders=(), path_filter=None):
+    matches = compile_extension_matcher(file_types)
+    excluded = set(excluded_folders)
+    path_filter = path_filter or None
+
+    def wanted(parts):
+        if not matches(parts[-1]) or any(part in excluded for part in parts[:-1]):
+            return False
+        return path_filter is None or path_filter.allows_member('/'.join(parts))
+    return wanted
+
+def member_path(source, parts, use_relative_path):
+    return '/'.join(parts) if use_relative_path else os.path.join(source.root, *parts)
+
+def list_source(source, file_types=(), excluded_folders=(), path_filter=None):
+    for parts, _, _ in source.members(member_filter(file_types, excluded_folders, path_filter)):
+        yield member_path(source, parts, False)
+
+def read_source(source, reader, file_types=(), excluded_folders=(), path_filter=None, use_relative_path=False,
+                on_skip=None, metrics=None):
+    # Yields (file_path, content) for the text members of source, through
+    # the same filters and FileReader checks as files on disk.
+    for parts, size, open_member in source.members(member_filter(file_types, excluded_folders, path_filter), reader):
+        file_path = member_path(source, parts, use_relative_path)
+        start = time.perf_counter()
+        try:
+            reader.limit_for(size)
+            with open_member() as f:
+                content = reader.read_stream(f, size)[0]
+        except Exception as e:
+            reason = e.reason if isinstance(e, SkippedFile) else 'read_error'
+            if on_skip is not None:
+                on_skip(file_path, reason, str(e))
+            if metrics is not None:
+                metrics.record('read', start, time.perf_counter() - start, file_path=file_path)
+            continue
+        if metrics is not None:
+            metrics.record('read', start, time.perf_counter() - start, 1, size, file_path)
+        yield file_path, content
@@ -0,0 +1,40 @@
+import os
+
+from core import CollectionCache, FileReader, collect
+
+def collect_cached(folder, cache_path):
+    cache = CollectionCache(cache_path)
+    try:
+        return dict(collect([folder], [], [], read_workers=4, cache=cache, on_skip=lambda *skip: None)), cache
+    finally:
+        cache.close()
+
+def test_warm_cache_serves_unchanged_files(tmp_path):
+    folder = tmp_path / 'project'
+    folder.mkdir()
+    for index in range(20):
+        (folder / f"{index}.py").write_text(f"x = {index}\n")
+    cache_path = str(tmp_path / 'cache' / 'cache.sqlite3')
+    cold, cache = collect_cached(str(folder), cache_path)
+    assert (cache.hits, cache.misses) == (0, 20)
+    (folder / '3.py').write_text('changed = True\n')
+    warm, cache = collect_cached(str(folder), cache_path)
+    assert (cache.hits, cache.misses) == (19, 1)
+    assert warm[str(folder / '3.py')] == 'changed = True\n'
+    assert {path: content for path, content in warm.items() if not path.endswith('3.py')} == \
+        {path: content for path, content in cold.items() if not path.endswith('3.py')}
+
+def test_keys_of_other_folders_are_not_loaded(tmp_path):
+    for name in ('a', 'ab'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'f.txt').write_text(name)
+    cache = CollectionCache(str(tmp_path / 'cache.sqlite3'))
+    reader = FileReader()
+    for name in ('a', 'ab'):
+        cache.read(str(tmp_path / name / 'f.txt'), reader)
+    cache.close()
+    cache = CollectionCache(str(tmp_path / 'cache.sqlite3'))
+    cache.load_keys([str(tmp_path / 'a')])
+    assert list(cache.keys) == [os.path.join(str(tmp_path / 'a'), 'f.txt')]
+    assert cache.read(str(tmp_path / 'a' / 'f.txt'), reader) == 'a'
+    cache.close()
@@ -0,0 +1,39 @@
+import gzip
+import json
+
+from cli import main
+
+def make_project(tmp_path):
+    project = tmp_path / 'project'
+    project.mkdir()
+    (project / 'a.py').write_text('print(1)\n', encoding='utf-8')
+    return project
+
+def test_compress_adds_the_suffix(tmp_path):
+    project = make_project(tmp_path)
+    output = tmp_path / 'out.jsonl'
+    assert main([str(project), '-t', '.py', '-r', '-f', 'jsonl', '-z', 'gzip', '-o', str(output), '--no-cache']) == 0
+    assert not output.exists()
+    with gzip.open(f"{output}.gz", 'rt', encoding='utf-8') as f:
+        assert json.loads(f.read()) == {'a.py': 'print(1)\n'}
+
+def test_compress_matching_the_suffix(tmp_path):
+    project = make_project(tmp_path)
+    output = tmp_path / 'out.jsonl.gz'
+    assert main([str(project), '-t', '.py', '-f', 'jsonl', '-z', 'gzip', '-o', str(output), '--no-cache']) == 0
+    assert output.exists() and not (tmp_path / 'out.jsonl.gz.gz').exists()
+
+def test_compress_contradicting_the_suffix(tmp_path, capsys):
+    project = make_project(tmp_path)
+    output = tmp_path / 'out.jsonl.zst'
+    assert main([str(project), '-f', 'jsonl', '-z', 'gzip', '-o', str(output), '--no-cache']) == 2
+    assert 'contradicts' in capsys.readouterr().err
+    assert not output.exists()
+
+def test_delta_rejects_a_search(tmp_path, capsys):
+    project = make_project(tmp_path)
+    output = tmp_path / 'out.jsonl'
+    assert main([str(project), '-f', 'jsonl', '-o', str(output), '--snapshot']) == 0
+    assert main([str(project), '-f', 'jsonl', '-o', str(output), '-g', 'print',
+                 '--delta-from', str(tmp_path / 'out.snapshot.json')]) == 2
+    assert '--grep' in capsys.readouterr().err
@@ -0,0 +1,21 @@
+import core
+from core import ordered_parallel_map
+
+def check(item):
+    if item % 7 == 3:
+        raise ValueError(item)
+    return item * 2
+
+def test_parallel_map_keeps_order_and_errors(monkeypatch):
+    monkeypatch.setattr(core, 'AVAILABLE_CPUS', 4)
+    results = list(ordered_parallel_map(check, iter(range(200)), 4, batch=8))
+    assert [item for item, _, _ in results] == list(range(200))
+    for item, result, error in results:
+        if item % 7 == 3:
+            assert result is None and isinstance(error, ValueError)
+        else:
+            assert result == item * 2 and error is None
+
+def test_parallel_map_is_serial_on_one_cpu(monkeypatch):
+    monkeypatch.setattr(core, 'AVAILABLE_CPUS', 1)
+    assert list(ordered_parallel_map(check, range(3), 8))[:2] == [(0, 0, None), (1, 2, None)]
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from core import Deduplicator, DuplicateReference, IndexedReader, export, rebase_duplicates
+from sharding import export_shards
+from snapshots import Snapshot
+
+def deduplicated(records):
+    deduplicator = Deduplicator()
+    return [(file_path, deduplicator.process(file_path, content)) for file_path, content in records]
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [item for line in f for item in json.loads(line).items()]
+
+RECORDS = [('a.py', 'x = 1\n'), ('b.py', 'y = 2\n'), ('copy.py', 'x = 1\n')]
+
+def test_duplicate_of_a_written_file_stays_a_reference(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    export(deduplicated(RECORDS), path, 'jsonl')
+    assert read_jsonl(path)[2] == ('copy.py', {'duplicate_of': 'a.py'})
+
+@pytest.mark.parametrize('export_type', ['jsonl', 'indexed'])
+def test_duplicate_of_a_filtered_file_is_resolved(tmp_path, export_type):
+    path = str(tmp_path / f"export.{export_type}")
+    collection = deduplicated(RECORDS)
+    records = [record for record in collection if record[0] != 'a.py']
+    export(records, path, export_type, contents=dict(collection))
+    if export_type == 'indexed':
+        with IndexedReader(path) as reader:
+            assert reader['copy.py'] == 'x = 1\n'
+    else:
+        assert read_jsonl(path) == [('b.py', 'y = 2\n'), ('copy.py', 'x = 1\n')]
+
+def test_resolved_duplicate_is_minified(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    collection = deduplicated([('a.py', 'x = 1  # c\n'), ('copy.py', 'x = 1  # c\n')])
+    records = [record for record in collection if record[0] != 'a.py']
+    export(records, path, 'jsonl', minify=True, contents=dict(collection))
+    assert read_jsonl(path) == [('copy.py', 'x=1\n')]
+
+def test_shards_hold_no_references(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    manifest = export_shards(deduplicated(RECORDS), path, 'jsonl', 30, 'bytes')
+    assert len(manifest['shards']) > 1
+    contents = dict(item for shard in manifest['shards'] for item in read_jsonl(str(tmp_path / shard['path'])))
+    assert contents == dict(RECORDS)
+
+def test_delta_resolves_a_duplicate_of_an_unchanged_file(tmp_path):
+    previous = Snapshot()
+    list(previous.record([('a.py', 'x = 1\n')]))
+    path = str(tmp_path / 'delta.jsonl')
+    export(deduplicated([('a.py', 'x = 1\n'), ('copy.py', 'x = 1\n')]), path, 'jsonl', snapshot=Snapshot(),
+           previous=previous)
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'op': 'add', 'path': 'copy.py', 'content': 'x = 1\n'}]
+
+def test_reference_holds_no_content():
+    reference = deduplicated(RECORDS)[2][1]
+    assert reference.canonical_path == 'a.py' and not hasattr(reference, 'content')
+
+def test_filtered_shards_resolve_from_contents(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    collection = deduplicated(RECORDS)
+    manifest = export_shards(collection[1:], path, 'jsonl', 1000, 'bytes', contents=dict(collection))
+    assert dict(read_jsonl(str(tmp_path / manifest['shards'][0]['path']))) == dict(RECORDS[1:])
+
+def test_changed_canonical_file_rebases_its_duplicates():
+    contents = dict(deduplicated(RECORDS + [('copy2.py', 'x = 1\n')]))
+    rebased = rebase_duplicates(contents, {'a.py'})
+    assert rebased == {'copy.py': 'x = 1\n', 'copy2.py': DuplicateReference('copy.py', 6)}
+    assert rebased['copy2.py'].digest == contents['copy2.py'].digest
+
+def test_rebase_reads_duplicates_without_text():
+    references = {'copy.py': DuplicateReference('a.py', 6), 'copy2.py': DuplicateReference('a.py', 6)}
+    rebased = rebase_duplicates(references, {'a.py'}, lambda file_path: None if file_path == 'copy.py' else 'x = 1\n')
+    assert rebased == {'copy2.py': 'x = 1\n'}
+
+def test_rebase_leaves_other_duplicates_alone():
+    contents = dict(deduplicated(RECORDS))
+    assert rebase_duplicates(contents, {'b.py'}) == {}
+    assert rebase_duplicates(contents, {'a.py', 'copy.py'}) == {}
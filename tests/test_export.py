@@ -0,0 +1,57 @@
+import gzip
+import json
+
+import pytest
+import yaml
+
+from core import EXPORT_TYPES, IndexedReader, export, format_plain_text_record
+
+RECORDS = [
+    ('trailing.txt', 'k: |+\n  x\n\n'),
+    ('blank_lines.py', 'print(1)\n\n\n'),
+    ('no_newline.txt', 'last line'),
+    ('empty.txt', ''),
+    ('long.txt', ' \n' + 'a' * 100 + ' b' * 40),
+    ('nel.txt', 'a\x85b c\n'),
+    ('astral \U0001F600.txt', '\U0001F600\n\n'),
+    ('quotes.yaml', "'single' \"double\"\n...\n---\n"),
+]
+
+def load_export(path, export_type, compression=None):
+    if export_type == 'indexed':
+        with IndexedReader(path) as reader:
+            return list(reader.items())
+    opener = gzip.open if compression == 'gzip' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        text = f.read()
+    if export_type == 'plain_text':
+        return text
+    if export_type == 'json':
+        return list(json.loads(text).items())
+    if export_type == 'jsonl':
+        return [item for line in text.split('\n') if line for item in json.loads(line).items()]
+    if export_type == 'yaml':
+        return list(yaml.safe_load(text).items())
+    if export_type == 'yaml_stream':
+        return [item for document in yaml.safe_load_all(text) for item in document.items()]
+    raise ValueError(export_type)
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+@pytest.mark.parametrize('export_type', EXPORT_TYPES)
+def test_export_round_trip(tmp_path, export_type, compression):
+    if export_type == 'indexed' and compression:
+        pytest.skip("indexed exports are not compressed")
+    path = str(tmp_path / f"export.{export_type}")
+    export(iter(RECORDS), path, export_type, compression=compression)
+    loaded = load_export(path, export_type, compression)
+    if export_type == 'plain_text':
+        assert loaded == ''.join(format_plain_text_record(file_path, content) for file_path, content in RECORDS)
+    else:
+        assert loaded == RECORDS
+
+@pytest.mark.parametrize('export_type', ['yaml', 'yaml_stream'])
+def test_yaml_export_is_one_document_per_record(tmp_path, export_type):
+    path = str(tmp_path / 'export.yaml')
+    export(iter(RECORDS[:2]), path, export_type)
+    with open(path, encoding='utf-8') as f:
+        assert '\n...\n' not in f.read()
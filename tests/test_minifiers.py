@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from minifiers import minify_css, minify_html, minify_js, minify_json, minify_markdown, minify_scss
+
+def test_json_is_minified():
+    text = '{\n  "a": [1, 2,\n    3],\n  "b": "x  y"\n}\n'
+    assert minify_json(text) == '{"a":[1,2,3],"b":"x  y"}\n'
+
+@pytest.mark.parametrize('text', [
+    '{\n // Compiler options\n "compilerOptions": {"strict": true}\n}\n',
+    '{"a": 1,}\n',
+    '{"a": "unterminated\n',
+])
+def test_json_that_does_not_load_is_unchanged(text):
+    assert minify_json(text) == text
+
+def test_minified_json_loads_to_the_same_value():
+    text = '{"a": {"b": [true, null, 1.5e3, "\\u00e9 \\" "]}}'
+    assert json.loads(minify_json(text)) == json.loads(text)
+
+def test_scss_url_is_not_a_line_comment():
+    minified = minify_scss('a {\n  background: url( //cdn.example.com/x.png);\n  color: red; // note\n}\n')
+    assert minified == 'a{background:url( //cdn.example.com/x.png);color:red}\n'
+
+def test_css_url_keeps_its_argument():
+    assert minify_css('a { background: URL( "x y.png" ) ; }') == 'a{background:URL( "x y.png" )}\n'
+
+@pytest.mark.parametrize('text', ['a { content: "x\n}\n', 'a { b: c } /* open\n', 'a { background: url(x.png\n'])
+def test_unterminated_css_is_unchanged(text):
+    assert minify_css(text) == text
+
+def test_markdown_keeps_comments_in_code():
+    text = 'a `<!-- x -->` b <!-- gone -->\n\n    <!-- indented -->\n\n\n    code\n\n```\n<!-- fenced -->\n```\n'
+    assert minify_markdown(text) == 'a `<!-- x -->` b\n\n    <!-- indented -->\n\n\n    code\n\n```\n<!-- fenced -->\n```\n'
+
+def test_markdown_indented_line_in_a_paragraph_is_prose():
+    assert minify_markdown('para\n    more <!-- x -->\n') == 'para\n    more\n'
+
+def test_js_is_minified():
+    text = 'var a = "a\\\r\nb"; // c\nx = `${"}"}` ;\ny = a / 2 / c; z = /re\\/x/g.test(q)\n'
+    assert minify_js(text) == 'var a="a\\\r\nb";x=`${"}"}`;y=a/2/c;z=/re\\/x/g.test(q)\n'
+
+@pytest.mark.parametrize('text', ['var a = "abc\nvar b = 1\n', 'x = `abc ${y}', 'x = (/abc\n)', 'a = 1 /* open\n'])
+def test_unterminated_js_is_unchanged(text):
+    assert minify_js(text) == text
+
+@pytest.mark.parametrize('text', ['<p>a   b</p><!-- open\n', '<script>var a = 1;\n  x\n', '<pre>  a\n'])
+def test_unterminated_html_is_unchanged(text):
+    assert minify_html(text) == text
+
+def test_html_is_minified():
+    text = '<p>a   b</p>\n<!-- c --><style> a { b: c } </style><script> var x = 1 ; </script>'
+    assert minify_html(text) == '<p>a b</p>\n<style>a{b:c}</style><script>var x=1;</script>\n'
@@ -0,0 +1,32 @@
+import pytest
+
+from patterns import PatternSet
+
+@pytest.mark.parametrize('pattern, path, ignored', [
+    ('[!b]', 'a', True),
+    ('[!b]', 'b', None),
+    ('x[!b]y', 'x/y', None),
+    ('[^b]', 'c', True),
+    ('[z-a]*', 'zebra', None),
+    ('[[:digit:]]*.log', '1.log', True),
+    ('[[:digit:]]*.log', 'a.log', None),
+    ('[[:upper:][:digit:]]', 'Q', True),
+    ('[[:space:]]', ' ', True),
+    ('[[:punct:]]', '/', None),
+    ('[[:punct:]]', '!', True),
+    ('[[:bogus:]]', 'b', None),
+    ('[]a]', ']', True),
+    ('[a\\]]', ']', True),
+    ('[+-0]', 'x/y', None),
+])
+def test_bracket_expressions(pattern, path, ignored):
+    assert PatternSet([pattern]).match(path) is ignored
+
+def test_rule_that_does_not_compile_matches_nothing():
+    regex, negated = PatternSet.compile([('[z-a]', False, False), ('a', True, False)])
+    assert regex.fullmatch('z') is None
+    assert negated[regex.fullmatch('a').lastindex - 1] is True
+
+def test_invalid_range_leaves_other_rules_working():
+    patterns = PatternSet(['*.py', '[z-a]*'])
+    assert patterns.match('x.py') is True
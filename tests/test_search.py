@@ -0,0 +1,69 @@
+import re
+import random
+
+import pytest
+
+from core import DuplicateReference
+from search import ContentIndex, SearchQuery, filter_records
+
+WORDS = ['ΣΊΣ', 'σίς', 'ΣΊΣΑ', 'Σίσυφος', 'ὈΔΥΣΣΕΎΣ', 'straße', 'STRASSE', 'İstanbul', 'ǅemal', 'ﬁle', 'File',
+         'Kelvin', 'naïve', 'NAÏVE', 'foo_bar', 'fooBar', 'x', '42', 'été', 'ΌΣΟΣ', 'pın', 'PIN', 'ſpin']
+SEPARATORS = [' ', '\n', '.', '(', ', ', '-']
+
+def make_contents(count, seed):
+    rng = random.Random(seed)
+    contents = {}
+    for index in range(count):
+        parts = []
+        for _ in range(rng.randint(0, 12)):
+            parts.append(rng.choice(WORDS))
+            parts.append(rng.choice(SEPARATORS))
+        contents[f"file{index}.txt"] = ''.join(parts)
+    return contents
+
+def make_queries(seed):
+    rng = random.Random(seed)
+    queries = set()
+    for word in WORDS:
+        queries.update([word, word.lower(), word.upper(), word[1:], word[:-1], f" {word} ", f"{word}."])
+    for _ in range(200):
+        word = rng.choice(WORDS)
+        start = rng.randrange(len(word))
+        queries.add(word[start:rng.randint(start + 1, len(word))] + rng.choice(['', ' ', '.']))
+    return sorted(queries)
+
+def scan(contents, query):
+    return {file_path for file_path, _ in filter_records(contents.items(), query)}
+
+@pytest.mark.parametrize('case_sensitive', [False, True])
+@pytest.mark.parametrize('regex', [False, True])
+def test_index_matches_a_plain_scan(regex, case_sensitive):
+    contents = make_contents(300, seed=1)
+    index = ContentIndex()
+    index.add_many(contents.items())
+    for text in make_queries(seed=2):
+        query = SearchQuery(re.escape(text) if regex else text, regex, case_sensitive)
+        assert index.search(query) == scan(contents, query), text
+
+def test_regex_with_classes_and_repeats():
+    contents = make_contents(200, seed=3)
+    index = ContentIndex()
+    index.add_many(contents.items())
+    for pattern in [r'σίς\b', r'ΣΊΣ(Α|\s)', r'(?:ﬁ|fi)le', r'stra(ß|ss)e', r'\bx+\b', r'foo.?bar', r'Kel+vin\W']:
+        query = SearchQuery(pattern, regex=True)
+        assert index.search(query) == scan(contents, query), pattern
+
+def test_ignorecase_equivalences_beyond_casefold():
+    index = ContentIndex()
+    index.add_many([('a.txt', 'pın here'), ('b.txt', 'İstanbul'), ('c.txt', 'ſpin')])
+    assert index.search(SearchQuery('pin', regex=True)) == {'a.txt', 'c.txt'}
+    assert index.search(SearchQuery(r'\bistanbul', regex=True)) == {'b.txt'}
+    assert index.search(SearchQuery('SPIN', regex=True)) == {'c.txt'}
+
+def test_removed_files_and_duplicates():
+    index = ContentIndex()
+    index.add_many([('a.txt', 'ΣΊΣ one'), ('b.txt', 'two'), ('c.txt', DuplicateReference('a.txt', 9))])
+    query = SearchQuery('σίς')
+    assert index.search(query) == {'a.txt', 'c.txt'}
+    index.remove(['a.txt'])
+    assert index.search(query) == set()
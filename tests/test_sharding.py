@@ -0,0 +1,17 @@
+from sharding import ShardPlanner
+
+def plan(sizes, limit):
+    planner = ShardPlanner('plain_text', limit, 'bytes')
+    planner.format_record = lambda file_path, content: content
+    return [[len(content) for _, content, _ in shard] for shard in planner.plan(
+        (f"{index}.txt", 'x' * size) for index, size in enumerate(sizes))]
+
+def test_items_go_to_the_fullest_shard_they_fit():
+    # First fit would put the 1 with the 8, which has less space left.
+    assert plan([8, 6, 3, 1], 10) == [[8], [6, 3, 1]]
+
+def test_shards_keep_collection_order_and_limit():
+    sizes = [(index * 37) % 50 + 1 for index in range(500)]
+    shards = plan(sizes, 120)
+    assert all(sum(shard) <= 120 for shard in shards)
+    assert sorted(size for shard in shards for size in shard) == sorted(sizes)
@@ -0,0 +1,37 @@
+import json
+
+from core import DuplicateReference, export
+from snapshots import Snapshot
+
+def delta_lines(tmp_path, records, previous):
+    path = str(tmp_path / 'delta.jsonl')
+    snapshot = Snapshot()
+    export(iter(records), path, 'jsonl', snapshot=snapshot, previous=previous)
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f], snapshot
+
+def test_delta_reports_added_modified_and_deleted(tmp_path):
+    previous = Snapshot()
+    list(previous.record([('a.py', 'a'), ('b.py', 'b'), ('c.py', 'c')]))
+    lines, snapshot = delta_lines(tmp_path, [('a.py', 'a'), ('b.py', 'b2'), ('d.py', 'd')], previous)
+    assert lines == [
+        {'op': 'modify', 'path': 'b.py', 'content': 'b2'},
+        {'op': 'add', 'path': 'd.py', 'content': 'd'},
+        {'op': 'delete', 'path': 'c.py'},
+    ]
+    assert snapshot.changes['unchanged'] == 1
+
+def test_duplicate_changes_with_its_canonical_file(tmp_path):
+    previous = Snapshot()
+    list(previous.record([('a.py', 'a'), ('copy.py', DuplicateReference('a.py', 1))]))
+    lines, _ = delta_lines(tmp_path, [('a.py', 'a2'), ('copy.py', DuplicateReference('a.py', 2))], previous)
+    assert [line['path'] for line in lines] == ['a.py', 'copy.py']
+    lines, _ = delta_lines(tmp_path, [('a.py', 'a'), ('copy.py', DuplicateReference('a.py', 1))], previous)
+    assert lines == []
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = Snapshot()
+    list(snapshot.record([('a.py', 'a'), ('é.md', 'b')]))
+    snapshot.save(str(tmp_path / 'export.snapshot.json'))
+    loaded = Snapshot.load(str(tmp_path / 'export.snapshot.json'))
+    assert loaded.files == snapshot.files and loaded.digest == snapshot.digest
@@ -0,0 +1,182 @@
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from core import DirectoryScanner, FileReader, SkippedFile, compile_extension_matcher, has_excluded_part, print_skip
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+class Inotify:
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self):
+        library = ctypes.util.find_library('c')
+        self.libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this platform")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd >= 0:
+            self.watches[wd] = path
+        return wd
+
+    def read_events(self, timeout):
+        # Returns a list of (path, mask) for the events available within timeout.
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b'\0'))
+            offset += name_length
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, mask))
+                continue
+            directory = self.watches.get(wd)
+            if directory is not None:
+                events.append((os.path.join(directory, name) if name else directory, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class FolderWatcher:
+    # Turns inotify events under the collected folders into debounced
+    # (updated, removed) batches keyed like the collection.
+    DEBOUNCE = 0.2
+    MAX_DELAY = 1.0
+
+    def __init__(self, folders, file_types, excluded_folders, use_relative_path, reader=None, on_skip=print_skip,
+                 path_filter=None):
+        self.folders = folders
+        self.matches = compile_extension_matcher(file_types)
+        self.excluded_folders = set(excluded_folders)
+        self.use_relative_path = use_relative_path
+        self.reader = reader or FileReader()
+        self.on_skip = on_skip
+        self.path_filter = path_filter or None
+
+    def watch(self, is_running):
+        # Yields (updated, removed) until is_running() turns false, or None
+        # when the kernel queue overflowed and a full re-collect is needed.
+        inotify = Inotify()
+        try:
+            for folder in self.folders:
+                self.watch_tree(inotify, folder)
+            touched = set()
+            first_event = last_event = 0
+            while is_running():
+                events = inotify.read_events(0.1)
+                now = time.monotonic()
+                for path, mask in events:
+                    if path is None:
+                        yield None
+                        continue
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        self.watch_tree(inotify, path)
+                        touched.update(entry[1] for entry in DirectoryScanner([path], [], self.excluded_folders).scan())
+                    touched.add(path)
+                if events:
+                    first_event = first_event or now
+                    last_event = now
+                if touched and (now - last_event >= self.DEBOUNCE or now - first_event >= self.MAX_DELAY):
+                    changes = self.read_changes(touched)
+                    if changes[0] or changes[1]:
+                        yield changes
+                    touched = set()
+                    first_event = 0
+        finally:
+            inotify.close()
+
+    def folder_of(self, path):
+        return next((f for f in self.folders if path == f or path.startswith(os.path.join(f, ''))), None)
+
+    def watch_tree(self, inotify, root):
+        folder = self.folder_of(root)
+        path_filter = self.path_filter if folder is not None else None
+        contexts = {}
+        if path_filter:
+            contexts[root] = path_filter.directory_context(folder, root)
+            if contexts[root] is None:
+                return
+        for directory, dirs, _ in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in self.excluded_folders]
+            if path_filter:
+                # Ignored trees are not watched at all.
+                context = contexts.pop(directory)
+                dirs[:] = [d for d in dirs if not path_filter.ignored(context, folder, os.path.join(directory, d), True)]
+                for d in dirs:
+                    child = os.path.join(directory, d)
+                    contexts[child] = path_filter.enter(context, child, path_filter.has_gitignore(child))
+            inotify.add_watch(directory)
+
+    def read_key(self, key):
+        # The current content of a collected file, or None when it can no
+        # longer be read. A relative key is looked up in each folder.
+        paths = [os.path.join(folder, key) for folder in self.folders] if self.use_relative_path else [key]
+        for path in paths:
+            if os.path.isfile(path):
+                try:
+                    return self.reader.read(path)
+                except (SkippedFile, OSError):
+                    return None
+        return None
+
+    def read_changes(self, touched):
+        updated = {}
+        removed = []
+        for path in sorted(touched):
+            folder = self.folder_of(path)
+            if folder is None or path == folder:
+                continue
+            relative_path = os.path.relpath(path, folder)
+            if has_excluded_part(relative_path, self.excluded_folders):
+                continue
+            key = relative_path if self.use_relative_path else path
+            if os.path.isdir(path):
+                continue
+            if not os.path.exists(path):
+                removed.append(key)
+                continue
+            if not self.matches(os.path.basename(path)):
+                continue
+            if self.path_filter and not self.path_filter.allows(folder, path):
+                continue
+            try:
+                updated[key] = self.reader.read(path)
+            except SkippedFile as e:
+                self.on_skip(path, e.reason, str(e))
+                removed.append(key)
+            except OSError as e:
+                self.on_skip(path, 'read_error', str(e))
+                removed.append(key)
+        return updated, removed